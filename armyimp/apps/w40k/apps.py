@@ -6,3 +6,7 @@ class W40KConfig(AppConfig):
 
     name = 'armyimp.apps.w40k'
     verbose_name = 'Warhammer 40K'
+
+    def ready(self):
+        """Connect signal handlers."""
+        from . import signals  # NOQA
@@ -0,0 +1,183 @@
+"""
+Catalog version counter.
+
+Codex data (units, models, items, profiles, keywords, ...) rarely changes. Instead of tracking
+what exactly changed we keep a single version counter in Django's cache framework that gets
+bumped by signal handlers whenever any catalog instance is saved or deleted. Anything that is
+derived from catalog data can be tagged with the version it was built for and considered stale
+once the counter moved on.
+
+Besides the global version there are *scoped* versions:
+
+- one per unit, bumped by changes to the unit, its models and their item slots,
+- one per organization, bumped by changes to its wargear lists,
+- a *shared* one, bumped by changes to everything else (items, prices, organizations,
+  profiles, keywords, ...).
+
+Prices and organizations are shared as datasheets list the price of each item for every
+organization.
+
+A units datasheet is up to date as long as its own, its organizations and the shared version
+did not change.
+
+Note:
+    Versions are only shared between processes if they share the cache, so deployments with
+    several worker processes need a shared cache backend like memcached or Redis. The default
+    ``LocMemCache`` is per process: changes made through one process are not noticed by the
+    others. With ``DummyCache`` (used for development) nothing is kept and derived data is
+    rebuilt on each access.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import models
+
+VERSION_CACHE_KEY = 'w40k:catalog_version'
+SHARED_VERSION_CACHE_KEY = 'w40k:catalog_version:shared'
+SCOPED_VERSION_CACHE_KEY = 'w40k:catalog_version:{scope}:{pk}'
+MODIFIED_CACHE_KEY = 'w40k:catalog_modified'
+
+# All models that make up the codex. Changing any of these bumps the catalog version.
+CATALOG_MODELS = (
+    models.WeaponProfile,
+    models.Item,
+    models.OrganizationItemIntermediate,
+    models.Organization,
+    models.WargearList,
+    models.UnitModel,
+    models.ModelProfile,
+    models.ItemSlot,
+    models.Unit,
+    models.UnitAbility,
+    models.UnitKeyword,
+    models.FactionKeyword,
+)
+
+# Many to many relations between catalog models. Changing any of these bumps the version too.
+CATALOG_M2M_THROUGH_MODELS = (
+    models.WargearList.items.through,
+    models.ItemSlot.options.through,
+    models.ItemSlot.option_from_list.through,
+    models.Unit.abilities.through,
+    models.Unit.keywords.through,
+    models.Unit.faction_keywords.through,
+)
+
+# Scope and lookup (relative to each model) of the unit or organization instances belong to.
+# Changes to any other catalog model are shared.
+SCOPE_LOOKUPS = {
+    models.WargearList: ('organization', 'organization'),
+    models.Unit: ('unit', 'pk'),
+    models.UnitModel: ('unit', 'unit'),
+    models.ItemSlot: ('unit', 'model__unit'),
+}
+
+
+def _initial_version():
+    """
+    Return a value to start counting from.
+
+    Note:
+        We start from the current time (in milliseconds) rather than from zero. If the cache
+        entry gets evicted, the counter starts over at a value no worker has seen before.
+    """
+    return int(time.time() * 1000)
+
+
+def _get_or_add(key, default):
+    """
+    Return the value stored under ``key``, storing ``default()`` first if there is none.
+
+    If the cache does not keep anything (like ``DummyCache``), the new default value is
+    returned, so derived data is considered stale every time.
+    """
+    value = cache.get(key)
+    if value is None:
+        new = default()
+        cache.add(key, new, None)
+        value = cache.get(key)
+        if value is None:
+            value = new
+    return value
+
+
+def _get(key):
+    """Return the counter stored under ``key``, starting a new one if needed."""
+    return _get_or_add(key, _initial_version)
+
+
+def _incr(key):
+    """Increment the counter stored under ``key`` and return the new value."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # There is no version yet (or it got evicted).
+        cache.add(key, _initial_version(), None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The cache does not keep anything (like ``DummyCache``), start over instead.
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def get_version():
+    """Return the current catalog version."""
+    return _get(VERSION_CACHE_KEY)
+
+
+def get_unit_version(unit_pk, organization_pk):
+    """
+    Return the version of a units datasheet.
+
+    Returns:
+        tuple: ``(shared_version, organization_version, unit_version)``
+    """
+    return (_get(SHARED_VERSION_CACHE_KEY),
+        _get(SCOPED_VERSION_CACHE_KEY.format(scope='organization', pk=organization_pk)),
+        _get(SCOPED_VERSION_CACHE_KEY.format(scope='unit', pk=unit_pk)))
+
+
+def get_last_modified():
+    """Return when the catalog was changed last (as far as this cache knows)."""
+    return _get_or_add(MODIFIED_CACHE_KEY, timezone.now)
+
+
+def bump_version(scope=None, pks=()):
+    """
+    Increment the catalog version and return the new value.
+
+    Args:
+        scope (str): ``'unit'`` or ``'organization'`` if the changed data belongs to
+            particular units or organizations. If ``None``, the change may concern anything
+            and the shared version is bumped.
+        pks (iterable): Primary keys of the units or organizations concerned.
+    """
+    if scope is None:
+        _incr(SHARED_VERSION_CACHE_KEY)
+    else:
+        for pk in set(pks):
+            _incr(SCOPED_VERSION_CACHE_KEY.format(scope=scope, pk=pk))
+    cache.set(MODIFIED_CACHE_KEY, timezone.now(), None)
+    return _incr(VERSION_CACHE_KEY)
+
+
+def get_scope(model, pks):
+    """
+    Return the scope of a change to instances of ``model``.
+
+    Returns:
+        tuple: ``(scope, pks)`` suitable as arguments to ``bump_version``. ``pks`` are the
+            primary keys of the units or organizations concerned.
+    """
+    scope, lookup = SCOPE_LOOKUPS.get(model, (None, None))
+    pks = set(pks)
+    if scope is None:
+        return (None, ())
+    if lookup == 'pk' or not pks:
+        return (scope, pks)
+    return (scope, set(model.objects.filter(pk__in=pks).values_list(lookup, flat=True)))
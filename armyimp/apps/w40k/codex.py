@@ -0,0 +1,281 @@
+"""
+Immutable in-process codex snapshot.
+
+A ``CodexSnapshot`` holds all catalog data as plain, immutable, cross-linked records indexed
+by primary key. Each process builds it once with a constant amount of queries and tags it
+with the catalog version it was built for. Once a write bumps the catalog version, the next
+call to ``get_snapshot`` builds a new snapshot and swaps it in. Readers holding on to the old
+one are unaffected, as snapshots never change.
+"""
+
+import threading
+from collections import defaultdict
+from types import MappingProxyType
+
+from . import catalog, models
+from .models import RangeTuple
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class Record(object):
+    """
+    Base class for immutable records.
+
+    Subclasses list their attributes in ``__slots__``, all of which need to be passed
+    as keyword arguments on instantiation.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        """Instantiate a new record."""
+        for name in self.__slots__:
+            object.__setattr__(self, name, kwargs.pop(name))
+        if kwargs:
+            raise TypeError("Unexpected attributes: {}".format(', '.join(kwargs)))
+
+    def __setattr__(self, name, value):
+        """Prevent any modification."""
+        raise AttributeError("{} instances are immutable.".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        """Prevent any modification."""
+        raise AttributeError("{} instances are immutable.".format(type(self).__name__))
+
+    def __repr__(self):
+        """Return a representation including the records primary key."""
+        return '<{} pk={}>'.format(type(self).__name__, getattr(self, 'pk', None))
+
+
+class WeaponProfileRecord(Record):
+    """Snapshot of a ``WeaponProfile``."""
+
+    __slots__ = ('pk', 'name', 'item_pk', 'category', 'range_min', 'range_max', 'attack_type',
+        'number_of_attacks_min', 'number_of_attacks_max', 'strength_min', 'strength_max',
+        'armor_penetration', 'damage_min', 'damage_max', 'comments')
+
+    @property
+    def number_of_attacks(self):
+        """Return this profile's number of attacks."""
+        return RangeTuple(min=self.number_of_attacks_min, max=self.number_of_attacks_max)
+
+    @property
+    def strength(self):
+        """Return this profile's strength."""
+        return RangeTuple(min=self.strength_min, max=self.strength_max)
+
+    @property
+    def damage(self):
+        """Return this profile's damage."""
+        return RangeTuple(min=self.damage_min, max=self.damage_max)
+
+
+class ItemRecord(Record):
+    """Snapshot of an ``Item`` including its weapon profiles and prices."""
+
+    __slots__ = ('pk', 'name', 'comment', 'weapon_profiles', 'prices')
+
+
+class WargearListRecord(Record):
+    """Snapshot of a ``WargearList`` including its items."""
+
+    __slots__ = ('pk', 'name', 'organization_pk', 'items')
+
+
+class ModelProfileRecord(Record):
+    """Snapshot of a ``ModelProfile``."""
+
+    __slots__ = ('pk', 'name', 'movement', 'weapon_skill', 'balistic_skill', 'strength',
+        'toughness', 'wounds', 'attacks', 'leadership', 'saves')
+
+
+class ItemSlotRecord(Record):
+    """
+    Snapshot of an ``ItemSlot`` including its default and options.
+
+    ``eligible_item_pks`` holds all items the slot may take, see ``ItemSlotOption``.
+    """
+
+    __slots__ = ('pk', 'default', 'options', 'option_from_list', 'min_amount', 'max_amount',
+        'eligible_item_pks')
+
+
+class UnitModelRecord(Record):
+    """Snapshot of a ``UnitModel`` including its profile and item slots."""
+
+    __slots__ = ('pk', 'unit_pk', 'profile', 'name_suffix', 'min_amount', 'max_amount',
+        'item_slots')
+
+    @property
+    def name(self):
+        """Return this models name."""
+        if not self.name_suffix:
+            return self.profile.name
+        return '{s.profile.name} ({s.name_suffix})'.format(s=self)
+
+
+class UnitAbilityRecord(Record):
+    """Snapshot of a ``UnitAbility``."""
+
+    __slots__ = ('pk', 'name', 'description')
+
+
+class UnitRecord(Record):
+    """Snapshot of a ``Unit`` including its complete datasheet."""
+
+    __slots__ = ('pk', 'name', 'organization_pk', 'category', 'is_named_character',
+        'power_rating', 'model_price', 'max_per_army', 'models_min', 'models_max', 'transport',
+        'comment', 'models', 'abilities', 'keywords', 'faction_keywords')
+
+
+class CodexSnapshot(object):
+    """
+    Immutable snapshot of all catalog data.
+
+    Attributes:
+        version (int): The catalog version this snapshot was built for.
+        units, unit_models, item_slots, items, weapon_profiles, model_profiles, wargear_lists,
+        abilities, organizations, keywords, faction_keywords (mapping): Read only records
+            (or names for organizations and keywords) indexed by primary key.
+    """
+
+    __slots__ = ('version', 'units', 'unit_models', 'item_slots', 'items', 'weapon_profiles',
+        'model_profiles', 'wargear_lists', 'abilities', 'organizations', 'keywords',
+        'faction_keywords', 'units_by_name')
+
+    def __init__(self, version, **indexes):
+        """Instantiate a new snapshot from the given ``{pk: record}`` indexes."""
+        object.__setattr__(self, 'version', version)
+        for name in self.__slots__[1:-1]:
+            object.__setattr__(self, name, MappingProxyType(indexes.pop(name)))
+        object.__setattr__(self, 'units_by_name',
+            MappingProxyType({unit.name: unit for unit in self.units.values()}))
+
+    def __setattr__(self, name, value):
+        """Prevent any modification."""
+        raise AttributeError("CodexSnapshot instances are immutable.")
+
+    @classmethod
+    def build(cls, version):
+        """Return a new snapshot of all catalog data currently stored in the database."""
+        def values(model, *fields):
+            return model.objects.order_by().values_list(*fields)
+
+        def pairs(through, source, target):
+            result = defaultdict(list)
+            for source_pk, target_pk in values(through, source, target):
+                result[source_pk].append(target_pk)
+            return result
+
+        organizations = dict(values(models.Organization, 'pk', 'name'))
+
+        weapon_profiles, profiles_by_item = {}, defaultdict(list)
+        fields = WeaponProfileRecord.__slots__
+        for row in values(models.WeaponProfile, 'pk', 'name', 'weapon', *fields[3:]):
+            record = WeaponProfileRecord(**dict(zip(fields, row)))
+            weapon_profiles[record.pk] = record
+            profiles_by_item[record.item_pk].append(record)
+
+        prices = defaultdict(dict)
+        for organization_pk, item_pk, price in values(models.OrganizationItemIntermediate,
+                'organization', 'item', 'price'):
+            prices[item_pk][organization_pk] = price
+
+        items = {}
+        for pk, name, comment in values(models.Item, 'pk', 'name', 'comment'):
+            items[pk] = ItemRecord(pk=pk, name=name, comment=comment,
+                weapon_profiles=tuple(profiles_by_item[pk]),
+                prices=MappingProxyType(prices[pk]))
+
+        wargear_list_items = pairs(models.WargearList.items.through, 'wargearlist', 'item')
+        wargear_lists = {}
+        for pk, name, organization_pk in values(models.WargearList, 'pk', 'name',
+                'organization'):
+            wargear_lists[pk] = WargearListRecord(pk=pk, name=name,
+                organization_pk=organization_pk,
+                items=tuple(items[each] for each in wargear_list_items[pk]))
+
+        model_profiles = {}
+        fields = ModelProfileRecord.__slots__
+        for row in values(models.ModelProfile, *fields):
+            model_profiles[row[0]] = ModelProfileRecord(**dict(zip(fields, row)))
+
+        slot_options = pairs(models.ItemSlot.options.through, 'itemslot', 'item')
+        slot_lists = pairs(models.ItemSlot.option_from_list.through, 'itemslot', 'wargearlist')
+        slot_eligible = pairs(models.ItemSlotOption, 'item_slot', 'item')
+        item_slots, slots_by_model = {}, defaultdict(list)
+        for pk, model_pk, default_pk, min_amount, max_amount in values(models.ItemSlot,
+                'pk', 'model', 'default', 'min_amount', 'max_amount').order_by('pk'):
+            options = tuple(items[each] for each in slot_options[pk])
+            option_from_list = tuple(wargear_lists[each] for each in slot_lists[pk])
+            record = ItemSlotRecord(pk=pk, default=items.get(default_pk), options=options,
+                option_from_list=option_from_list, min_amount=min_amount,
+                max_amount=max_amount, eligible_item_pks=frozenset(slot_eligible[pk]))
+            item_slots[pk] = record
+            slots_by_model[model_pk].append(record)
+
+        unit_models, models_by_unit = {}, defaultdict(list)
+        for pk, unit_pk, profile_pk, name_suffix, min_amount, max_amount in values(
+                models.UnitModel, 'pk', 'unit', 'profile', 'name_suffix', 'min_amount',
+                'max_amount').order_by('pk'):
+            record = UnitModelRecord(pk=pk, unit_pk=unit_pk, profile=model_profiles[profile_pk],
+                name_suffix=name_suffix, min_amount=min_amount, max_amount=max_amount,
+                item_slots=tuple(slots_by_model[pk]))
+            unit_models[pk] = record
+            models_by_unit[unit_pk].append(record)
+
+        abilities = {pk: UnitAbilityRecord(pk=pk, name=name, description=description)
+            for pk, name, description in values(models.UnitAbility, 'pk', 'name',
+                'description')}
+        keywords = dict(values(models.UnitKeyword, 'pk', 'name'))
+        faction_keywords = dict(values(models.FactionKeyword, 'pk', 'name'))
+        unit_abilities = pairs(models.Unit.abilities.through, 'unit', 'unitability')
+        unit_keywords = pairs(models.Unit.keywords.through, 'unit', 'unitkeyword')
+        unit_faction_keywords = pairs(models.Unit.faction_keywords.through, 'unit',
+            'factionkeyword')
+
+        units = {}
+        fields = UnitRecord.__slots__[:-4]
+        for row in values(models.Unit, 'pk', 'name', 'organization', *fields[3:]):
+            pk = row[0]
+            units[pk] = UnitRecord(models=tuple(models_by_unit[pk]),
+                abilities=tuple(sorted(abilities[each].name for each in unit_abilities[pk])),
+                keywords=tuple(sorted(keywords[each] for each in unit_keywords[pk])),
+                faction_keywords=tuple(sorted(
+                    faction_keywords[each] for each in unit_faction_keywords[pk])),
+                **dict(zip(fields, row)))
+
+        return cls(version, units=units, unit_models=unit_models, item_slots=item_slots,
+            items=items, weapon_profiles=weapon_profiles, model_profiles=model_profiles,
+            wargear_lists=wargear_lists, abilities=abilities, organizations=organizations,
+            keywords=keywords, faction_keywords=faction_keywords)
+
+    def get_unit(self, pk):
+        """Return the ``UnitRecord`` with the given primary key."""
+        return self.units[pk]
+
+    def get_unit_by_name(self, name):
+        """Return the ``UnitRecord`` with the given name."""
+        return self.units_by_name[name]
+
+
+def get_snapshot():
+    """Return the current ``CodexSnapshot``, building a new one if the catalog changed."""
+    global _snapshot
+    version = catalog.get_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = CodexSnapshot.build(version)
+                _snapshot = snapshot
+    return snapshot
+
+
+def invalidate():
+    """Drop this processes snapshot so the next call to ``get_snapshot`` builds a new one."""
+    global _snapshot
+    _snapshot = None
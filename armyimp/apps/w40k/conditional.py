@@ -0,0 +1,59 @@
+"""
+Conditional GET support for codex views.
+
+Responses of codex views are tagged with the catalog version they were rendered for (see
+``catalog``). Requests with a matching ``If-None-Match`` or ``If-Modified-Since`` header
+are answered with ``304 Not Modified`` before the view runs, that is without any query or
+serialization.
+"""
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from . import catalog, codex
+
+
+def get_codex_version(pk=None):
+    """
+    Return the version tag of the codex data a view depends on.
+
+    Views of a single unit (given by ``pk``) depend on the units datasheet only, so their tag
+    changes whenever the unit, its organization or any shared data changes. All other views
+    depend on the global catalog version.
+
+    Returns:
+        str: The version tag or ``None`` for unknown units (including invalid primary keys,
+            which the view answers with 404 then).
+
+    Note:
+        A units organization is looked up in the ``CodexSnapshot``, which only needs to be built
+        once per process and catalog version.
+    """
+    if pk is None:
+        return 'catalog-{}'.format(catalog.get_version())
+    try:
+        unit = codex.get_snapshot().units.get(int(pk))
+    except (TypeError, ValueError):
+        return None
+    if unit is None:
+        return None
+    return 'unit-{}-{}-{}-{}'.format(unit.pk,
+        *catalog.get_unit_version(unit.pk, unit.organization_pk))
+
+
+def codex_etag(request, pk=None, *args, **kwargs):
+    """Return an ETag for codex views, see ``get_codex_version``."""
+    version = get_codex_version(pk)
+    if version is None:
+        return None
+    return 'w40k-{}'.format(version)
+
+
+def codex_last_modified(request, *args, **kwargs):
+    """Return the last modification of the catalog."""
+    return catalog.get_last_modified()
+
+
+# Class decorator adding conditional GET support to codex views.
+codex_condition = method_decorator(condition(etag_func=codex_etag,
+    last_modified_func=codex_last_modified), name='dispatch')
@@ -0,0 +1,78 @@
+"""
+Complete unit datasheets.
+
+A datasheet holds everything printed for a unit in its codex: its own stats, the profile of
+each model, the default and eligible items of each item slot, the weapon profiles and prices of
+all of those items, abilities and keywords. ``Unit.objects.with_datasheet()`` fetches all of it
+with one query per level, so rendering a datasheet takes ``QUERY_COUNT`` queries no matter how
+many models, slots or items a unit has (fewer if a level is empty):
+
+1. The unit and its organization.
+2. Its unit models and their profiles.
+3. Their item slots and defaults.
+4. The effective options of those slots (see ``slot_options``) and their items.
+5. The weapon profiles of those items.
+6. - 8. Abilities, keywords and faction keywords.
+
+Prices are read from the ``pricing.PriceMatrix``, which needs no queries once built.
+``get_datasheet`` turns a fetched unit into plain data, shared by the HTML and JSON views.
+"""
+
+from . import pricing
+
+QUERY_COUNT = 8
+
+UNIT_FIELDS = ('pk', 'name', 'category', 'is_named_character', 'power_rating', 'model_price',
+    'max_per_army', 'models_min', 'models_max', 'transport', 'comment')
+PROFILE_FIELDS = ('name', 'movement', 'weapon_skill', 'balistic_skill', 'strength', 'toughness',
+    'wounds', 'attacks', 'leadership', 'saves')
+WEAPON_PROFILE_FIELDS = ('pk', 'name', 'category', 'range_min', 'range_max', 'attack_type',
+    'number_of_attacks_min', 'number_of_attacks_max', 'strength_min', 'strength_max',
+    'armor_penetration', 'damage_min', 'damage_max', 'comments')
+
+
+def _values(instance, fields):
+    """Return a ``{field: value}`` dict of an instance."""
+    return {name: getattr(instance, name) for name in fields}
+
+
+def get_datasheet(unit):
+    """
+    Return the datasheet of a unit fetched by ``Unit.objects.with_datasheet()`` as plain data.
+
+    Items are represented once per slot that may take them, including their weapon profiles
+    and a price per organization.
+    """
+    items, matrix = {}, pricing.get_price_matrix()
+
+    def get_item(item):
+        if item.pk not in items:
+            prices = [{'organization': matrix.organization_name(organization), 'price': price}
+                for organization, price in matrix.per_organization(item).items()]
+            items[item.pk] = dict(_values(item, ('pk', 'name', 'comment')),
+                weapon_profiles=[_values(profile, WEAPON_PROFILE_FIELDS)
+                    for profile in item.weapon_profiles.all()],
+                prices=sorted(prices, key=lambda price: price['organization']))
+        return items[item.pk]
+
+    result = _values(unit, UNIT_FIELDS)
+    result['organization'] = unit.organization.name
+    result['abilities'] = [_values(ability, ('name', 'description'))
+        for ability in unit.abilities.all()]
+    result['keywords'] = [keyword.name for keyword in unit.keywords.all()]
+    result['faction_keywords'] = [keyword.name for keyword in unit.faction_keywords.all()]
+    result['models'] = [{
+        'pk': unit_model.pk,
+        'name': unit_model.name,
+        'min_amount': unit_model.min_amount,
+        'max_amount': unit_model.max_amount,
+        'profile': _values(unit_model.profile, PROFILE_FIELDS),
+        'item_slots': [{
+            'pk': slot.pk,
+            'min_amount': slot.min_amount,
+            'max_amount': slot.max_amount,
+            'default': slot.default.name if slot.default else None,
+            'options': [get_item(option.item) for option in slot.effective_options.all()],
+        } for slot in unit_model.item_slots.all()],
+    } for unit_model in unit.models.all()]
+    return result
@@ -0,0 +1,174 @@
+"""
+Exact dice distributions.
+
+Variable characteristics of weapon profiles are stored as ``RangeTuple`` like ``(1, 6)`` for
+D6 or ``(2, 6)`` for 2D3. This module turns those into exact probability distributions and
+combines them into the distribution of unsaved wounds and damage of a whole attack sequence.
+
+Distributions are NumPy arrays holding the probability of each value, indexed by value. Sums
+of independent values are convolutions, which are done by FFT once they get large. Results are
+memoized on the (hashable) characteristics involved, so repeated queries are cheap.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from .mathhammer import success_probability, unsaved_probability, wound_probability
+
+# Distributions at least this long are convolved by FFT.
+FFT_THRESHOLD = 64
+
+AttackDistribution = namedtuple('AttackDistribution', ('wounds', 'damage'))
+AttackDistribution.__doc__ = """
+Exact outcome of all attacks of a weapon against a target.
+
+Attributes:
+    wounds (numpy.ndarray): Probability of each number of unsaved wounds.
+    damage (numpy.ndarray): Probability of each amount of damage inflicted.
+"""
+
+
+def _freeze(distribution):
+    """Return ``distribution`` made read only, so it can be shared by the cache."""
+    distribution.flags.writeable = False
+    return distribution
+
+
+def parse_range(minimum, maximum):
+    """
+    Return the dice a range of values is rolled with.
+
+    D3 and D6 are tried, the fewest dice first.
+
+    Returns:
+        tuple: ``(count, sides, modifier)``, e.g. ``(2, 3, 0)`` for 2D3, or ``None`` if the
+            range matches no such expression.
+    """
+    if minimum == maximum:
+        return (0, 1, minimum)
+    for count in range(1, minimum + 1):
+        for sides in (6, 3):
+            modifier = minimum - count
+            if count * sides + modifier == maximum:
+                return (count, sides, modifier)
+    return None
+
+
+@lru_cache(maxsize=256)
+def range_distribution(minimum, maximum):
+    """
+    Return the distribution of a value in range.
+
+    Ranges matching a dice expression (see ``parse_range``) get the exact distribution of
+    that expression. All others are assumed to be uniform.
+    """
+    dice = parse_range(minimum, maximum)
+    if dice is None:
+        result = np.zeros(maximum + 1)
+        result[minimum:] = 1 / (maximum - minimum + 1)
+        return _freeze(result)
+    count, sides, modifier = dice
+    result = np.zeros(modifier + 1)
+    result[modifier] = 1
+    die = np.zeros(sides + 1)
+    die[1:] = 1 / sides
+    for each in range(count):
+        result = convolve(result, die)
+    return _freeze(result)
+
+
+def convolve(first, second):
+    """Return the distribution of the sum of two independent values."""
+    size = len(first) + len(second) - 1
+    if min(len(first), len(second)) < FFT_THRESHOLD:
+        return np.convolve(first, second)
+    length = 1 << (size - 1).bit_length()
+    result = np.fft.irfft(np.fft.rfft(first, length) * np.fft.rfft(second, length), length)
+    # Get rid of numerical noise.
+    return np.clip(result[:size], 0, None)
+
+
+def compound(count, value):
+    """
+    Return the distribution of the sum of a random amount of independent values.
+
+    Args:
+        count (numpy.ndarray): Distribution of the amount of values.
+        value (numpy.ndarray): Distribution of each value.
+    """
+    size = (len(count) - 1) * (len(value) - 1) + 1
+    if size < FFT_THRESHOLD:
+        result, power = np.zeros(size), np.ones(1)
+        for probability in count:
+            result[:len(power)] += probability * power
+            power = np.convolve(power, value)
+        return result
+    # The transform of a sum of ``n`` values is the ``n``-th power of the values transform.
+    length = 1 << (size - 1).bit_length()
+    transform = np.fft.rfft(value, length)
+    result = np.fft.irfft(np.polyval(count[::-1], transform), length)
+    return np.clip(result[:size], 0, None)
+
+
+def thin(count, probability):
+    """Return the distribution of successes among ``count`` trials of ``probability``."""
+    return compound(count, np.array([1 - probability, probability]))
+
+
+def at_least(distribution, value):
+    """Return the probability of at least ``value``."""
+    return float(distribution[max(value, 0):].sum())
+
+
+def expected(distribution):
+    """Return the expected value of a distribution."""
+    return float(np.dot(np.arange(len(distribution)), distribution))
+
+
+@lru_cache(maxsize=4096)
+def attack_distribution(attacks, strength, armor_penetration, damage, skill, toughness, saves,
+        wounds):
+    """
+    Return the exact ``AttackDistribution`` of a weapon against a target.
+
+    All arguments are plain (hashable) values, ``attacks``, ``strength`` and ``damage``
+    being ``(min, max)`` tuples. This is what gets memoized; see ``weapon_distribution`` for
+    a more convenient interface.
+
+    Note:
+        A variable strength is rolled for each attack. Damage exceeding ``wounds`` is lost.
+    """
+    strengths = range_distribution(*strength)
+    wound_chance = float(np.dot(strengths, wound_probability(
+        np.arange(len(strengths), dtype=float), float(toughness))))
+    hit_chance = success_probability(np.nan if skill is None else float(skill))
+    unsaved_chance = unsaved_probability(float(saves), armor_penetration or 0)
+    chance = float(hit_chance * wound_chance * unsaved_chance)
+
+    unsaved = thin(range_distribution(*attacks), chance)
+    damage_per_wound = range_distribution(*damage)
+    if wounds is not None and len(damage_per_wound) > wounds + 1:
+        capped = damage_per_wound[:wounds + 1].copy()
+        capped[wounds] += damage_per_wound[wounds + 1:].sum()
+        damage_per_wound = capped
+    return AttackDistribution(_freeze(unsaved), _freeze(compound(unsaved, damage_per_wound)))
+
+
+def weapon_distribution(weapon, target, skill=4, attacker=None):
+    """
+    Return the exact ``AttackDistribution`` of a weapon profile against a model profile.
+
+    Args:
+        weapon: A ``WeaponProfile`` (or ``codex.WeaponProfileRecord``).
+        target: A ``ModelProfile`` (or ``codex.ModelProfileRecord``).
+        skill (int): The skill to hit with, if no attacker is given.
+        attacker: A ``ModelProfile`` whose balistic skill (ranged weapons) or weapon skill
+            (melee weapons) is used to hit.
+    """
+    if attacker is not None:
+        skill = attacker.weapon_skill if weapon.category == 'Melee' else attacker.balistic_skill
+    return attack_distribution(tuple(weapon.number_of_attacks), tuple(weapon.strength),
+        weapon.armor_penetration, tuple(weapon.damage), skill, target.toughness, target.saves,
+        target.wounds)
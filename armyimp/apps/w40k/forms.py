@@ -1,13 +1,67 @@
 from django import forms
+from django.core.cache import cache
 from django.forms import widgets
+from django.utils.functional import cached_property
 
-from . import models
+from . import catalog, models
+
+
+class UnitModelChoices(object):
+    """
+    ``UnitModel`` choices of a unit, meant to be shared by all forms of a formset.
+
+    The rendered choices are cached per unit and catalog version, so they get invalidated
+    whenever the units models change. Instances are only fetched if a submitted value needs
+    to be cleaned, using a single query for all forms.
+    """
+
+    cache_key_template = 'w40k:unit_model_choices:{unit_pk}:{version}'
+
+    def __init__(self, unit):
+        """Instantiate new choices for ``unit``."""
+        self.unit = unit
+
+    @cached_property
+    def instances(self):
+        """Return a ``{pk: UnitModel}`` dict of all the units models."""
+        return {each.pk: each for each in self.unit.models.select_related('profile')}
+
+    @cached_property
+    def choices(self):
+        """Return the rendered ``(pk, label)`` choices."""
+        key = self.cache_key_template.format(unit_pk=self.unit.pk,
+            version=catalog.get_version())
+        choices = cache.get(key)
+        if choices is None:
+            choices = [(pk, str(instance)) for pk, instance in sorted(self.instances.items())]
+            cache.set(key, choices, None)
+        return choices
+
+
+class UnitModelChoiceField(forms.ModelChoiceField):
+    """A ``ModelChoiceField`` that gets its choices and instances from ``UnitModelChoices``."""
+
+    def set_unit_model_choices(self, unit_model_choices):
+        """Use ``unit_model_choices`` for rendering and cleaning."""
+        self.unit_model_choices = unit_model_choices
+        self.queryset = unit_model_choices.unit.models.all()
+        self.choices = [('', self.empty_label)] + unit_model_choices.choices
+
+    def to_python(self, value):
+        """Return the ``UnitModel`` instance for ``value`` without querying the database."""
+        if value in self.empty_values:
+            return None
+        try:
+            return self.unit_model_choices.instances[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages['invalid_choice'],
+                code='invalid_choice')
 
 
 class ArmyModelForm(forms.ModelForm):
     """Form primarily used to add custom validation."""
 
-    def __init__(self, unit, *args, **kwargs):
+    def __init__(self, unit, *args, unit_model_choices=None, **kwargs):
         """
         Instantiate a new instance.
 
@@ -15,13 +69,24 @@ class ArmyModelForm(forms.ModelForm):
             We require a ``Unit`` instance as an additional argument in order
             to limit the ``model`` queryset to only those ``UnitModel`` instances
             that are viable options for the given unit.
+            All forms of a formset should share one ``UnitModelChoices`` instance
+            (``unit_model_choices``) so choices are only fetched and rendered once.
         """
         super().__init__(*args, **kwargs)
-        self.fields['model'].queryset = unit.models.all()
+        if unit_model_choices is None:
+            unit_model_choices = UnitModelChoices(unit)
+        self.fields['model'].set_unit_model_choices(unit_model_choices)
+
+    def _get_validation_exclusions(self):
+        """Skip the model validation of ``model`` that would query for its existence again."""
+        exclude = super()._get_validation_exclusions()
+        exclude.append('model')
+        return exclude
 
     class Meta:
         model = models.ArmyModel
         fields = ('model',)
+        field_classes = {'model': UnitModelChoiceField}
 
 
 class ArmyUnitForm(forms.ModelForm):
@@ -38,3 +103,24 @@ class ArmyUnitForm(forms.ModelForm):
         model = models.ArmyUnit
         fields = ('army', 'unit', 'name')
         widgets = {'unit': widgets.HiddenInput}
+
+
+class ArmyUnitFilterForm(forms.Form):
+    """Form validating the GET parameters of the ``ArmyUnit`` list."""
+
+    FORMATS = (('html', "HTML"), ('csv', "CSV"))
+
+    army = forms.IntegerField(required=False, min_value=1)
+    category = forms.ChoiceField(required=False,
+        choices=(('', "All categories"),) + models.Unit.UNIT_CATEGORIES)
+    after = forms.IntegerField(required=False, min_value=0, widget=widgets.HiddenInput)
+    format = forms.ChoiceField(required=False, choices=FORMATS)
+
+    def filter(self, queryset):
+        """Return ``queryset`` filtered by army and unit category, if given."""
+        data = self.cleaned_data
+        if data.get('army'):
+            queryset = queryset.filter(army=data['army'])
+        if data.get('category'):
+            queryset = queryset.filter(unit__category=data['category'])
+        return queryset
@@ -0,0 +1,309 @@
+"""
+Streaming import of codex data from JSON-Lines.
+
+Each line holds one object in the same shape Django's serializers use with natural keys::
+
+    {"model": "w40k.item", "fields": {"name": "Boltgun", "comment": ""}}
+    {"model": "w40k.weaponprofile", "fields": {"name": "Boltgun", "weapon": ["Boltgun"], ...}}
+
+Foreign keys and many to many relations are given as natural keys and resolved by the managers
+of the related models. A unit model is identified by its unit, profile and name suffix. As
+``ItemSlot`` has no natural key of its own, item slots are nested in the ``item_slots`` field
+of their unit model.
+
+Lines need to be ordered by dependency, that is objects may only refer to objects of previous
+lines (or the database). Consecutive lines of the same model are imported as one batch:
+all natural keys are resolved with a few ``__in`` lookups and all rows, including those of
+many to many tables, are inserted with ``bulk_create``. Only one batch is kept in memory at a
+time. Objects that already exist are skipped. The summaries of armies carrying items that get
+a new price are rebuilt once all lines have been imported.
+"""
+
+import json
+from collections import OrderedDict
+
+from django.db import connection
+from django.db import models as db_models
+from django.db import transaction
+from django.db.models import F
+
+from . import catalog, models, pricing, slot_options, summaries
+from .utils import chunks
+
+# All models that may be imported, in dependency order. Their managers resolve natural keys.
+IMPORTABLE_MODELS = OrderedDict((model._meta.label_lower, model) for model in (
+    models.Organization,
+    models.Item,
+    models.OrganizationItemIntermediate,
+    models.WeaponProfile,
+    models.WargearList,
+    models.ModelProfile,
+    models.UnitAbility,
+    models.UnitKeyword,
+    models.FactionKeyword,
+    models.Unit,
+    models.UnitModel,
+))
+
+
+class CodexImportError(ValueError):
+    """Raised if the import data is invalid."""
+
+    pass
+
+
+def flatten_key(value):
+    """
+    Return a flat tuple for a natural key as given in import data.
+
+    Natural keys of related objects are flattened as well, so ``[["Ranged"], ["Orks"]]``
+    as well as ``["Ranged", "Orks"]`` both end up as ``("Ranged", "Orks")``.
+    """
+    if isinstance(value, (list, tuple)):
+        result = ()
+        for each in value:
+            result += flatten_key(each)
+        return result
+    return (value,)
+
+
+def get_natural_key_fields(model):
+    """Return the fields making up a models natural key, in ``natural_key()`` order."""
+    return [model._meta.get_field(name) for name in model.objects.natural_key_fields]
+
+
+def get_key_length(model):
+    """Return the length of a models flat natural key."""
+    return sum(get_key_length(field.related_model) if field.is_relation else 1
+        for field in get_natural_key_fields(model))
+
+
+def resolve_natural_keys(model, keys):
+    """
+    Return a ``{key: pk}`` dict for all given (flat) natural keys that exist.
+
+    The natural keys of related objects are resolved first, the keys made of their primary
+    keys are then resolved by the models manager (see ``get_many_by_natural_keys``).
+    """
+    length = get_key_length(model)
+    # ``{flat_key: natural_key}``, dropping keys with related objects that do not exist.
+    natural_keys = {key: () for key in keys if len(key) == length}
+    start = 0
+    for field in get_natural_key_fields(model):
+        if field.is_relation:
+            end = start + get_key_length(field.related_model)
+            pks = resolve_natural_keys(field.related_model,
+                {key[start:end] for key in natural_keys})
+            natural_keys = {key: value + (pks[key[start:end]],)
+                for key, value in natural_keys.items() if key[start:end] in pks}
+        else:
+            end = start + 1
+            natural_keys = {key: value + (key[start],) for key, value in natural_keys.items()}
+        start = end
+    instances = model.objects.get_many_by_natural_keys(natural_keys.values())
+    return {key: instances[value].pk for key, value in natural_keys.items()
+        if value in instances}
+
+
+class CodexImporter(object):
+    """
+    Import codex data from JSON-Lines.
+
+    Attributes:
+        counts (collections.OrderedDict): ``{label: [created, skipped]}`` per imported model.
+        army_pks (set): Primary keys of armies whose points changed due to new prices.
+    """
+
+    def __init__(self, batch_size=500):
+        """Instantiate a new importer that imports up to ``batch_size`` objects at once."""
+        self.batch_size = batch_size
+        self.counts = OrderedDict()
+        self.army_pks = set()
+
+    def import_lines(self, lines):
+        """Import all objects from an iterable of JSON-Lines (e.g. a file object)."""
+        model, batch = None, []
+        with transaction.atomic():
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                line_model, fields = self.parse_line(number, line)
+                if batch and (line_model is not model or len(batch) >= self.batch_size):
+                    self.import_batch(model, batch)
+                    batch = []
+                model = line_model
+                batch.append((number, fields))
+            if batch:
+                self.import_batch(model, batch)
+            # ``bulk_create`` does not send any signals, so we need to take care of this
+            # ourselves.
+            for army_pks in chunks(sorted(self.army_pks), self.batch_size):
+                summaries.rebuild(army_pks)
+        for invalidate in (catalog.bump_version, pricing.invalidate):
+            invalidate()
+            transaction.on_commit(invalidate)
+        return self.counts
+
+    def parse_line(self, number, line):
+        """Return the model and fields of a line."""
+        try:
+            data = json.loads(line)
+            model = IMPORTABLE_MODELS[data['model'].lower()]
+            fields = data['fields']
+        except ValueError as error:
+            raise CodexImportError("Line {}: Invalid JSON ({}).".format(number, error))
+        except (KeyError, TypeError, AttributeError):
+            raise CodexImportError("Line {}: Expected an object with a valid 'model' and"
+                " 'fields' entry.".format(number))
+        return model, fields
+
+    def get_key(self, model, fields):
+        """Return the flat natural key of an object given as import data."""
+        result = ()
+        for field in get_natural_key_fields(model):
+            result += flatten_key(fields.get(field.name, ''))
+        return result
+
+    def resolve(self, model, rows, name):
+        """
+        Resolve the natural keys given in field ``name`` of all rows.
+
+        Returns:
+            dict: ``{key: pk}``
+
+        Raises:
+            CodexImportError: If any key can not be resolved.
+        """
+        keys = {}
+        for number, fields in rows:
+            values = fields.get(name)
+            if values is None:
+                continue
+            if isinstance(model._meta.get_field(name), db_models.ManyToManyField):
+                for value in values:
+                    keys.setdefault(flatten_key(value), number)
+            else:
+                keys.setdefault(flatten_key(values), number)
+        related_model = model._meta.get_field(name).related_model
+        result = resolve_natural_keys(related_model, keys)
+        for key, number in sorted(keys.items(), key=lambda each: each[1]):
+            if key not in result:
+                raise CodexImportError("Line {}: There is no {} with natural key {}.".format(
+                    number, related_model._meta.label_lower, list(key)))
+        return result
+
+    def import_batch(self, model, batch):
+        """Import a batch of objects of the same model."""
+        counts = self.counts.setdefault(model._meta.label_lower, [0, 0])
+        foreign_keys = [field for field in model._meta.concrete_fields
+            if field.is_relation]
+        many_to_many = [field for field in model._meta.many_to_many
+            if field.remote_field.through._meta.auto_created]
+
+        resolved = {field.name: self.resolve(model, batch, field.name)
+            for field in foreign_keys}
+
+        existing = resolve_natural_keys(model, (self.get_key(model, fields)
+            for number, fields in batch))
+        rows, instances = OrderedDict(), []
+        for number, fields in batch:
+            key = self.get_key(model, fields)
+            if key in existing or key in rows:
+                counts[1] += 1
+                continue
+            rows[key] = (number, fields)
+            instances.append(self.build_instance(model, number, fields, resolved))
+
+        model.objects.bulk_create(instances, batch_size=self.batch_size)
+        pks = resolve_natural_keys(model, rows.keys())
+        counts[0] += len(instances)
+
+        for field in many_to_many:
+            self.import_many_to_many(model, field, rows, pks)
+        if model is models.UnitModel:
+            self.import_item_slots(rows, pks)
+        if model is models.OrganizationItemIntermediate and pks:
+            self.collect_priced_armies(pks.values())
+
+    def build_instance(self, model, number, fields, resolved):
+        """Return a new, unsaved instance from import data."""
+        kwargs = {}
+        for name, value in fields.items():
+            if model is models.UnitModel and name == 'item_slots':
+                continue
+            try:
+                field = model._meta.get_field(name)
+            except db_models.FieldDoesNotExist:
+                field = None
+            if field is None or field.auto_created:
+                raise CodexImportError("Line {}: {} has no field {}.".format(
+                    number, model._meta.label_lower, name))
+            if field.many_to_many:
+                continue
+            if field.is_relation:
+                kwargs[field.attname] = (resolved[name][flatten_key(value)]
+                    if value is not None else None)
+            else:
+                kwargs[name] = value
+        return model(**kwargs)
+
+    def import_many_to_many(self, model, field, rows, pks):
+        """Insert all relations of a many to many field for the given rows at once."""
+        resolved = self.resolve(model, rows.values(), field.name)
+        through = field.remote_field.through
+        source = '{}_id'.format(field.m2m_field_name())
+        target = '{}_id'.format(field.m2m_reverse_field_name())
+        relations = []
+        for key, (number, fields) in rows.items():
+            for value in fields.get(field.name) or ():
+                relations.append(through(**{
+                    source: pks[key], target: resolved[flatten_key(value)]}))
+        through.objects.bulk_create(relations, batch_size=self.batch_size)
+
+    def import_item_slots(self, rows, pks):
+        """Insert the item slots nested in unit model rows, including their options."""
+        slot_rows = []
+        for key, (number, fields) in rows.items():
+            for slot in fields.get('item_slots') or ():
+                slot_rows.append((number, dict(slot, model=pks[key])))
+        if not slot_rows:
+            return
+
+        defaults = self.resolve(models.ItemSlot, slot_rows, 'default')
+        slots = []
+        for number, fields in slot_rows:
+            default = fields.get('default')
+            slots.append(models.ItemSlot(model_id=fields['model'],
+                default_id=defaults[flatten_key(default)] if default else None,
+                min_amount=fields.get('min_amount', 1), max_amount=fields.get('max_amount', 1)))
+
+        if connection.features.can_return_ids_from_bulk_insert:
+            models.ItemSlot.objects.bulk_create(slots, batch_size=self.batch_size)
+        else:
+            # Without returned primary keys we could not link the slots options.
+            for slot in slots:
+                slot.save()
+
+        for name in ('options', 'option_from_list'):
+            field = models.ItemSlot._meta.get_field(name)
+            resolved = self.resolve(models.ItemSlot, slot_rows, name)
+            through = field.remote_field.through
+            relations = []
+            for slot, (number, fields) in zip(slots, slot_rows):
+                for value in fields.get(name) or ():
+                    relations.append(through(**{
+                        '{}_id'.format(field.m2m_field_name()): slot.pk,
+                        '{}_id'.format(field.m2m_reverse_field_name()): resolved[
+                            flatten_key(value)],
+                    }))
+            through.objects.bulk_create(relations, batch_size=self.batch_size)
+        # Again, ``bulk_create`` does not send any signals.
+        slot_options.refresh(slot.pk for slot in slots)
+
+    def collect_priced_armies(self, price_pks):
+        """Remember all armies carrying items of the given new prices."""
+        self.army_pks.update(models.ArmyModelItemSlot.objects.filter(
+            item__organizationitemintermediate__in=price_pks,
+            item__organizationitemintermediate__organization=F(
+                'army_model__unit__unit__organization'),
+        ).values_list('army_model__unit__army', flat=True).distinct())
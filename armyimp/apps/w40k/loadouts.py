@@ -0,0 +1,204 @@
+"""
+Enumeration and counting of unit model loadouts.
+
+A loadout is everything a model carries, given as a sorted tuple of ``(item_pk, amount)``.
+Each item slot takes between its ``min_amount`` and ``max_amount`` items out of its default,
+its options and the items of its wargear lists, so a slot contributes every multiset of that
+size.
+
+As carried items are not linked to slots (see ``validation``), different slot choices may end
+up as the same loadout, but only if their slots share eligible items. Slots are therefore
+grouped into components of overlapping slots. Components are independent of each other, so
+the amount of loadouts is the product of the amount of each component and any loadout can be
+found by its index without enumerating those before it. Single slot components are counted
+and indexed in closed form, only components of several slots are enumerated (once, with
+duplicates removed) to count them.
+
+Note:
+    Slots without a ``max_amount`` take up to ``max(min_amount, 1)`` items, as there would
+    be infinitely many loadouts otherwise.
+"""
+
+from collections import Counter
+from itertools import chain, combinations_with_replacement, product
+
+from . import codex
+
+
+def _multisets(size, amount):
+    """Return the amount of multisets of ``amount`` elements out of ``size`` ones."""
+    if not size:
+        return 0 if amount else 1
+    result = 1
+    for each in range(amount):
+        result = result * (size + each) // (each + 1)
+    return result
+
+
+def get_slot_items(slot):
+    """Return the sorted primary keys of all items an ``ItemSlotRecord`` may take."""
+    return tuple(sorted(slot.eligible_item_pks))
+
+
+def get_slot_amounts(slot):
+    """Return the ``range`` of amounts of items an ``ItemSlotRecord`` takes."""
+    minimum = slot.min_amount or 0
+    maximum = slot.max_amount if slot.max_amount is not None else max(minimum, 1)
+    return range(minimum, maximum + 1)
+
+
+def _as_loadout(items):
+    """Return the loadout of an iterable of item primary keys."""
+    return tuple(sorted(Counter(items).items()))
+
+
+class SlotComponent(object):
+    """All loadouts of a single item slot, counted and indexed in closed form."""
+
+    def __init__(self, slot):
+        """Instantiate a new component for an ``ItemSlotRecord``."""
+        self.items = get_slot_items(slot)
+        self.counts = [(amount, _multisets(len(self.items), amount))
+            for amount in get_slot_amounts(slot)]
+        self.count = sum(count for amount, count in self.counts)
+
+    def __iter__(self):
+        """Yield all loadouts, fewest items first."""
+        for amount, count in self.counts:
+            for items in combinations_with_replacement(self.items, amount):
+                yield _as_loadout(items)
+
+    def __getitem__(self, index):
+        """Return the loadout at ``index`` of ``__iter__``."""
+        for amount, count in self.counts:
+            if index < count:
+                break
+            index -= count
+        else:
+            raise IndexError(index)
+        # Pick items in lexicographic order of ``combinations_with_replacement``.
+        items, first = [], 0
+        for remaining in range(amount, 0, -1):
+            for position in range(first, len(self.items)):
+                following = _multisets(len(self.items) - position, remaining - 1)
+                if index < following:
+                    break
+                index -= following
+            items.append(self.items[position])
+            first = position
+        return _as_loadout(items)
+
+
+class MergedComponent(object):
+    """All distinct loadouts of several item slots sharing eligible items."""
+
+    def __init__(self, slots):
+        """Instantiate a new component for ``ItemSlotRecord`` instances."""
+        self.slots = [SlotComponent(slot) for slot in slots]
+        self._loadouts = None
+
+    def __iter__(self):
+        """Yield all distinct loadouts, lazily."""
+        if self._loadouts is not None:
+            yield from self._loadouts
+            return
+        seen = set()
+        for parts in product(*self.slots):
+            loadout = _merge(parts)
+            if loadout not in seen:
+                seen.add(loadout)
+                yield loadout
+
+    @property
+    def loadouts(self):
+        """Return the list of all distinct loadouts, enumerating them on first access."""
+        if self._loadouts is None:
+            self._loadouts = list(self)
+        return self._loadouts
+
+    @property
+    def count(self):
+        """Return the amount of distinct loadouts."""
+        return len(self.loadouts)
+
+    def __getitem__(self, index):
+        """Return the loadout at ``index`` of ``__iter__``."""
+        return self.loadouts[index]
+
+
+def _merge(loadouts):
+    """Return the sum of several loadouts."""
+    total = Counter()
+    for loadout in loadouts:
+        for item_pk, amount in loadout:
+            total[item_pk] += amount
+    return tuple(sorted(total.items()))
+
+
+def get_components(slots):
+    """Return the item slots grouped into lists of slots sharing any eligible items."""
+    groups = []
+    for slot in slots:
+        items = set(get_slot_items(slot))
+        merged = [slot]
+        for group in [group for group in groups if group[0] & items]:
+            groups.remove(group)
+            items |= group[0]
+            merged = group[1] + merged
+        groups.append((items, merged))
+    groups = [sorted(group, key=lambda slot: slot.pk) for items, group in groups]
+    return sorted(groups, key=lambda group: group[0].pk)
+
+
+class LoadoutEnumerator(object):
+    """
+    All legal loadouts of a unit model.
+
+    Loadouts are enumerated lazily by iterating, counted with ``len`` and indexed or sliced
+    like a list, which makes paging cheap regardless of the page.
+    """
+
+    def __init__(self, unit_model):
+        """Instantiate a new enumerator for a ``UnitModelRecord``."""
+        self.unit_model = unit_model
+        self.components = [SlotComponent(group[0]) if len(group) == 1 else
+            MergedComponent(group) for group in get_components(unit_model.item_slots)]
+
+    def __len__(self):
+        """Return the amount of loadouts."""
+        result = 1
+        for component in self.components:
+            result *= component.count
+        return result
+
+    def __iter__(self):
+        """Yield all loadouts, in the order of ``__getitem__``."""
+        # Merged components are enumerated once only, not once per loadout of the others.
+        components = [component.loadouts if isinstance(component, MergedComponent) else
+            component for component in self.components]
+        for parts in product(*components):
+            yield tuple(sorted(chain.from_iterable(parts)))
+
+    def __getitem__(self, index):
+        """Return the loadout at ``index`` or a list of loadouts for a slice."""
+        if isinstance(index, slice):
+            return [self[each] for each in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        result = ()
+        for component in reversed(self.components):
+            index, position = divmod(index, component.count)
+            result = component[position] + result
+        return tuple(sorted(result))
+
+
+def get_loadouts(unit_model_pk):
+    """
+    Return the ``LoadoutEnumerator`` of a ``UnitModel``.
+
+    Raises:
+        KeyError: If there is no such unit model.
+    """
+    return LoadoutEnumerator(codex.get_snapshot().unit_models[unit_model_pk])
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from armyimp.apps.w40k import importers
+
+
+class Command(BaseCommand):
+    """Import codex data from a JSON-Lines file."""
+
+    help = ("Import codex data from a JSON-Lines file ordered by dependency."
+        " Objects that already exist are skipped.")
+
+    def add_arguments(self, parser):
+        """Add command specific arguments."""
+        parser.add_argument('path', help="Path of the file to import or '-' to read from stdin.")
+        parser.add_argument('--batch-size', type=int, default=500,
+            help="Maximum amount of objects to import at once.")
+
+    def handle(self, *args, **options):
+        """Import the given file, all or nothing."""
+        importer = importers.CodexImporter(batch_size=options['batch_size'])
+        try:
+            if options['path'] == '-':
+                counts = importer.import_lines(sys.stdin)
+            else:
+                with open(options['path'], encoding='utf-8') as lines:
+                    counts = importer.import_lines(lines)
+        except importers.CodexImportError as error:
+            raise CommandError(str(error))
+        for label, (created, skipped) in counts.items():
+            self.stdout.write("{}: {} created, {} skipped.".format(label, created, skipped))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from armyimp.apps.w40k import codex, memo
+
+
+class Command(BaseCommand):
+    """Compute and store the expected damage of all weapon profiles against all models."""
+
+    help = ("Compute the expected damage of every weapon profile against every model profile"
+        " for all skills used by the codex, so later lookups need no computation.")
+
+    def add_arguments(self, parser):
+        """Add command specific arguments."""
+        parser.add_argument('--skill', type=int, action='append', dest='skills',
+            help="Skill to compute results for. May be given multiple times. Defaults to 4"
+                " and all balistic and weapon skills of the codex.")
+        parser.add_argument('--chunk-size', type=int, default=100,
+            help="Amount of weapon profiles to compute at once.")
+
+    def handle(self, *args, **options):
+        """Compute all missing results, chunk by chunk."""
+        snapshot = codex.get_snapshot()
+        skills = options['skills']
+        if not skills:
+            skills = {4}
+            for profile in snapshot.model_profiles.values():
+                skills.update((profile.weapon_skill, profile.balistic_skill))
+            skills = {memo.NEVER if skill is None else skill for skill in skills}
+        weapons = [snapshot.weapon_profiles[pk] for pk in sorted(snapshot.weapon_profiles)]
+        targets = [snapshot.model_profiles[pk] for pk in sorted(snapshot.model_profiles)]
+        chunk_size = options['chunk_size']
+        for skill in sorted(skills):
+            for start in range(0, len(weapons), chunk_size):
+                memo.expected_damage(weapons[start:start + chunk_size], targets, skill=skill)
+            self.stdout.write("Computed skill {} for {} weapons and {} targets.".format(
+                skill, len(weapons), len(targets)))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from armyimp.apps.w40k import models, summaries
+
+
+class Command(BaseCommand):
+    """Recompute all ``ArmySummary`` and ``ArmyUnitSummary`` rows from scratch."""
+
+    help = "Recompute all army summaries from scratch. Use this to recover from inconsistencies."
+
+    def add_arguments(self, parser):
+        """Add command specific arguments."""
+        parser.add_argument('--chunk-size', type=int, default=500,
+            help="Amount of armies to rebuild within one transaction.")
+
+    def handle(self, *args, **options):
+        """Rebuild summaries in chunks of armies ordered by primary key."""
+        chunk_size = options['chunk_size']
+        last_pk, total = 0, 0
+        while True:
+            pks = list(models.Army.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                summaries.rebuild(pks)
+            last_pk = pks[-1]
+            total += len(pks)
+            self.stdout.write("Rebuilt summaries for {} armies.".format(total))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from armyimp.apps.w40k import slot_options
+
+
+class Command(BaseCommand):
+    """Recompute all ``ItemSlotOption`` rows from scratch."""
+
+    help = ("Recompute the effective options of all item slots. Use this to recover from"
+        " inconsistencies.")
+
+    def handle(self, *args, **options):
+        """Rebuild all rows within one transaction."""
+        with transaction.atomic():
+            slot_options.refresh()
+        self.stdout.write("Rebuilt effective options of all item slots.")
@@ -1,7 +1,77 @@
 from django.db import models
-
-
-class WeaponProfileManager(models.Manager):
+from django.db.models import functions
+
+from .utils import QUERY_CHUNK_SIZE, chunks
+
+
+class NaturalKeyManagerMixin(object):
+    """
+    Manager mixin to fetch many instances by their natural keys at once.
+
+    Attributes:
+        natural_key_fields (tuple): Names of the fields making up the natural key, in the
+            same order as returned by the models ``natural_key`` method.
+        natural_key_chunk_size (int): Maximum amount of query parameters per query. This
+            keeps us well below the limits of all database backends.
+    """
+
+    natural_key_fields = ('name',)
+    natural_key_chunk_size = QUERY_CHUNK_SIZE
+
+    def _normalize_natural_key(self, key):
+        """Return ``key`` as tuple with related instances replaced by their primary keys."""
+        if not isinstance(key, (tuple, list)):
+            key = (key,)
+        return tuple(getattr(value, 'pk', value) for value in key)
+
+    def get_many_by_natural_keys(self, keys, memo=None):
+        """
+        Return many instances by their natural keys.
+
+        Args:
+            keys (iterable): Natural keys as accepted by ``get_by_natural_key`` either as tuple
+                or, for single field natural keys, as plain value.
+            memo (dict, optional): If given, instances are looked up in and stored to this
+                dict first. Passing the same dict for the whole request ensures no natural
+                key is resolved by the database twice. Unknown keys are memorized as well.
+
+        Returns:
+            dict: ``{key: instance}`` for all keys that could be resolved. Keys are returned
+            the way they have been passed.
+        """
+        result, missing = {}, {}
+        for key in keys:
+            normalized = self._normalize_natural_key(key)
+            memo_key = (self.model, normalized)
+            if memo is not None and memo_key in memo:
+                if memo[memo_key] is not None:
+                    result[key] = memo[memo_key]
+            else:
+                missing.setdefault(normalized, []).append(key)
+
+        attnames = [self.model._meta.get_field(name).attname for name in self.natural_key_fields]
+        chunk_size = max(self.natural_key_chunk_size // len(attnames), 1)
+        # ``missing`` shrinks while we go, so chunk a copy of its keys.
+        for chunk in chunks(list(missing), chunk_size):
+            filters = {'{}__in'.format(attname): {key[index] for key in chunk}
+                for index, attname in enumerate(attnames)}
+            for instance in self.filter(**filters):
+                normalized = tuple(getattr(instance, attname) for attname in attnames)
+                if normalized not in missing:
+                    # Composite keys may match combinations that have not been asked for.
+                    continue
+                for key in missing.pop(normalized):
+                    result[key] = instance
+                if memo is not None:
+                    memo[(self.model, normalized)] = instance
+
+        if memo is not None:
+            for normalized in missing:
+                memo[(self.model, normalized)] = None
+        return result
+
+
+class WeaponProfileManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``WeaponProfile``."""
 
     def get_by_natural_key(self, name):
@@ -9,7 +79,7 @@ class WeaponProfileManager(models.Manager):
         return self.get(name=name)
 
 
-class ItemManager(models.Manager):
+class ItemManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``Item``."""
 
     def get_by_natural_key(self, name):
@@ -17,15 +87,17 @@ class ItemManager(models.Manager):
         return self.get(name=name)
 
 
-class OrganizationItemIntermediateManager(models.Manager):
+class OrganizationItemIntermediateManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``Item``."""
 
+    natural_key_fields = ('organization', 'item')
+
     def get_by_natural_key(self, organization, item):
         """Return an instance by its natural key."""
         return self.get(organization=organization, item=item)
 
 
-class OrganizationManager(models.Manager):
+class OrganizationManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``Organization``."""
 
     def get_by_natural_key(self, name):
@@ -33,15 +105,27 @@ class OrganizationManager(models.Manager):
         return self.get(name=name)
 
 
-class WargearListManager(models.Manager):
+class WargearListManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``WargearList``."""
 
+    natural_key_fields = ('name', 'organization')
+
     def get_by_natural_key(self, name, organization):
         """Return an instance by its natural key."""
         return self.get(name=name, organization=organization)
 
 
-class ModelProfileManager(models.Manager):
+class UnitModelManager(NaturalKeyManagerMixin, models.Manager):
+    """Custom manager class for ``UnitModel``."""
+
+    natural_key_fields = ('unit', 'profile', 'name_suffix')
+
+    def get_by_natural_key(self, unit, profile, name_suffix):
+        """Return an instance by its natural key."""
+        return self.get(unit=unit, profile=profile, name_suffix=name_suffix)
+
+
+class ModelProfileManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``ModelProfile``."""
 
     def get_by_natural_key(self, name):
@@ -49,7 +133,38 @@ class ModelProfileManager(models.Manager):
         return self.get(name=name)
 
 
-class UnitManager(models.Manager):
+class UnitQuerySet(models.QuerySet):
+    """Custom queryset class for ``Unit``."""
+
+    def with_datasheet(self):
+        """
+        Return a queryset that fetches each units complete datasheet.
+
+        The organization, models, their profiles, item slots, their defaults and effective
+        options, the weapon profiles of those items as well as all abilities and keywords are
+        fetched with one query per level, no matter how many units are included (see
+        ``datasheets``). Related objects are ordered, so datasheets are stable.
+
+        The effective options include the slots options and wargear lists, so those are not
+        prefetched on their own. ``UnitViewSet`` prefetches by the requested shape instead.
+        """
+        from .models import ItemSlot, ItemSlotOption, UnitModel, WeaponProfile
+
+        return self.select_related('organization').prefetch_related(
+            models.Prefetch('models', UnitModel.objects.select_related('profile').order_by('pk')),
+            models.Prefetch('models__item_slots',
+                ItemSlot.objects.select_related('default').order_by('pk')),
+            models.Prefetch('models__item_slots__effective_options',
+                ItemSlotOption.objects.select_related('item').order_by('item__name')),
+            models.Prefetch('models__item_slots__effective_options__item__weapon_profiles',
+                WeaponProfile.objects.order_by('pk')),
+            'abilities',
+            'keywords',
+            'faction_keywords',
+        )
+
+
+class UnitManager(NaturalKeyManagerMixin, models.Manager.from_queryset(UnitQuerySet)):
     """Custom manager class for ``Unit``."""
 
     def get_by_natural_key(self, name):
@@ -57,7 +172,7 @@ class UnitManager(models.Manager):
         return self.get(name=name)
 
 
-class UnitAbilityManager(models.Manager):
+class UnitAbilityManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``UnitAbility``."""
 
     def get_by_natural_key(self, name):
@@ -65,7 +180,7 @@ class UnitAbilityManager(models.Manager):
         return self.get(name=name)
 
 
-class UnitKeywordManager(models.Manager):
+class UnitKeywordManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``UnitKeyword``."""
 
     def get_by_natural_key(self, name):
@@ -73,7 +188,7 @@ class UnitKeywordManager(models.Manager):
         return self.get(name=name)
 
 
-class FactionKeywordManager(models.Manager):
+class FactionKeywordManager(NaturalKeyManagerMixin, models.Manager):
     """Custom manager class for ``FactionKeyword``."""
 
     def get_by_natural_key(self, name):
@@ -81,9 +196,60 @@ class FactionKeywordManager(models.Manager):
         return self.get(name=name)
 
 
-class ArmyManager(models.Manager):
+class ArmyQuerySet(models.QuerySet):
+    """Custom queryset class for ``Army``."""
+
+    def with_summary(self):
+        """Return a queryset that fetches each armies summary along with the army."""
+        return self.select_related('summary')
+
+    def with_roster(self):
+        """
+        Return a queryset that fetches each armies complete roster.
+
+        Summaries, units, their models and items are fetched with a constant amount of
+        queries, no matter how many armies are included.
+        """
+        return self.with_summary().prefetch_related(
+            'units__summary',
+            'units__models__armymodelitemslot_set',
+        )
+
+
+class ArmyManager(NaturalKeyManagerMixin, models.Manager.from_queryset(ArmyQuerySet)):
     """Custom manager class for ``Army``."""
 
     def get_by_natural_key(self, name):
         """Return an instance by its natural key."""
         return self.get(name=name)
+
+
+class ArmyUnitQuerySet(models.QuerySet):
+    """Custom queryset class for ``ArmyUnit``."""
+
+    def with_roster(self):
+        """
+        Return a queryset that fetches each army units summary, models and their items.
+
+        The amount of queries is constant, no matter how many army units are included.
+        """
+        return self.select_related('summary').prefetch_related(
+            'models__armymodelitemslot_set')
+
+    def with_listing(self):
+        """
+        Return a queryset that fetches each army units unit and army along with it.
+
+        The amount of models and points are annotated from the army units summary, so listing
+        army units takes a single query.
+        """
+        return self.select_related('unit', 'army').annotate(
+            model_count=functions.Coalesce('summary__model_count', 0),
+            points=functions.Coalesce('summary__points', 0),
+        )
+
+
+class ArmyUnitManager(models.Manager.from_queryset(ArmyUnitQuerySet)):
+    """Custom manager class for ``ArmyUnit``."""
+
+    pass
@@ -0,0 +1,140 @@
+"""
+Vectorized expected damage ("mathhammer").
+
+All weapon and model profiles are turned into NumPy arrays, so the expected outcome of every
+weapon against every target profile is computed in a handful of array operations instead of
+one Python loop iteration per pair.
+
+An attack sequence follows the usual steps: roll to hit against the attackers balistic skill
+(ranged weapons) or weapon skill (melee weapons), roll to wound comparing the weapons strength
+to the targets toughness, the target rolls its armour save modified by the weapons armour
+penetration and each unsaved wound inflicts the weapons damage. Damage exceeding a models
+wounds is lost.
+
+Note:
+    Variable characteristics (``RangeTuple``) like D6 or 2D3 are given by their minimum and
+    maximum only. Their expected value, which is all we need for attacks, is exact as sums of
+    dice are symmetric. Strength and damage affect the outcome non-linearly (by the wound table
+    and by being capped at the targets wounds). For those we assume each value in range to be
+    equally likely, which is exact for single dice and an approximation otherwise.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+DamageMatrix = namedtuple('DamageMatrix', ('weapons', 'targets', 'hits', 'wounds', 'damage',
+    'kills'))
+DamageMatrix.__doc__ = """
+Expected outcome of every weapon profile against every target profile.
+
+Attributes:
+    weapons (tuple): The weapon profiles, one per row.
+    targets (tuple): The target model profiles, one per column.
+    hits (numpy.ndarray): Expected hits per weapon, shape ``(weapons,)``.
+    wounds (numpy.ndarray): Expected unsaved wounds, shape ``(weapons, targets)``.
+    damage (numpy.ndarray): Expected damage inflicted, shape ``(weapons, targets)``.
+    kills (numpy.ndarray): Expected models slain, shape ``(weapons, targets)``.
+"""
+
+
+def _array(values):
+    """Return a float array of ``values``, ``None`` becoming ``nan``."""
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def _range_grid(minimum, maximum):
+    """
+    Return all values of integer ranges as a padded grid.
+
+    Returns:
+        tuple: ``(values, mask)``, both of shape ``(len(minimum), widest range)``. ``mask`` is
+            ``True`` where ``values`` belongs to the range of its row.
+    """
+    width = int(np.max(maximum - minimum)) + 1 if len(minimum) else 1
+    values = minimum[:, np.newaxis] + np.arange(width)[np.newaxis, :]
+    return values, values <= maximum[:, np.newaxis]
+
+
+def _masked_mean(values, mask):
+    """Return the mean of ``values`` (weapons, range, targets) over each weapons range."""
+    mask = mask[:, :, np.newaxis]
+    return (values * mask).sum(axis=1) / mask.sum(axis=1)
+
+
+def success_probability(needed):
+    """Return the probability to roll at least ``needed`` on a D6, ``nan`` meaning never."""
+    needed = np.clip(needed, 2, 7)
+    return np.where(np.isnan(needed), 0.0, (7 - needed) / 6)
+
+
+def wound_probability(strength, toughness):
+    """Return the probability to wound, broadcasting ``strength`` against ``toughness``."""
+    strength, toughness = np.broadcast_arrays(strength, toughness)
+    needed = np.select(
+        [strength >= 2 * toughness, strength > toughness, strength == toughness,
+            2 * strength <= toughness],
+        [2, 3, 4, 6], default=5)
+    return success_probability(needed.astype(float))
+
+
+def unsaved_probability(saves, armor_penetration):
+    """
+    Return the probability of a failed save, broadcasting ``saves`` and armour penetration.
+
+    Armour penetration worsens the save by its absolute value, no matter its sign.
+    """
+    modified = saves + np.abs(np.nan_to_num(armor_penetration))
+    return 1 - success_probability(modified)
+
+
+def expected_damage(weapons, targets, skill=4, attacker=None):
+    """
+    Return the expected outcome of every weapon against every target.
+
+    Args:
+        weapons (sequence): ``WeaponProfile`` instances (or ``codex.WeaponProfileRecord``).
+        targets (sequence): ``ModelProfile`` instances (or ``codex.ModelProfileRecord``).
+        skill (int): The skill (e.g. ``3`` for 3+) to hit with, if no attacker is given.
+        attacker: A ``ModelProfile`` whose balistic skill (ranged weapons) or weapon skill
+            (melee weapons) is used to hit.
+
+    Returns:
+        DamageMatrix
+    """
+    weapons, targets = tuple(weapons), tuple(targets)
+
+    attacks = np.mean([_array(w.number_of_attacks_min for w in weapons),
+        _array(w.number_of_attacks_max for w in weapons)], axis=0)
+    if attacker is None:
+        to_hit = np.full(len(weapons), float(skill))
+    else:
+        melee = np.array([w.category == 'Melee' for w in weapons], dtype=bool)
+        to_hit = np.where(melee, _array([attacker.weapon_skill]),
+            _array([attacker.balistic_skill]))
+    hits = attacks * success_probability(to_hit)
+
+    toughness = _array(t.toughness for t in targets)
+    strength, strength_mask = _range_grid(_array(w.strength_min for w in weapons),
+        _array(w.strength_max for w in weapons))
+    # Average the wound probability over each weapons strength values: (weapons, targets).
+    wound_chance = wound_probability(strength[:, :, np.newaxis],
+        toughness[np.newaxis, np.newaxis, :])
+    wound_chance = _masked_mean(wound_chance, strength_mask)
+
+    unsaved_chance = unsaved_probability(_array(t.saves for t in targets)[np.newaxis, :],
+        _array(w.armor_penetration for w in weapons)[:, np.newaxis])
+    wounds = hits[:, np.newaxis] * wound_chance * unsaved_chance
+
+    target_wounds = _array(t.wounds for t in targets)
+    damage, damage_mask = _range_grid(_array(w.damage_min for w in weapons),
+        _array(w.damage_max for w in weapons))
+    # Damage beyond a models wounds is lost: (weapons, targets).
+    effective_damage = np.minimum(damage[:, :, np.newaxis],
+        target_wounds[np.newaxis, np.newaxis, :])
+    effective_damage = _masked_mean(effective_damage, damage_mask)
+
+    damage = wounds * effective_damage
+    target_wounds = np.broadcast_to(target_wounds[np.newaxis, :], damage.shape)
+    kills = np.divide(damage, target_wounds, out=np.zeros_like(damage), where=target_wounds > 0)
+    return DamageMatrix(weapons, targets, hits, wounds, damage, kills)
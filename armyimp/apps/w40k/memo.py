@@ -0,0 +1,161 @@
+"""
+Persistent memo table of expected damage.
+
+The expected outcome of a weapon profile against a model profile only depends on a few stats
+of both and the skill to hit with. Each result is stored as an ``ExpectedDamage`` row keyed by
+a hash of the weapons stats, a hash of the targets stats and the skill. Lookups therefore
+read rows for all pairs at once and only pairs never seen before get computed (by
+``mathhammer``) and stored.
+
+As stats are part of the key, changing a profile never hits outdated rows. The signal
+handlers in ``signals.py`` delete rows of stats no longer in use right away, to keep the
+table small. Use the ``prefill_expected_damage`` management command to compute the whole
+codex in advance.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+
+import numpy as np
+from django.db import IntegrityError, transaction
+
+from . import mathhammer, models
+from .utils import QUERY_CHUNK_SIZE, chunks
+
+WEAPON_FIELDS = ('number_of_attacks_min', 'number_of_attacks_max', 'strength_min',
+    'strength_max', 'armor_penetration', 'damage_min', 'damage_max')
+TARGET_FIELDS = ('toughness', 'saves', 'wounds')
+
+# Stored in place of a missing skill, it fails just the same.
+NEVER = 7
+
+
+def get_key(values):
+    """Return the hash of a sequence of stats."""
+    return hashlib.sha1(json.dumps(list(values)).encode()).hexdigest()
+
+
+def get_weapon_key(weapon):
+    """Return the hash of a ``WeaponProfile`` (or record)."""
+    return get_key(getattr(weapon, name) for name in WEAPON_FIELDS)
+
+
+def get_target_key(target):
+    """Return the hash of a ``ModelProfile`` (or record)."""
+    return get_key(getattr(target, name) for name in TARGET_FIELDS)
+
+
+def get_skill(weapon, skill=4, attacker=None):
+    """Return the skill a weapon hits with, just like ``mathhammer.expected_damage``."""
+    if attacker is not None:
+        skill = attacker.weapon_skill if weapon.category == 'Melee' else attacker.balistic_skill
+    return NEVER if skill is None else skill
+
+
+def lookup(keys):
+    """
+    Return stored rows for ``(weapon_key, target_key, skill)`` tuples.
+
+    Returns:
+        dict: ``{(weapon_key, target_key, skill): (hits, wounds, damage, kills)}``
+    """
+    keys = set(keys)
+    weapon_keys = {key[0] for key in keys}
+    target_keys = {key[1] for key in keys}
+    result = {}
+    # Each query takes a chunk of weapon and of target keys.
+    for weapon_chunk in chunks(weapon_keys, QUERY_CHUNK_SIZE // 2):
+        for target_chunk in chunks(target_keys, QUERY_CHUNK_SIZE // 2):
+            for row in models.ExpectedDamage.objects.filter(weapon_key__in=weapon_chunk,
+                    target_key__in=target_chunk).values_list('weapon_key', 'target_key',
+                    'skill', 'hits', 'wounds', 'damage', 'kills'):
+                if row[:3] in keys:
+                    result[row[:3]] = row[3:]
+    return result
+
+
+def compute(pairs):
+    """
+    Compute and store results for ``(weapon, target, skill)`` tuples.
+
+    Returns:
+        dict: Just like ``lookup``.
+    """
+    weapons_by_skill, targets_by_skill = defaultdict(dict), defaultdict(dict)
+    for weapon, target, skill in pairs:
+        weapons_by_skill[skill].setdefault(get_weapon_key(weapon), weapon)
+        targets_by_skill[skill].setdefault(get_target_key(target), target)
+
+    result, rows = {}, []
+    for skill, weapons in weapons_by_skill.items():
+        targets = targets_by_skill[skill]
+        matrix = mathhammer.expected_damage(weapons.values(), targets.values(), skill=skill)
+        for row, weapon_key in enumerate(weapons):
+            for column, target_key in enumerate(targets):
+                values = (float(matrix.hits[row]), float(matrix.wounds[row, column]),
+                    float(matrix.damage[row, column]), float(matrix.kills[row, column]))
+                result[weapon_key, target_key, skill] = values
+                rows.append(models.ExpectedDamage(weapon_key=weapon_key,
+                    target_key=target_key, skill=skill, hits=values[0], wounds=values[1],
+                    damage=values[2], kills=values[3]))
+    for chunk in chunks(rows):
+        try:
+            with transaction.atomic():
+                models.ExpectedDamage.objects.bulk_create(chunk)
+        except IntegrityError:
+            # Another process stored some of the same results in the meantime, so we store
+            # the rest of this chunk one by one.
+            _store_each(chunk)
+    return result
+
+
+def _store_each(rows):
+    """Store ``ExpectedDamage`` rows one by one, skipping those that are stored already."""
+    for row in rows:
+        try:
+            with transaction.atomic():
+                row.save(force_insert=True)
+        except IntegrityError:
+            pass
+
+
+def expected_damage(weapons, targets, skill=4, attacker=None):
+    """
+    Return the expected outcome of every weapon against every target.
+
+    Takes the same arguments as ``mathhammer.expected_damage`` and returns the same
+    ``DamageMatrix``, but reads stored results wherever possible.
+    """
+    weapons, targets = tuple(weapons), tuple(targets)
+    if not weapons or not targets:
+        return mathhammer.expected_damage(weapons, targets, skill=skill, attacker=attacker)
+
+    weapon_keys = [(get_weapon_key(weapon), get_skill(weapon, skill, attacker))
+        for weapon in weapons]
+    target_keys = [get_target_key(target) for target in targets]
+    stored = lookup((weapon_key, target_key, weapon_skill)
+        for weapon_key, weapon_skill in weapon_keys for target_key in target_keys)
+
+    missing = []
+    for weapon, (weapon_key, weapon_skill) in zip(weapons, weapon_keys):
+        for target, target_key in zip(targets, target_keys):
+            # Only compute each combination of stats once.
+            if (weapon_key, target_key, weapon_skill) not in stored:
+                stored[weapon_key, target_key, weapon_skill] = None
+                missing.append((weapon, target, weapon_skill))
+    if missing:
+        stored.update(compute(missing))
+
+    values = np.array([[stored[weapon_key, target_key, weapon_skill]
+        for target_key in target_keys] for weapon_key, weapon_skill in weapon_keys])
+    return mathhammer.DamageMatrix(weapons, targets, values[:, 0, 0], values[:, :, 1],
+        values[:, :, 2], values[:, :, 3])
+
+
+def invalidate(weapon_keys=(), target_keys=()):
+    """Delete all rows of the given weapon or target keys."""
+    if weapon_keys:
+        models.ExpectedDamage.objects.filter(weapon_key__in=weapon_keys).delete()
+    if target_keys:
+        models.ExpectedDamage.objects.filter(target_key__in=target_keys).delete()
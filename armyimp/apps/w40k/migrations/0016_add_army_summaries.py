@@ -0,0 +1,47 @@
+# Generated by Django 2.0.2 on 2026-10-18 14:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('w40k', '0015_add_unique_together_to_wargear_list'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArmySummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('power_rating', models.IntegerField(default=0)),
+                ('model_count', models.IntegerField(default=0)),
+                ('hq_count', models.IntegerField(default=0)),
+                ('elites_count', models.IntegerField(default=0)),
+                ('troops_count', models.IntegerField(default=0)),
+                ('fast_attack_count', models.IntegerField(default=0)),
+                ('heavy_support_count', models.IntegerField(default=0)),
+                ('flyers_count', models.IntegerField(default=0)),
+                ('dedicated_transport_count', models.IntegerField(default=0)),
+                ('army', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='w40k.Army')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArmyUnitSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('power_rating', models.IntegerField(default=0)),
+                ('model_count', models.IntegerField(default=0)),
+                ('army_unit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='w40k.ArmyUnit')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.0.2 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('w40k', '0016_add_army_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpectedDamage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weapon_key', models.CharField(max_length=40)),
+                ('target_key', models.CharField(db_index=True, max_length=40)),
+                ('skill', models.PositiveSmallIntegerField()),
+                ('hits', models.FloatField()),
+                ('wounds', models.FloatField()),
+                ('damage', models.FloatField()),
+                ('kills', models.FloatField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='expecteddamage',
+            unique_together={('weapon_key', 'target_key', 'skill')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.0.2 on 2026-10-18 14:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_item_slot_options(apps, schema_editor):
+    """Materialize the effective options of all existing item slots."""
+    ItemSlot = apps.get_model('w40k', 'ItemSlot')
+    ItemSlotOption = apps.get_model('w40k', 'ItemSlotOption')
+    options = set()
+    for slot in ItemSlot.objects.all():
+        if slot.default_id is not None:
+            options.add((slot.pk, slot.default_id))
+        options.update((slot.pk, item_pk) for item_pk in slot.options.values_list('pk', flat=True))
+        options.update((slot.pk, item_pk) for item_pk in slot.option_from_list.values_list(
+            'items', flat=True) if item_pk is not None)
+    ItemSlotOption.objects.bulk_create([ItemSlotOption(item_slot_id=slot_pk, item_id=item_pk)
+        for slot_pk, item_pk in options], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('w40k', '0017_add_expected_damage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSlotOption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='w40k.Item')),
+                ('item_slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_options', to='w40k.ItemSlot')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemslotoption',
+            unique_together={('item_slot', 'item')},
+        ),
+        migrations.RunPython(add_item_slot_options, migrations.RunPython.noop),
+    ]
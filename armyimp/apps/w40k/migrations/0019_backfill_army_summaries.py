@@ -0,0 +1,84 @@
+# Generated by Django 2.0.2 on 2026-10-18 16:02
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, Sum
+
+# Copy of ``ArmySummary.CATEGORY_COUNT_FIELDS`` as of this migration.
+CATEGORY_COUNT_FIELDS = {
+    'HQ': 'hq_count',
+    'Elites': 'elites_count',
+    'Troops': 'troops_count',
+    'Fast Attack': 'fast_attack_count',
+    'Heavy Support': 'heavy_support_count',
+    'Flyers': 'flyers_count',
+    'Dedicated Transport': 'dedicated_transport_count',
+}
+UNIT_SUMMARY_FIELDS = ('points', 'power_rating', 'model_count')
+
+
+def add_army_summaries(apps, schema_editor):
+    """
+    Build the summaries of all armies that existed before summaries were introduced.
+
+    Armies that already have a summary (as they were created since) are left alone.
+    """
+    Army = apps.get_model('w40k', 'Army')
+    ArmyUnit = apps.get_model('w40k', 'ArmyUnit')
+    ArmyModel = apps.get_model('w40k', 'ArmyModel')
+    ArmyModelItemSlot = apps.get_model('w40k', 'ArmyModelItemSlot')
+    ArmySummary = apps.get_model('w40k', 'ArmySummary')
+    ArmyUnitSummary = apps.get_model('w40k', 'ArmyUnitSummary')
+
+    army_pks = list(Army.objects.filter(summary__isnull=True).values_list('pk', flat=True))
+    if not army_pks:
+        return
+    totals = defaultdict(lambda: defaultdict(int))
+    for row in ArmyUnit.objects.filter(army__in=army_pks).values(
+            'pk', 'army', 'unit__power_rating', 'unit__category'):
+        values = totals[row['pk'], row['army']]
+        values['power_rating'] += row['unit__power_rating'] or 0
+        category_field = CATEGORY_COUNT_FIELDS.get(row['unit__category'])
+        if category_field:
+            values[category_field] += 1
+    for row in (ArmyModel.objects.filter(unit__army__in=army_pks).order_by()
+            .values('unit', 'unit__army')
+            .annotate(points=Sum('unit__unit__model_price'), model_count=Count('pk'))):
+        values = totals[row['unit'], row['unit__army']]
+        values['points'] += row['points'] or 0
+        values['model_count'] += row['model_count']
+    expression = ExpressionWrapper(
+        F('amount') * F('item__organizationitemintermediate__price'),
+        output_field=models.IntegerField())
+    for row in (ArmyModelItemSlot.objects.filter(
+            army_model__unit__army__in=army_pks,
+            item__organizationitemintermediate__organization=F(
+                'army_model__unit__unit__organization'))
+            .order_by().values('army_model__unit', 'army_model__unit__army')
+            .annotate(points=Sum(expression))):
+        totals[row['army_model__unit'], row['army_model__unit__army']]['points'] += (
+            row['points'] or 0)
+
+    army_summaries = {pk: ArmySummary(army_id=pk) for pk in army_pks}
+    army_unit_summaries = []
+    for (army_unit_pk, army_pk), values in totals.items():
+        army_unit_summaries.append(ArmyUnitSummary(army_unit_id=army_unit_pk,
+            **{field: values[field] for field in UNIT_SUMMARY_FIELDS}))
+        for field, value in values.items():
+            setattr(army_summaries[army_pk], field,
+                getattr(army_summaries[army_pk], field) + value)
+    ArmyUnitSummary.objects.filter(army_unit__army__in=army_pks).delete()
+    ArmySummary.objects.bulk_create(army_summaries.values())
+    ArmyUnitSummary.objects.bulk_create(army_unit_summaries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('w40k', '0018_add_item_slot_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_army_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('w40k', '0019_backfill_army_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemslot',
+            name='eligible_items',
+            field=models.ManyToManyField(related_name='_itemslot_eligible_items_+', through='w40k.ItemSlotOption', to='w40k.Item'),
+        ),
+    ]
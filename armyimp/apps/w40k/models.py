@@ -95,8 +95,18 @@ class Item(models.Model):
 
     @property
     def per_organization_details(self):
-        """Return all ``OrganizationItemIntermediate`` instances related to this item."""
-        return OrganizationItemIntermediate.objects.filter(item=self)
+        """
+        Return this items prices for all organizations it is linked to.
+
+        Returns:
+            dict: ``{organization.pk: int(price)}``
+
+        Note:
+            Prices are looked up in the process wide price matrix, so this does not hit the
+            database once the matrix has been built.
+        """
+        from .pricing import get_price_matrix
+        return get_price_matrix().per_organization(self)
 
     @property
     def price(self):
@@ -116,7 +126,9 @@ class Item(models.Model):
         Raises:
             ValueError: If the item is not linked to an organization.
         """
-        detailed_items = self.per_organization_details
+        from .pricing import get_price_matrix
+        matrix = get_price_matrix()
+        detailed_items = matrix.per_organization(self)
 
         if not detailed_items:
             raise ValueError(_(
@@ -125,15 +137,14 @@ class Item(models.Model):
                 " and consider filing a bug report."
             ))
 
-        unique_prices = set([each.price for each in detailed_items])
+        unique_prices = set(detailed_items.values())
         if len(unique_prices) == 1:
-            result = unique_prices[0].price
+            result = unique_prices.pop()
         else:
             result = {}
             # We don't use dict-comprehension to exceeding line length.
-            for each in detailed_items:
-                orga = detailed_items.organization
-                result[orga.pk] = (str(orga), each.price)
+            for organization_pk, price in detailed_items.items():
+                result[organization_pk] = (matrix.organization_name(organization_pk), price)
         return result
 
 
@@ -239,10 +250,16 @@ class UnitModel(models.Model):
     max_amount = models.PositiveIntegerField(help_text=_(
         "How many models with this specific setup may the parent unit include at maximum?"))
 
+    objects = managers.UnitModelManager()
+
     def __str__(self):
         """Return string representation."""
         return self.name
 
+    def natural_key(self):
+        """Return this instances ``natural_key``."""
+        return (self.unit, self.profile, self.name_suffix)
+
     @property
     def name(self):
         """Return this models name."""
@@ -297,6 +314,8 @@ class ItemSlot(models.Model):
         on_delete=models.CASCADE)
     options = models.ManyToManyField('Item', blank=True, related_name='slot_options')
     option_from_list = models.ManyToManyField('WargearList', blank=True)
+    # The default, options and items of wargear lists together, see ``ItemSlotOption``.
+    eligible_items = models.ManyToManyField('Item', through='ItemSlotOption', related_name='+')
     min_amount = models.PositiveIntegerField(null=True, blank=True, default=1,
         help_text=_("Min. amount of eligible items this slot takes."))
     max_amount = models.PositiveIntegerField(null=True, blank=True, default=1,
@@ -306,6 +325,35 @@ class ItemSlot(models.Model):
         """Return string representation."""
         return 'Weaponslot for {}'.format(self.model.name)
 
+    def is_eligible(self, item):
+        """Return ``True`` if this slot may take ``item`` (an ``Item`` or its primary key)."""
+        return self.effective_options.filter(item=getattr(item, 'pk', item)).exists()
+
+
+class ItemSlotOption(models.Model):
+    """
+    An item an ``ItemSlot`` may take.
+
+    This is a materialized index of each slots default, options and the items of its wargear
+    lists, so checking an item against a slot takes a single indexed lookup.
+
+    Note:
+        Rows are kept up to date by the signal handlers in ``signals.py``, see
+        ``slot_options.py``. Use the ``rebuild_item_slot_options`` management command to
+        recompute all rows from scratch.
+    """
+
+    item_slot = models.ForeignKey('ItemSlot', related_name='effective_options',
+        on_delete=models.CASCADE)
+    item = models.ForeignKey('Item', related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('item_slot', 'item')
+
+    def __str__(self):
+        """Return string representation."""
+        return 'ItemSlotOption with PK: {s.pk}'.format(s=self)
+
 
 class Unit(models.Model):
     """
@@ -442,6 +490,8 @@ class ArmyUnit(models.Model):
     unit = models.ForeignKey("Unit", on_delete=models.CASCADE,
         help_text=_("The 'unittemplate' this unit is an instance of."))
 
+    objects = managers.ArmyUnitManager()
+
     def __str__(self):
         """Return string representation."""
         if self.name:
@@ -487,3 +537,92 @@ class ArmyModelItemSlot(models.Model):
     def __str__(self):
         """Return string representation."""
         return 'ArmyModelItemSlot with PK: {s.pk}'.format(s=self)
+
+
+class AbstractSummary(models.Model):
+    """
+    Denormalized totals that get maintained incrementally.
+
+    Note:
+        Instances are kept up to date by the signal handlers in ``signals.py`` which apply
+        deltas whenever a relevant instance changes. Use the ``rebuild_army_summaries``
+        management command to recompute all rows from scratch.
+    """
+
+    points = models.IntegerField(default=0)
+    power_rating = models.IntegerField(default=0)
+    model_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ArmySummary(AbstractSummary):
+    """Denormalized totals of an ``Army``."""
+
+    # Maps ``Unit.category`` values to the field holding the amount of units of that category.
+    CATEGORY_COUNT_FIELDS = {
+        'HQ': 'hq_count',
+        'Elites': 'elites_count',
+        'Troops': 'troops_count',
+        'Fast Attack': 'fast_attack_count',
+        'Heavy Support': 'heavy_support_count',
+        'Flyers': 'flyers_count',
+        'Dedicated Transport': 'dedicated_transport_count',
+    }
+
+    army = models.OneToOneField('Army', related_name='summary', on_delete=models.CASCADE)
+    hq_count = models.IntegerField(default=0)
+    elites_count = models.IntegerField(default=0)
+    troops_count = models.IntegerField(default=0)
+    fast_attack_count = models.IntegerField(default=0)
+    heavy_support_count = models.IntegerField(default=0)
+    flyers_count = models.IntegerField(default=0)
+    dedicated_transport_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        """Return string representation."""
+        return 'Summary for {s.army_id}'.format(s=self)
+
+    @property
+    def category_counts(self):
+        """Return a ``{category: amount}`` dict of this armies units."""
+        return {category: getattr(self, field)
+            for category, field in self.CATEGORY_COUNT_FIELDS.items()}
+
+
+class ArmyUnitSummary(AbstractSummary):
+    """Denormalized totals of an ``ArmyUnit``."""
+
+    army_unit = models.OneToOneField('ArmyUnit', related_name='summary',
+        on_delete=models.CASCADE)
+
+    def __str__(self):
+        """Return string representation."""
+        return 'Summary for {s.army_unit_id}'.format(s=self)
+
+
+class ExpectedDamage(models.Model):
+    """
+    Memoized expected outcome of a weapon profile against a model profile.
+
+    Note:
+        Rows are keyed by hashes of the stats involved rather than by profile, so profiles
+        with equal stats share rows and changed stats never hit outdated rows. See
+        ``memo.py`` for details.
+    """
+
+    weapon_key = models.CharField(max_length=40)
+    target_key = models.CharField(max_length=40, db_index=True)
+    skill = models.PositiveSmallIntegerField()
+    hits = models.FloatField()
+    wounds = models.FloatField()
+    damage = models.FloatField()
+    kills = models.FloatField()
+
+    class Meta:
+        unique_together = ('weapon_key', 'target_key', 'skill')
+
+    def __str__(self):
+        """Return string representation."""
+        return 'ExpectedDamage with PK: {s.pk}'.format(s=self)
@@ -0,0 +1,257 @@
+"""
+Point budget army optimization.
+
+Each unit of an organization is turned into a table of ``UnitOption`` tuples, one per legal
+amount of models, priced with the cheapest legal loadout of each model. Choosing units is then
+a knapsack problem: every unit may be taken a limited amount of times, each time as one of its
+options, the total points may not exceed the budget and the sum of the objectives scores is
+maximized. It is solved exactly by dynamic programming over the points spent (vectorized with
+NumPy) and the amount of units taken of each required category.
+
+Objectives are plain callables taking a ``UnitOption`` and returning its score, see
+``points_objective``, ``power_rating_objective`` and ``ExpectedDamageObjective``.
+
+Note:
+    The cheapest loadout of a model takes the cheapest eligible item for each item its slots
+    need at least. Items without a price for the organization are free, just as with
+    ``services.ArmyPointsCalculator``. Units without ``max_per_army`` may be taken
+    ``max_copies`` times (three by default, as in matched play).
+"""
+
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from . import codex, memo
+
+# Limits keeping the dynamic programming tables (``state_count * (budget + 1)`` cells each)
+# at 32 MB of scores at most.
+MAX_REQUIRED_AMOUNT = 12
+MAX_CELL_COUNT = 4000000
+
+UnitOption = namedtuple('UnitOption', ('unit', 'models', 'points'))
+UnitOption.__doc__ = """
+A unit with a particular amount of models, each with its cheapest loadout.
+
+Attributes:
+    unit (codex.UnitRecord): The unit.
+    models (tuple): ``(unit_model, amount, loadout)`` tuples, ``loadout`` being a tuple of
+        ``(item_pk, amount)`` carried by each of those models.
+    points (int): The total points of the unit.
+"""
+
+ArmyPlan = namedtuple('ArmyPlan', ('options', 'points', 'score'))
+ArmyPlan.__doc__ = """
+The best army composition found.
+
+Attributes:
+    options (list): The ``UnitOption`` of each unit to take.
+    points (int): The total points of all units.
+    score (float): The total score according to the objective.
+"""
+
+
+def get_cheapest_loadout(unit_model, organization_pk):
+    """
+    Return the cheapest legal loadout of a ``UnitModelRecord`` and its points.
+
+    Returns:
+        tuple: ``(loadout, points)``
+    """
+    loadout, points = Counter(), 0
+    for slot in unit_model.item_slots:
+        if not slot.min_amount or not slot.eligible_item_pks:
+            continue
+        item = min(_get_items(slot), key=lambda item: (item.prices.get(organization_pk, 0),
+            item.pk))
+        loadout[item.pk] += slot.min_amount
+        points += item.prices.get(organization_pk, 0) * slot.min_amount
+    return tuple(sorted(loadout.items())), points
+
+
+def _get_items(slot):
+    """Return the ``ItemRecord`` of each item an ``ItemSlotRecord`` may take."""
+    items = {item.pk: item for item in slot.options}
+    for wargear_list in slot.option_from_list:
+        items.update((item.pk, item) for item in wargear_list.items)
+    if slot.default is not None:
+        items[slot.default.pk] = slot.default
+    return [items[pk] for pk in sorted(slot.eligible_item_pks) if pk in items]
+
+
+def get_unit_options(unit):
+    """Return a ``UnitOption`` for each legal amount of models of a ``UnitRecord``."""
+    models = []
+    for unit_model in unit.models:
+        loadout, points = get_cheapest_loadout(unit_model, unit.organization_pk)
+        models.append((unit_model, loadout, (unit.model_price or 0) + points))
+    # Models beyond their minimum amounts are filled in cheapest first.
+    by_price = sorted(models, key=lambda model: (model[2], model[0].pk))
+    minimum = sum(model[0].min_amount for model in models)
+
+    result = []
+    for amount in range(unit.models_min, unit.models_max + 1):
+        amounts = Counter({model[0].pk: model[0].min_amount for model in models})
+        remaining = amount - minimum
+        if remaining < 0:
+            continue
+        for unit_model, loadout, points in by_price:
+            extra = min(remaining, unit_model.max_amount - unit_model.min_amount)
+            amounts[unit_model.pk] += extra
+            remaining -= extra
+        if remaining:
+            continue
+        result.append(UnitOption(unit, tuple((unit_model, amounts[unit_model.pk], loadout)
+            for unit_model, loadout, points in models if amounts[unit_model.pk]),
+            sum(amounts[unit_model.pk] * points for unit_model, loadout, points in models)))
+    return result
+
+
+def points_objective(option):
+    """Score an option by its points, that is spend as much of the budget as possible."""
+    return option.points
+
+
+def power_rating_objective(option):
+    """Score an option by its units power rating."""
+    return option.unit.power_rating or 0
+
+
+class ExpectedDamageObjective(object):
+    """
+    Score an option by the expected damage of all its weapons against some targets.
+
+    Each weapon uses the profile with the highest expected damage and the skill of the model
+    carrying it. Damage is averaged over all targets.
+    """
+
+    def __init__(self, targets):
+        """Instantiate a new objective against ``ModelProfile`` instances (or records)."""
+        self.targets = tuple(targets)
+        self._damage = {}
+
+    def get_damage(self, item, attacker):
+        """Return the expected damage of an ``ItemRecord`` carried by a model profile."""
+        key = (item.pk, attacker.pk)
+        if key not in self._damage:
+            damage = 0.0
+            if item.weapon_profiles and self.targets:
+                matrix = memo.expected_damage(item.weapon_profiles, self.targets,
+                    attacker=attacker)
+                damage = float(matrix.damage.mean(axis=1).max())
+            self._damage[key] = damage
+        return self._damage[key]
+
+    def __call__(self, option):
+        """Return the expected damage of an option."""
+        items = codex.get_snapshot().items
+        return sum(amount * carried * self.get_damage(items[item_pk], unit_model.profile)
+            for unit_model, amount, loadout in option.models
+            for item_pk, carried in loadout)
+
+
+def get_state_count(required):
+    """Return the amount of states tracking the units taken of each ``{category: amount}``."""
+    return int(np.prod([amount + 1 for amount in required.values()]))
+
+
+def get_cell_count(budget, required=None):
+    """Return the size of each dynamic programming table ``optimize`` needs for a request."""
+    return get_state_count(required or {}) * (budget + 1)
+
+
+def optimize(organization_pk, budget, required=None, objective=points_objective, taken=None,
+        max_copies=3):
+    """
+    Return the best composition of units of an organization within a points budget.
+
+    Args:
+        organization_pk (int): Primary key of the ``Organization``.
+        budget (int): The points available.
+        required (dict): ``{category: amount}`` of units that need to be included at least.
+        objective (callable): Returns the score of a ``UnitOption``.
+        taken (dict): ``{unit_pk: amount}`` of units already taken (e.g. when filling the
+            remaining points of an army). They count against ``max_per_army`` only.
+        max_copies (int): How often units without ``max_per_army`` may be taken.
+
+    Returns:
+        ArmyPlan: The plan with the highest score (and the least points among those) or
+            ``None`` if no plan within budget meets the requirements.
+
+    Raises:
+        ValueError: If a required amount exceeds ``MAX_REQUIRED_AMOUNT`` or the tables would
+            exceed ``MAX_CELL_COUNT``.
+    """
+    required = {category: amount for category, amount in (required or {}).items() if amount}
+    if any(amount > MAX_REQUIRED_AMOUNT for amount in required.values()):
+        raise ValueError("At most {} units per category may be required.".format(
+            MAX_REQUIRED_AMOUNT))
+    if get_cell_count(budget, required) > MAX_CELL_COUNT:
+        raise ValueError("Budget and required categories exceed the supported size.")
+    taken = taken or {}
+    categories = sorted(required)
+    # Scores have one axis per required category, counting the units taken of it (capped at
+    # the requirement), and a last one for the points spent. Transitions are then slices.
+    shape = tuple(required[category] + 1 for category in categories) + (budget + 1,)
+
+    def get_transitions(category):
+        # ``(source, target, advanced)`` index tuples, excluding the points axis.
+        if category not in required:
+            return [((), (), False)]
+        axis, amount = categories.index(category), required[category]
+        prefix = (slice(None),) * axis
+        return [(prefix + (slice(0, amount),), prefix + (slice(1, amount + 1),), True),
+            (prefix + (amount,), prefix + (amount,), False)]
+
+    scores = np.full(shape, -np.inf)
+    scores[(0,) * len(shape)] = 0
+    # The back pointer of each cell is the index of the option taken (starting at one),
+    # negated if the category count advanced. Few cells improve with each copy of a unit, so
+    # only those are kept per copy, as sorted flat indices and their back pointers.
+    choices = np.zeros(shape, dtype=np.int16)
+    groups = []
+    units = codex.get_snapshot().units
+    for pk in sorted(units):
+        unit = units[pk]
+        if unit.organization_pk != organization_pk:
+            continue
+        copies = unit.max_per_army if unit.max_per_army is not None else max_copies
+        options = [(option, float(objective(option))) for option in get_unit_options(unit)
+            if option.points <= budget]
+        transitions = get_transitions(unit.category)
+        for copy in range(max(copies - taken.get(pk, 0), 0) if options else 0):
+            new = scores.copy()
+            choices.fill(0)
+            for index, (option, score) in enumerate(options, start=1):
+                cost = option.points
+                for source, target, advanced in transitions:
+                    window = target + (Ellipsis, slice(cost, None))
+                    candidate = scores[source + (Ellipsis, slice(0, budget + 1 - cost))]
+                    candidate = candidate + score
+                    improved = candidate > new[window]
+                    np.copyto(new[window], candidate, where=improved)
+                    choices[window][improved] = -index if advanced else index
+            scores = new
+            cells = np.flatnonzero(choices != 0)
+            groups.append((options, cells, choices.ravel()[cells], unit.category))
+
+    final_state = tuple(required[category] for category in categories)
+    final = scores[final_state]
+    if not np.isfinite(final).any():
+        return None
+    # ``argmax`` returns the first, that is cheapest, of all best plans.
+    points = int(np.argmax(final))
+    score, state, result = float(final[points]), list(final_state), []
+    for options, cells, pointers, category in reversed(groups):
+        cell = np.ravel_multi_index(tuple(state) + (points,), shape)
+        position = int(np.searchsorted(cells, cell))
+        found = position < len(cells) and cells[position] == cell
+        index = int(pointers[position]) if found else 0
+        if index:
+            option = options[abs(index) - 1][0]
+            result.append(option)
+            if index < 0:
+                state[categories.index(category)] -= 1
+            points -= option.points
+    result.reverse()
+    return ArmyPlan(result, sum(option.points for option in result), score)
@@ -0,0 +1,29 @@
+"""
+Pagination classes for the w40k API.
+
+Cursor pagination filters on the last seen primary key instead of using ``OFFSET``, so deep
+pages are just as cheap as the first one and concurrent inserts do not shift pages.
+"""
+
+from rest_framework import pagination
+
+
+class PrimaryKeyCursorPagination(pagination.CursorPagination):
+    """Cursor pagination ordered by primary key."""
+
+    ordering = 'pk'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class LoadoutPagination(pagination.LimitOffsetPagination):
+    """
+    Limit/offset pagination for ``loadouts.LoadoutEnumerator`` instances.
+
+    Enumerators are counted and sliced without enumerating any loadouts before the page, so
+    offsets are cheap here as well.
+    """
+
+    default_limit = 50
+    max_limit = 500
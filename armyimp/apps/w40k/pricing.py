@@ -0,0 +1,112 @@
+"""
+Process wide price matrix for ``Item`` pricing.
+
+All ``OrganizationItemIntermediate`` rows are loaded once into a ``PriceMatrix`` that maps
+``(organization_pk, item_pk)`` to a price. The matrix carries a version stamp which is compared
+to the one stored in Django's cache framework on each access. Saving or deleting a price row
+stores a new version stamp, so every process rebuilds its matrix on next use. This needs a
+cache backend shared by all processes, see ``catalog``.
+"""
+
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from . import models
+
+VERSION_CACHE_KEY = 'w40k:price_matrix_version'
+
+_lock = threading.Lock()
+_matrix = None
+
+
+def _pk(instance):
+    """Return the primary key of an instance or the passed value if it is one already."""
+    return getattr(instance, 'pk', instance)
+
+
+class PriceMatrix(object):
+    """
+    Immutable ``(organization_pk, item_pk) -> price`` mapping.
+
+    Attributes:
+        version (str): The version stamp this matrix was built for.
+    """
+
+    __slots__ = ('version', '_prices', '_by_item', '_organization_names')
+
+    def __init__(self, version, rows, organization_names):
+        """
+        Instantiate a new matrix.
+
+        Args:
+            version (str): Version stamp of the data ``rows`` represents.
+            rows (iterable): ``(organization_pk, item_pk, price)`` tuples.
+            organization_names (dict): ``{organization_pk: name}``
+        """
+        self.version = version
+        self._prices = {}
+        self._by_item = {}
+        for organization_pk, item_pk, price in rows:
+            self._prices[(organization_pk, item_pk)] = price
+            self._by_item.setdefault(item_pk, {})[organization_pk] = price
+        self._organization_names = organization_names
+
+    @classmethod
+    def build(cls, version):
+        """Return a new matrix with all prices currently stored in the database."""
+        rows = models.OrganizationItemIntermediate.objects.values_list(
+            'organization', 'item', 'price')
+        names = dict(models.Organization.objects.values_list('pk', 'name'))
+        return cls(version, rows, names)
+
+    def __len__(self):
+        """Return the amount of prices in this matrix."""
+        return len(self._prices)
+
+    def get(self, item, organization, default=None):
+        """Return the price of ``item`` for ``organization``."""
+        return self._prices.get((_pk(organization), _pk(item)), default)
+
+    def per_organization(self, item):
+        """Return a ``{organization_pk: price}`` dict of all prices for ``item``."""
+        return dict(self._by_item.get(_pk(item), {}))
+
+    def organization_name(self, organization):
+        """Return the name of the given organization."""
+        return self._organization_names[_pk(organization)]
+
+
+def get_version():
+    """Return the current version stamp, creating one if there is none yet."""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        new = uuid.uuid4().hex
+        cache.add(VERSION_CACHE_KEY, new, None)
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            # The cache does not keep anything (like ``DummyCache``), so always rebuild.
+            version = new
+    return version
+
+
+def invalidate():
+    """Store a new version stamp so that all processes rebuild their matrix on next access."""
+    global _matrix
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    _matrix = None
+
+
+def get_price_matrix():
+    """Return the current ``PriceMatrix``, building it if there is none or it is outdated."""
+    global _matrix
+    version = get_version()
+    matrix = _matrix
+    if matrix is None or matrix.version != version:
+        with _lock:
+            matrix = _matrix
+            if matrix is None or matrix.version != version:
+                matrix = PriceMatrix.build(version)
+                _matrix = matrix
+    return matrix
@@ -0,0 +1,70 @@
+"""
+Server side response cache for codex views.
+
+Rendered responses are stored in Django's cache framework, keyed by the version tag of the
+codex data they depend on (see ``conditional.get_codex_version``) and the request. Nothing is
+ever deleted explicitly: once a change bumps a version, keys including the old one are simply
+no longer used and eventually culled by the cache backend. As single unit views depend on the
+units own, its organizations and the shared version only, editing a unit (or its models or item
+slots) only affects the cached responses of that very unit and lists.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.decorators import method_decorator
+
+from .conditional import get_codex_version
+
+CACHE_KEY_TEMPLATE = 'w40k:response:{version}:{digest}'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_cache_key(request, version):
+    """
+    Return the cache key of a response.
+
+    Besides the path and query parameters, the key includes the ``Accept`` header (used for
+    content negotiation) and the current user, as the browsable API shows who is logged in.
+    """
+    parts = [request.path, sorted(request.GET.lists()), request.META.get('HTTP_ACCEPT', ''),
+        request.user.pk if request.user.is_authenticated else None]
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return CACHE_KEY_TEMPLATE.format(version=version, digest=digest)
+
+
+def store(request, key):
+    """Return a callback storing a rendered response under ``key`` unless it is user specific."""
+    def _store(response):
+        # Just like ``UpdateCacheMiddleware``, never share responses using a CSRF token.
+        if not request.META.get('CSRF_COOKIE_USED') and not response.cookies:
+            cache.set(key, response, CACHE_TIMEOUT)
+    return _store
+
+
+def cache_codex_response(view_func):
+    """Decorate a codex view so that its successful GET responses get cached."""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        version = get_codex_version(kwargs.get('pk'))
+        if version is None:
+            return view_func(request, *args, **kwargs)
+        key = get_cache_key(request, version)
+        response = cache.get(key)
+        if response is not None:
+            return response
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if getattr(response, 'is_rendered', True):
+                store(request, key)(response)
+            else:
+                response.add_post_render_callback(store(request, key))
+        return response
+    return _wrapped_view
+
+
+# Class decorator adding the response cache to codex views.
+codex_response_cache = method_decorator(cache_codex_response, name='dispatch')
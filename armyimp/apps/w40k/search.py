@@ -0,0 +1,246 @@
+"""
+In-memory inverted index for codex search.
+
+Units, abilities, keywords, faction keywords, items and weapon profiles are turned into
+documents of weighted text fields, taken from the ``CodexSnapshot``. Their tokens are
+stored in an inverted index mapping each term to the documents containing it. Query tokens
+match terms exactly, as prefix of longer terms (found by bisecting the sorted terms) and, for
+typos, by trigram similarity. All query tokens need to match for a document to be found.
+
+Each process keeps one index, tagged with the version of the snapshot it was built from.
+Catalog changes bump the version (see ``signals``) and the next search derives a new index
+from the previous one: only documents that actually changed are removed and re-added. Just
+like snapshots, indexes never change once built, so concurrent searches are unaffected.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict, namedtuple
+
+from . import codex
+
+KINDS = ('unit', 'ability', 'keyword', 'faction_keyword', 'item', 'weapon_profile')
+
+# Names weigh more than any other text.
+NAME_WEIGHT = 3
+TEXT_WEIGHT = 1
+
+# Scores of inexact matches relative to exact ones.
+PREFIX_FACTOR = 0.8
+TRIGRAM_FACTOR = 0.5
+MIN_TRIGRAM_SIMILARITY = 0.4
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+Document = namedtuple('Document', ('kind', 'pk', 'name', 'fields'))
+Document.__doc__ = """
+A searchable object.
+
+Attributes:
+    kind (str): One of ``KINDS``.
+    pk (int): The objects primary key.
+    name (str): The objects name.
+    fields (tuple): ``(text, weight)`` tuples of all searchable text.
+"""
+
+SearchResult = namedtuple('SearchResult', ('kind', 'pk', 'name', 'score'))
+
+_lock = threading.Lock()
+_index = None
+
+
+def tokenize(text):
+    """Return the lower case word tokens of ``text``."""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def get_trigrams(term):
+    """Return the set of trigrams of a term, padded like PostgreSQL's ``pg_trgm`` does."""
+    padded = '  {} '.format(term)
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def get_documents(snapshot):
+    """Return a ``{(kind, pk): Document}`` dict of all searchable objects of a snapshot."""
+    def document(kind, pk, name, *texts):
+        fields = ((name, NAME_WEIGHT),) + tuple((text, TEXT_WEIGHT) for text in texts if text)
+        return (kind, pk), Document(kind, pk, name, fields)
+
+    documents = []
+    for unit in snapshot.units.values():
+        documents.append(document('unit', unit.pk, unit.name,
+            ' '.join(unit.keywords + unit.faction_keywords + unit.abilities)))
+    for ability in snapshot.abilities.values():
+        documents.append(document('ability', ability.pk, ability.name, ability.description))
+    for pk, name in snapshot.keywords.items():
+        documents.append(document('keyword', pk, name))
+    for pk, name in snapshot.faction_keywords.items():
+        documents.append(document('faction_keyword', pk, name))
+    for item in snapshot.items.values():
+        documents.append(document('item', item.pk, item.name, item.comment))
+    for profile in snapshot.weapon_profiles.values():
+        documents.append(document('weapon_profile', profile.pk, profile.name,
+            profile.comments))
+    return dict(documents)
+
+
+def get_term_weights(document):
+    """Return a ``{term: weight}`` dict of a document, using the highest weight per term."""
+    result = {}
+    for text, weight in document.fields:
+        for term in tokenize(text):
+            result[term] = max(result.get(term, 0), weight)
+    return result
+
+
+class SearchIndex(object):
+    """
+    Immutable inverted index of codex documents.
+
+    Attributes:
+        version (int): The catalog version of the snapshot this index was built from.
+        documents (dict): ``{(kind, pk): Document}``
+        postings (dict): ``{term: {(kind, pk): weight}}``
+        terms (list): All terms, sorted.
+        trigrams (dict): ``{trigram: frozenset(terms)}``
+    """
+
+    __slots__ = ('version', 'documents', 'postings', 'terms', 'trigrams')
+
+    def __init__(self, version, documents, postings, terms, trigrams):
+        """Instantiate a new index. Use ``build`` or ``updated`` instead."""
+        self.version = version
+        self.documents = documents
+        self.postings = postings
+        self.terms = terms
+        self.trigrams = trigrams
+
+    @classmethod
+    def build(cls, snapshot):
+        """Return a new index of all documents of a ``CodexSnapshot``."""
+        return cls(None, {}, {}, [], {}).updated(snapshot)
+
+    def updated(self, snapshot):
+        """Return a new index of a ``CodexSnapshot``, re-indexing changed documents only."""
+        documents = get_documents(snapshot)
+        postings, copied = dict(self.postings), set()
+
+        def get_posting(term):
+            # Copy on write, so this index stays unchanged.
+            if term not in copied:
+                copied.add(term)
+                postings[term] = dict(postings.get(term, {}))
+            return postings[term]
+
+        for key, old in self.documents.items():
+            if documents.get(key) != old:
+                for term in get_term_weights(old):
+                    del get_posting(term)[key]
+        for key, new in documents.items():
+            if self.documents.get(key) != new:
+                for term, weight in get_term_weights(new).items():
+                    get_posting(term)[key] = weight
+
+        added = {term for term in copied if postings[term] and term not in self.postings}
+        removed = {term for term in copied if not postings[term]}
+        for term in removed:
+            del postings[term]
+        terms, trigrams = self.terms, self.trigrams
+        if added or removed:
+            terms = sorted(postings)
+            trigrams = dict(trigrams)
+            changed = defaultdict(lambda: [set(), set()])
+            for term in added:
+                for trigram in get_trigrams(term):
+                    changed[trigram][0].add(term)
+            for term in removed:
+                for trigram in get_trigrams(term):
+                    changed[trigram][1].add(term)
+            for trigram, (add, remove) in changed.items():
+                value = (trigrams.get(trigram, frozenset()) | add) - remove
+                if value:
+                    trigrams[trigram] = value
+                else:
+                    trigrams.pop(trigram, None)
+        return type(self)(snapshot.version, documents, postings, terms, trigrams)
+
+    def match(self, token):
+        """Return a ``{term: factor}`` dict of all terms matching a query token."""
+        result = {}
+        index = bisect.bisect_left(self.terms, token)
+        while index < len(self.terms) and self.terms[index].startswith(token):
+            term = self.terms[index]
+            result[term] = 1.0 if term == token else PREFIX_FACTOR
+            index += 1
+        if len(token) >= 3:
+            token_trigrams = get_trigrams(token)
+            shared = defaultdict(int)
+            for trigram in token_trigrams:
+                for term in self.trigrams.get(trigram, ()):
+                    shared[term] += 1
+            for term, count in shared.items():
+                similarity = count / (len(token_trigrams) + len(get_trigrams(term)) - count)
+                if term not in result and similarity >= MIN_TRIGRAM_SIMILARITY:
+                    result[term] = TRIGRAM_FACTOR * similarity
+        return result
+
+    def search(self, query, kinds=None, limit=20):
+        """
+        Return the best matching documents for a query.
+
+        Args:
+            query (str): The text to search for.
+            kinds (iterable): Only return documents of these ``KINDS``. Defaults to all.
+            limit (int): The maximum amount of results.
+
+        Returns:
+            list: ``SearchResult`` tuples, best matches first.
+        """
+        scores = None
+        for token in set(tokenize(query)):
+            token_scores = {}
+            for term, factor in self.match(token).items():
+                for key, weight in self.postings[term].items():
+                    token_scores[key] = max(token_scores.get(key, 0), weight * factor)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {key: scores[key] + score for key, score in token_scores.items()
+                    if key in scores}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        if kinds is not None:
+            kinds = set(kinds)
+            scores = {key: score for key, score in scores.items() if key[0] in kinds}
+        best = sorted(scores.items(), key=lambda each: (-each[1], self.documents[each[0]].name))
+        return [SearchResult(key[0], key[1], self.documents[key].name, round(score, 4))
+            for key, score in best[:limit]]
+
+
+def get_index():
+    """Return the current ``SearchIndex``, updating it if the catalog changed."""
+    global _index
+    snapshot = codex.get_snapshot()
+    index = _index
+    if index is None or index.version != snapshot.version:
+        with _lock:
+            index = _index
+            if index is None or index.version != snapshot.version:
+                index = (SearchIndex.build(snapshot) if index is None else
+                    index.updated(snapshot))
+                _index = index
+    return index
+
+
+def search(query, kinds=None, limit=20):
+    """Search the current ``SearchIndex``, see ``SearchIndex.search``."""
+    return get_index().search(query, kinds=kinds, limit=limit)
+
+
+def invalidate():
+    """Drop this processes index so the next search builds a new one from scratch."""
+    global _index
+    _index = None
@@ -1,9 +1,125 @@
+from collections import OrderedDict
+
 from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+
+from . import codex, models, optimizer, search, services, validation
+
+
+def split_paths(paths):
+    """Return ``{head: [tail, ...]}`` for dotted paths like ``models.profile``."""
+    result = OrderedDict()
+    for path in paths:
+        head, _, tail = path.partition('.')
+        tails = result.setdefault(head, [])
+        if tail:
+            tails.append(tail)
+    return result
+
+
+class ShapedSerializerMixin(object):
+    """
+    Serializer mixin that lets clients choose the shape of the representation.
+
+    Serializers take two additional arguments, each a list of dotted paths:
+
+    - ``fields``: The fields to include. Nested serializers may be restricted as well, e.g.
+      ``['name', 'models.pk']``. If ``None``, ``default_fields`` are included.
+    - ``expand``: Relations to include as nested objects, e.g. ``['models.profile']``.
+
+    Nested serializers are only ever created if included, so ``get_prefetch_lookups``
+    returns exactly the relations the requested shape needs.
+
+    Attributes:
+        default_fields (tuple): Fields included by default. If ``None``, all fields are.
+        nested_fields (dict): ``{name: (serializer_class, kwargs)}`` of relations that are
+            represented by a nested serializer whenever they are included.
+        expandable_fields (dict): ``{name: (serializer_class, kwargs)}`` of relations that are
+            only represented by a nested serializer if expanded.
+    """
+
+    default_fields = None
+    nested_fields = {}
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        """Instantiate a new serializer with the requested shape."""
+        super().__init__(*args, **kwargs)
+        fields = split_paths(fields) if fields is not None else None
+        expand = split_paths(expand)
+        if fields is not None:
+            names = list(fields)
+        else:
+            names = list(self.default_fields or self.fields)
+        names += [name for name in expand if name not in names]
+
+        unknown = set(names) - set(self.fields) - set(self.nested_fields) - set(
+            self.expandable_fields)
+        if unknown:
+            raise serializers.ValidationError("Unknown fields: {}".format(
+                ', '.join(sorted(unknown))))
+        if any(name not in self.nested_fields and name not in self.expandable_fields
+                for name in expand):
+            raise serializers.ValidationError("Only relations can be expanded.")
+
+        for name in list(self.fields):
+            if name not in names:
+                self.fields.pop(name)
+        for name in names:
+            if name in self.nested_fields:
+                serializer_class, field_kwargs = self.nested_fields[name]
+            elif name in expand:
+                serializer_class, field_kwargs = self.expandable_fields[name]
+            else:
+                continue
+            nested_fields = fields[name] or None if fields is not None else None
+            self.fields[name] = serializer_class(fields=nested_fields,
+                expand=expand.get(name, ()), **field_kwargs)
+
+    def get_prefetch_lookups(self, prefix=''):
+        """Return the lookups of all relations included by nested serializers."""
+        lookups = []
+        for field in self.fields.values():
+            serializer = getattr(field, 'child', field)
+            if isinstance(serializer, ShapedSerializerMixin):
+                lookup = prefix + field.source
+                lookups.append(lookup)
+                lookups.extend(serializer.get_prefetch_lookups(lookup + '__'))
+        return lookups
+
+
+class WeaponProfileInlineSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    """
+    Inline serializer for the ``WeaponProfile`` model.
+
+    This class is not suitable for a complete representation of instances.
+    Its use case is to include just the relevant information to its parent
+    serializer.
+    """
 
-from . import models
+    class Meta:
+        model = models.WeaponProfile
+        fields = ('pk', 'name', 'category', 'range_min', 'range_max', 'attack_type',
+            'number_of_attacks_min', 'number_of_attacks_max', 'strength_min', 'strength_max',
+            'armor_penetration', 'damage_min', 'damage_max')
 
 
-class ItemInlineSerializer(serializers.ModelSerializer):
+class ModelProfileInlineSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    """
+    Inline serializer for the ``ModelProfile`` model.
+
+    This class is not suitable for a complete representation of instances.
+    Its use case is to include just the relevant information to its parent
+    serializer.
+    """
+
+    class Meta:
+        model = models.ModelProfile
+        fields = ('pk', 'name', 'movement', 'weapon_skill', 'balistic_skill', 'strength',
+            'toughness', 'wounds', 'attacks', 'leadership', 'saves')
+
+
+class ItemInlineSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     """
     Inline serializer for the ``Item`` model.
 
@@ -12,28 +128,36 @@ class ItemInlineSerializer(serializers.ModelSerializer):
     serializer.
     """
 
+    default_fields = ('pk', 'name')
+    nested_fields = {'weapon_profiles': (WeaponProfileInlineSerializer, {'many': True})}
+
     class Meta:
         model = models.Item
-        fields = ('pk', 'name')
+        fields = ('pk', 'name', 'comment')
 
 
-class ItemSlotInlineSerializer(serializers.ModelSerializer):
+class ItemSlotInlineSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     """
     Inline serializer for the ``ItemSlot`` model.
 
     This class is not suitable for a complete representation of instances.
     Its use case is to include just the relevant information to its parent
-    serializer.
+    serializer. ``options`` holds all items the slot may take, that is its default, options
+    and the items of its wargear lists (see ``ItemSlotOption``).
     """
 
-    default = ItemInlineSerializer()
+    default_fields = ('pk', 'default')
+    nested_fields = {
+        'default': (ItemInlineSerializer, {}),
+        'options': (ItemInlineSerializer, {'many': True, 'source': 'eligible_items'}),
+    }
 
     class Meta:
         model = models.ItemSlot
-        fields = ('pk', 'default')
+        fields = ('pk', 'min_amount', 'max_amount')
 
 
-class UnitModelInlineSerializer(serializers.ModelSerializer):
+class UnitModelInlineSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
     """Inline serializer for the ``UnitModel`` model.
 
     This class is not suitable for a complete representation of instances.
@@ -41,18 +165,359 @@ class UnitModelInlineSerializer(serializers.ModelSerializer):
     serializer.
     """
 
-    item_slots = ItemSlotInlineSerializer(many=True)
+    nested_fields = {'item_slots': (ItemSlotInlineSerializer, {'many': True})}
+    expandable_fields = {'profile': (ModelProfileInlineSerializer, {})}
 
     class Meta:
         model = models.UnitModel
         fields = ('pk', 'name_suffix', 'profile', 'min_amount', 'max_amount', 'item_slots')
 
 
-class UnitSerializer(serializers.ModelSerializer):
-    """Serializer for the ``Unit`` model."""
+class UnitSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for the ``Unit`` model.
+
+    See ``ShapedSerializerMixin`` on how to choose which fields to include.
+    """
 
-    models = UnitModelInlineSerializer(many=True)
+    default_fields = ('pk', 'name', 'models')
+    nested_fields = {'models': (UnitModelInlineSerializer, {'many': True})}
 
     class Meta:
         model = models.Unit
-        fields = ('pk', 'name', 'models')
+        fields = ('pk', 'name', 'organization', 'category', 'power_rating', 'model_price',
+            'models_min', 'models_max', 'max_per_army')
+
+
+class ArmyModelItemSlotInlineSerializer(serializers.ModelSerializer):
+    """
+    Inline serializer for the ``ArmyModelItemSlot`` model.
+
+    This class is not suitable for a complete representation of instances.
+    Its use case is to include just the relevant information to its parent
+    serializer.
+    """
+
+    # Plain primary keys, whether they are valid options gets validated for the unit as a whole.
+    item = serializers.IntegerField(source='item_id')
+
+    class Meta:
+        model = models.ArmyModelItemSlot
+        fields = ('item', 'amount')
+        extra_kwargs = {'amount': {'min_value': 1}}
+
+
+class ArmyModelInlineSerializer(serializers.ModelSerializer):
+    """
+    Inline serializer for the ``ArmyModel`` model.
+
+    This class is not suitable for a complete representation of instances.
+    Its use case is to include just the relevant information to its parent
+    serializer.
+    """
+
+    model = serializers.IntegerField(source='model_id')
+    items = ArmyModelItemSlotInlineSerializer(many=True, required=False,
+        source='armymodelitemslot_set')
+
+    class Meta:
+        model = models.ArmyModel
+        fields = ('pk', 'model', 'items')
+
+
+class ArmyUnitSummaryInlineSerializer(serializers.ModelSerializer):
+    """
+    Inline serializer for the ``ArmyUnitSummary`` model.
+
+    This class is not suitable for a complete representation of instances.
+    Its use case is to include just the relevant information to its parent
+    serializer.
+    """
+
+    class Meta:
+        model = models.ArmyUnitSummary
+        fields = ('points', 'power_rating', 'model_count')
+
+
+class ArmySummaryInlineSerializer(serializers.ModelSerializer):
+    """
+    Inline serializer for the ``ArmySummary`` model.
+
+    This class is not suitable for a complete representation of instances.
+    Its use case is to include just the relevant information to its parent
+    serializer.
+    """
+
+    category_counts = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = models.ArmySummary
+        fields = ('points', 'power_rating', 'model_count', 'category_counts')
+
+
+class ArmyUnitSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the ``ArmyUnit`` model including its models and their items.
+
+    A whole unit is created at once. It is validated against all constraints of its ``Unit``
+    and the army it joins before anything gets written.
+    """
+
+    models = ArmyModelInlineSerializer(many=True)
+    summary = ArmyUnitSummaryInlineSerializer(read_only=True)
+
+    class Meta:
+        model = models.ArmyUnit
+        fields = ('pk', 'army', 'name', 'unit', 'summary', 'models')
+
+    def get_unit_data(self, data):
+        """Return the ``validation.UnitData`` representation of validated data."""
+        return validation.UnitData(None, data['unit'].pk, [
+            validation.ModelData(index, model['model_id'], [(item['item_id'], item['amount'])
+                for item in model.get('armymodelitemslot_set', ())])
+            for index, model in enumerate(data['models'])
+        ])
+
+    def validate(self, data):
+        """
+        Validate the new unit as part of its army.
+
+        Only violations caused by the new unit are reported. Violation codes are passed on as
+        error codes.
+        """
+        validator = validation.ArmyValidator()
+        units = validator.load_units(data['army'])
+        known = set(validator.validate_units(units))
+        violations = [violation for violation in
+            validator.validate_units(units + [self.get_unit_data(data)])
+            if violation not in known]
+        if violations:
+            raise serializers.ValidationError([ErrorDetail(violation.message, code=violation.code)
+                for violation in violations])
+        return data
+
+    def create(self, validated_data):
+        """Create the army unit, its models and items using ``services.create_army_unit``."""
+        army_models = [(model['model_id'], [(item['item_id'], item['amount'])
+            for item in model.get('armymodelitemslot_set', ())])
+            for model in validated_data['models']]
+        army_unit = services.create_army_unit(validated_data['army'], validated_data['unit'],
+            validated_data.get('name', ''), army_models)
+        return models.ArmyUnit.objects.with_roster().get(pk=army_unit.pk)
+
+
+class ArmySerializer(serializers.ModelSerializer):
+    """Serializer for the ``Army`` model including its complete roster."""
+
+    summary = ArmySummaryInlineSerializer(read_only=True)
+    units = ArmyUnitSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Army
+        fields = ('pk', 'name', 'summary', 'units')
+
+
+class ArmySummarySerializer(serializers.ModelSerializer):
+    """Serializer for the ``Army`` model including only its summary."""
+
+    summary = ArmySummaryInlineSerializer(read_only=True)
+
+    class Meta:
+        model = models.Army
+        fields = ('pk', 'name', 'summary')
+
+
+class PrimaryKeyListField(serializers.CharField):
+    """A comma separated list of primary keys."""
+
+    def to_internal_value(self, data):
+        """Return the list of primary keys."""
+        try:
+            return [int(each) for each in super().to_internal_value(data).split(',') if each]
+        except ValueError:
+            raise serializers.ValidationError("Expected comma separated primary keys.")
+
+
+class ExpectedDamageQuerySerializer(serializers.Serializer):
+    """Serializer validating the query parameters of expected damage requests."""
+
+    weapons = PrimaryKeyListField(required=False)
+    targets = PrimaryKeyListField(required=False)
+    skill = serializers.IntegerField(min_value=2, max_value=6, default=4)
+    attacker = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        """Make sure all profiles exist."""
+        snapshot = codex.get_snapshot()
+        for name, index in (('weapons', snapshot.weapon_profiles),
+                ('targets', snapshot.model_profiles)):
+            unknown = [pk for pk in data.get(name, ()) if pk not in index]
+            if unknown:
+                raise serializers.ValidationError({name: "Unknown profiles: {}".format(
+                    ', '.join(str(pk) for pk in unknown))})
+        if 'attacker' in data and data['attacker'] not in snapshot.model_profiles:
+            raise serializers.ValidationError({'attacker': "Unknown profile."})
+        return data
+
+
+class DamageMatrixSerializer(serializers.Serializer):
+    """Serializer for ``mathhammer.DamageMatrix`` instances."""
+
+    weapons = serializers.SerializerMethodField()
+    targets = serializers.SerializerMethodField()
+    hits = serializers.SerializerMethodField()
+    wounds = serializers.SerializerMethodField()
+    damage = serializers.SerializerMethodField()
+    kills = serializers.SerializerMethodField()
+
+    def get_weapons(self, matrix):
+        """Return the primary keys and names of all weapon profiles (rows)."""
+        return [{'pk': weapon.pk, 'name': weapon.name} for weapon in matrix.weapons]
+
+    def get_targets(self, matrix):
+        """Return the primary keys and names of all target profiles (columns)."""
+        return [{'pk': target.pk, 'name': target.name} for target in matrix.targets]
+
+    def get_hits(self, matrix):
+        """Return the expected hits per weapon."""
+        return matrix.hits.round(4).tolist()
+
+    def get_wounds(self, matrix):
+        """Return the expected unsaved wounds."""
+        return matrix.wounds.round(4).tolist()
+
+    def get_damage(self, matrix):
+        """Return the expected damage."""
+        return matrix.damage.round(4).tolist()
+
+    def get_kills(self, matrix):
+        """Return the expected models slain."""
+        return matrix.kills.round(4).tolist()
+
+
+class LoadoutSerializer(serializers.BaseSerializer):
+    """Serializer for loadouts as enumerated by ``loadouts.LoadoutEnumerator``."""
+
+    def to_representation(self, loadout):
+        """Return the items of a loadout."""
+        return [{'item': item_pk, 'amount': amount} for item_pk, amount in loadout]
+
+
+class RequiredCategoriesField(serializers.CharField):
+    """
+    A comma separated list of ``category:amount`` pairs, e.g. ``HQ:1,Troops:2``.
+
+    Amounts may not exceed ``optimizer.MAX_REQUIRED_AMOUNT``.
+    """
+
+    def to_internal_value(self, data):
+        """Return the ``{category: amount}`` dict."""
+        categories = {value for value, label in models.Unit.UNIT_CATEGORIES}
+        result = {}
+        for pair in super().to_internal_value(data).split(','):
+            category, _, amount = pair.rpartition(':')
+            if category not in categories or not amount.isdigit():
+                raise serializers.ValidationError(
+                    "Expected comma separated category:amount pairs.")
+            if int(amount) > optimizer.MAX_REQUIRED_AMOUNT:
+                raise serializers.ValidationError(
+                    "At most {} units per category may be required.".format(
+                        optimizer.MAX_REQUIRED_AMOUNT))
+            result[category] = int(amount)
+        return result
+
+
+class ArmyPlanQuerySerializer(serializers.Serializer):
+    """Serializer validating the query parameters of army optimization requests."""
+
+    OBJECTIVES = ('points', 'power_rating', 'expected_damage')
+
+    organization = serializers.IntegerField()
+    budget = serializers.IntegerField(min_value=0, max_value=10000)
+    required = RequiredCategoriesField(required=False)
+    objective = serializers.ChoiceField(OBJECTIVES, default='points')
+    targets = PrimaryKeyListField(required=False)
+    army = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        """
+        Make sure all referenced instances exist and targets are given if needed.
+
+        Also make sure the optimization stays within ``optimizer.MAX_CELL_COUNT``.
+        """
+        if optimizer.get_cell_count(data['budget'], data.get('required')) > (
+                optimizer.MAX_CELL_COUNT):
+            raise serializers.ValidationError(
+                {'required': "Too many required units for this budget."})
+        snapshot = codex.get_snapshot()
+        if data['organization'] not in snapshot.organizations:
+            raise serializers.ValidationError({'organization': "Unknown organization."})
+        unknown = [pk for pk in data.get('targets', ()) if pk not in snapshot.model_profiles]
+        if unknown:
+            raise serializers.ValidationError({'targets': "Unknown profiles: {}".format(
+                ', '.join(str(pk) for pk in unknown))})
+        if data['objective'] == 'expected_damage' and not data.get('targets'):
+            raise serializers.ValidationError({'targets': "Required for this objective."})
+        if 'army' in data and not models.Army.objects.filter(pk=data['army']).exists():
+            raise serializers.ValidationError({'army': "Unknown army."})
+        return data
+
+    def get_objective(self):
+        """Return the objective callable for the validated data."""
+        data = self.validated_data
+        if data['objective'] == 'expected_damage':
+            snapshot = codex.get_snapshot()
+            return optimizer.ExpectedDamageObjective(
+                snapshot.model_profiles[pk] for pk in data['targets'])
+        return getattr(optimizer, '{}_objective'.format(data['objective']))
+
+
+class UnitOptionSerializer(serializers.BaseSerializer):
+    """Serializer for ``optimizer.UnitOption`` instances."""
+
+    def to_representation(self, option):
+        """Return the unit, its points and the loadouts of its models."""
+        return {
+            'unit': option.unit.pk,
+            'name': option.unit.name,
+            'category': option.unit.category,
+            'points': option.points,
+            'models': [{
+                'model': unit_model.pk,
+                'amount': amount,
+                'items': LoadoutSerializer(loadout).data,
+            } for unit_model, amount, loadout in option.models],
+        }
+
+
+class ArmyPlanSerializer(serializers.Serializer):
+    """Serializer for ``optimizer.ArmyPlan`` instances."""
+
+    points = serializers.IntegerField()
+    score = serializers.FloatField()
+    units = UnitOptionSerializer(source='options', many=True)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Serializer validating the query parameters of codex search requests."""
+
+    q = serializers.CharField(max_length=200)
+    kinds = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate_kinds(self, value):
+        """Return the list of kinds to search for."""
+        kinds = [each.strip() for each in value.split(',') if each.strip()]
+        unknown = [each for each in kinds if each not in search.KINDS]
+        if unknown:
+            raise serializers.ValidationError("Unknown kinds: {}".format(', '.join(unknown)))
+        return kinds
+
+
+class SearchResultSerializer(serializers.Serializer):
+    """Serializer for ``search.SearchResult`` tuples."""
+
+    kind = serializers.CharField()
+    pk = serializers.IntegerField()
+    name = serializers.CharField()
+    score = serializers.FloatField()
@@ -0,0 +1,171 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db import models as db_models
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, Sum
+
+from . import codex, memo, models, optimizer, summaries
+
+
+class ArmyPointsCalculator(object):
+    """
+    Calculate point totals for many ``Army`` instances at once.
+
+    All totals are computed by the database with a constant number of aggregate
+    queries, no matter how many armies, units, models or items are involved.
+
+    A model's points are its ``Unit.model_price``. A wargear items points are
+    the ``OrganizationItemIntermediate.price`` of the organization the models
+    unit belongs to, multiplied by ``ArmyModelItemSlot.amount``.
+
+    Note:
+        Items that are not linked to the relevant organization are not accounted
+        for as there simply is no price for them.
+    """
+
+    # Lookup (relative to ``ArmyModel``) that identifies the instances we group by.
+    army_model_lookup = 'unit__army'
+
+    def __init__(self, instances):
+        """
+        Instantiate a new calculator.
+
+        Args:
+            instances (iterable): ``Army`` instances (or their primary keys) to
+                calculate points for.
+        """
+        self.pks = [getattr(each, 'pk', each) for each in instances]
+
+    def _aggregate(self, queryset, lookup, expression):
+        """Return a ``{pk: points}`` dict for the given per-row expression."""
+        rows = (queryset.filter(**{'{}__in'.format(lookup): self.pks})
+            .order_by().values(lookup).annotate(points=Sum(expression)))
+        return {row[lookup]: row['points'] or 0 for row in rows}
+
+    def get_model_points(self):
+        """Return the points spent on models as ``{pk: points}``."""
+        queryset = models.ArmyModel.objects.all()
+        return self._aggregate(queryset, self.army_model_lookup, F('unit__unit__model_price'))
+
+    def get_wargear_points(self):
+        """Return the points spent on wargear as ``{pk: points}``."""
+        lookup = 'army_model__{}'.format(self.army_model_lookup)
+        queryset = models.ArmyModelItemSlot.objects.filter(
+            item__organizationitemintermediate__organization=F(
+                'army_model__unit__unit__organization'))
+        expression = ExpressionWrapper(
+            F('amount') * F('item__organizationitemintermediate__price'),
+            output_field=db_models.IntegerField()
+        )
+        return self._aggregate(queryset, lookup, expression)
+
+    def get_totals(self):
+        """
+        Return the total points as ``{pk: points}``.
+
+        Every requested instance is included, even if it does not include any models yet.
+        """
+        totals = defaultdict(int, {pk: 0 for pk in self.pks})
+        for points in (self.get_model_points(), self.get_wargear_points()):
+            for pk, value in points.items():
+                totals[pk] += value
+        return dict(totals)
+
+
+class ArmyUnitPointsCalculator(ArmyPointsCalculator):
+    """Calculate point totals for many ``ArmyUnit`` instances at once."""
+
+    army_model_lookup = 'unit'
+
+
+def create_army_unit(army, unit, name='', army_models=()):
+    """
+    Create an ``ArmyUnit`` including all its models and their items in one transaction.
+
+    The army unit itself is saved as usual, its models and their items are inserted with one
+    ``bulk_create`` each. No validation is performed, see ``validation.ArmyValidator``.
+
+    Args:
+        army (Army): The army to add the unit to.
+        unit (Unit): The unit the new army unit is an instance of.
+        name (str): The army units name.
+        army_models (iterable): ``(unit_model_pk, items)`` tuples, ``items`` being an iterable
+            of ``(item_pk, amount)`` tuples.
+
+    Returns:
+        ArmyUnit: The new instance.
+
+    Note:
+        As ``bulk_create`` does not send any signals, the contributions of models and items to
+        the army summaries are applied here.
+    """
+    army_models = [(unit_model_pk, list(items)) for unit_model_pk, items in army_models]
+    with transaction.atomic():
+        army_unit = models.ArmyUnit.objects.create(army=army, unit=unit, name=name)
+        instances = models.ArmyModel.objects.bulk_create([
+            models.ArmyModel(unit=army_unit, model_id=unit_model_pk)
+            for unit_model_pk, items in army_models])
+        if connection.features.can_return_ids_from_bulk_insert:
+            pks = [instance.pk for instance in instances]
+        else:
+            # The army unit is new, so all of its models are the ones we just inserted.
+            pks = models.ArmyModel.objects.filter(unit=army_unit).order_by('pk').values_list(
+                'pk', flat=True)
+        models.ArmyModelItemSlot.objects.bulk_create([
+            models.ArmyModelItemSlot(army_model_id=pk, item_id=item_pk, amount=amount)
+            for pk, (unit_model_pk, items) in zip(pks, army_models)
+            for item_pk, amount in items])
+
+        summaries.apply_difference({}, summaries.get_model_contributions(army_unit))
+    return army_unit
+
+
+def get_expected_damage(weapon_pks=None, target_pks=None, skill=4, attacker_pk=None):
+    """
+    Return the expected damage of catalog weapon profiles against catalog model profiles.
+
+    Profiles are taken from the ``CodexSnapshot`` and results from the ``memo`` table, so a
+    single query is needed for most requests once the snapshot is built.
+
+    Args:
+        weapon_pks (iterable): Primary keys of ``WeaponProfile`` instances. Defaults to all.
+        target_pks (iterable): Primary keys of ``ModelProfile`` instances. Defaults to all.
+        skill (int): The skill to hit with if no attacker is given.
+        attacker_pk (int): Primary key of the ``ModelProfile`` attacking.
+
+    Returns:
+        mathhammer.DamageMatrix: Rows and columns are ordered as given or by primary key.
+
+    Raises:
+        KeyError: If any primary key is unknown.
+    """
+    snapshot = codex.get_snapshot()
+
+    def get_profiles(index, pks):
+        if pks is None:
+            return [index[pk] for pk in sorted(index)]
+        return [index[pk] for pk in pks]
+
+    attacker = snapshot.model_profiles[attacker_pk] if attacker_pk is not None else None
+    return memo.expected_damage(get_profiles(snapshot.weapon_profiles, weapon_pks),
+        get_profiles(snapshot.model_profiles, target_pks), skill=skill, attacker=attacker)
+
+
+def get_army_plan(organization_pk, budget, required=None, objective=optimizer.points_objective,
+        army_pk=None):
+    """
+    Return the best ``optimizer.ArmyPlan`` within a points budget.
+
+    Args:
+        army_pk (int): Primary key of an ``Army`` whose units count against their
+            ``max_per_army``, e.g. to fill its remaining points.
+
+    See ``optimizer.optimize`` for all other arguments.
+    """
+    taken = {}
+    if army_pk is not None:
+        taken = dict(models.ArmyUnit.objects.filter(army=army_pk).order_by().values(
+            'unit').annotate(amount=db_models.Count('pk')).values_list('unit', 'amount'))
+    return optimizer.optimize(organization_pk, budget, required=required,
+        objective=objective, taken=taken)
@@ -0,0 +1,184 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalog, memo, models, pricing, slot_options, summaries
+
+SUMMARY_SENDERS = (models.ArmyUnit, models.ArmyModel, models.ArmyModelItemSlot, models.Unit,
+    models.OrganizationItemIntermediate)
+
+# Stats and ``memo.invalidate`` argument of each profile model with memoized expected damage.
+MEMO_SENDERS = {
+    models.WeaponProfile: (memo.WEAPON_FIELDS, 'weapon_keys'),
+    models.ModelProfile: (memo.TARGET_FIELDS, 'target_keys'),
+}
+
+
+@receiver(post_save, sender=models.Army)
+def create_army_summary(sender, instance, created, raw, **kwargs):
+    """Create an empty summary for each new ``Army``."""
+    if created and not raw:
+        models.ArmySummary.objects.create(army_id=instance.pk)
+
+
+@receiver(post_save, sender=models.OrganizationItemIntermediate)
+@receiver(post_delete, sender=models.OrganizationItemIntermediate)
+@receiver(post_save, sender=models.Organization)
+@receiver(post_delete, sender=models.Organization)
+def invalidate_price_matrix(sender, **kwargs):
+    """
+    Invalidate the price matrix whenever prices or organization names change.
+
+    Note:
+        We invalidate right away so this process sees its own changes and once more after
+        the transaction got committed so that no other process can build a matrix from
+        uncommitted data in between.
+    """
+    pricing.invalidate()
+    transaction.on_commit(pricing.invalidate)
+
+
+def store_old_contributions(sender, instance, raw, **kwargs):
+    """Remember an instance's contribution to army summaries before it gets changed."""
+    if raw:
+        return
+    if instance.pk and sender.objects.filter(pk=instance.pk).exists():
+        instance._old_summary_contributions = summaries.get_contributions(instance)
+    else:
+        instance._old_summary_contributions = {}
+
+
+def apply_new_contributions(sender, instance, created, raw, **kwargs):
+    """Apply the change of an instance's contribution to army summaries."""
+    if raw:
+        return
+    if created and sender is models.ArmyUnit:
+        models.ArmyUnitSummary.objects.create(army_unit_id=instance.pk)
+    old = getattr(instance, '_old_summary_contributions', {})
+    summaries.apply_difference(old, summaries.get_contributions(instance))
+    instance._old_summary_contributions = {}
+
+
+def store_deleted_contributions(sender, instance, **kwargs):
+    """Remember an instance's contribution to army summaries before it gets deleted."""
+    instance._old_summary_contributions = summaries.get_deleted_contributions(instance)
+
+
+def remove_deleted_contributions(sender, instance, **kwargs):
+    """Remove a deleted instance's contribution from army summaries."""
+    summaries.apply_difference(getattr(instance, '_old_summary_contributions', {}), {})
+    summaries.release_claims(instance)
+
+
+for sender in SUMMARY_SENDERS:
+    pre_save.connect(store_old_contributions, sender=sender)
+    post_save.connect(apply_new_contributions, sender=sender)
+    pre_delete.connect(store_deleted_contributions, sender=sender)
+    post_delete.connect(remove_deleted_contributions, sender=sender)
+
+
+def store_catalog_scope(sender, instance, **kwargs):
+    """Remember the scope of an instance before it gets deleted."""
+    instance._catalog_scope = catalog.get_scope(sender, [instance.pk])
+
+
+def bump_catalog_version(sender, instance, signal, **kwargs):
+    """
+    Bump the catalog version whenever any catalog data changes.
+
+    Note:
+        Just as with prices, we bump right away and once more after the transaction
+        got committed.
+    """
+    action = kwargs.get('action')
+    if action is None:
+        if signal is post_delete:
+            scope = instance._catalog_scope
+        else:
+            scope = catalog.get_scope(sender, [instance.pk])
+    elif action.startswith('post_'):
+        if not kwargs['reverse']:
+            scope = catalog.get_scope(type(instance), [instance.pk])
+        elif kwargs['pk_set'] is not None:
+            scope = catalog.get_scope(kwargs['model'], kwargs['pk_set'])
+        else:
+            # The instances that got cleared are unknown, so anything may be affected.
+            scope = (None, ())
+    else:
+        return
+    catalog.bump_version(*scope)
+    transaction.on_commit(partial(catalog.bump_version, *scope))
+
+
+for sender in catalog.CATALOG_MODELS:
+    post_save.connect(bump_catalog_version, sender=sender)
+    pre_delete.connect(store_catalog_scope, sender=sender)
+    post_delete.connect(bump_catalog_version, sender=sender)
+
+for sender in catalog.CATALOG_M2M_THROUGH_MODELS:
+    m2m_changed.connect(bump_catalog_version, sender=sender)
+
+
+def invalidate_unused_expected_damage(sender, stats, exclude_pk=None):
+    """Delete memoized expected damage of a profiles stats, unless other profiles share them."""
+    fields, argument = MEMO_SENDERS[sender]
+    if not sender.objects.filter(**dict(zip(fields, stats))).exclude(pk=exclude_pk).exists():
+        memo.invalidate(**{argument: [memo.get_key(stats)]})
+
+
+@receiver(pre_save, sender=models.WeaponProfile)
+@receiver(pre_save, sender=models.ModelProfile)
+def invalidate_changed_expected_damage(sender, instance, raw, **kwargs):
+    """Delete memoized expected damage of a profiles old stats if they are no longer in use."""
+    if raw or not instance.pk:
+        return
+    fields = MEMO_SENDERS[sender][0]
+    old = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    if old is None:
+        return
+    if memo.get_key(old) != memo.get_key(getattr(instance, name) for name in fields):
+        invalidate_unused_expected_damage(sender, old, exclude_pk=instance.pk)
+
+
+@receiver(post_delete, sender=models.WeaponProfile)
+@receiver(post_delete, sender=models.ModelProfile)
+def invalidate_deleted_expected_damage(sender, instance, **kwargs):
+    """Delete memoized expected damage of a deleted profiles stats if they are unused now."""
+    fields = MEMO_SENDERS[sender][0]
+    invalidate_unused_expected_damage(sender, [getattr(instance, name) for name in fields])
+
+
+def refresh_changed_slot_options(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh the effective options of all slots affected by a many to many change."""
+    if action.startswith('pre_'):
+        instance._affected_item_slots = slot_options.get_affected_slot_pks(sender, instance,
+            reverse, pk_set)
+    else:
+        slot_options.refresh(getattr(instance, '_affected_item_slots', ()))
+        instance._affected_item_slots = set()
+
+
+for sender in (slot_options.ItemSlotOptions, slot_options.ItemSlotLists,
+        slot_options.WargearListItems):
+    m2m_changed.connect(refresh_changed_slot_options, sender=sender)
+
+
+@receiver(post_save, sender=models.ItemSlot)
+def refresh_saved_slot_options(sender, instance, raw, **kwargs):
+    """Refresh the effective options of a slot, as its default may have changed."""
+    if not raw:
+        slot_options.refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=models.WargearList)
+def store_wargear_list_slots(sender, instance, **kwargs):
+    """Remember the slots using a wargear list before it gets deleted."""
+    instance._affected_item_slots = slot_options.get_wargear_list_slot_pks(instance)
+
+
+@receiver(post_delete, sender=models.WargearList)
+def refresh_wargear_list_slot_options(sender, instance, **kwargs):
+    """Refresh the effective options of all slots that used a deleted wargear list."""
+    slot_options.refresh(getattr(instance, '_affected_item_slots', ()))
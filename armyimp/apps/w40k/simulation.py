@@ -0,0 +1,219 @@
+"""
+Monte Carlo combat simulation between army units.
+
+The attacking units loadout is resolved into groups of identical weapons, the defending unit
+into its models in allocation order. Both are plain data, so trials can be run in worker
+processes without touching the database. Each chunk of trials rolls all its dice as NumPy
+arrays, one element per trial.
+
+Chunks are seeded with ``(seed, chunk index)``. The outcome therefore only depends on the
+seed, the amount of trials and the chunk size, not on the amount of workers.
+
+Note:
+    Hits are rolled for all attacks of a weapon group at once. Wounds, saves and damage are
+    rolled hit by hit, as each hit is allocated to the first defending model still alive and
+    damage exceeding a models remaining wounds is lost. Items carrying several profiles of the
+    requested category (e.g. frag and krak grenades) use the one with the highest expected
+    damage against the first defending model.
+"""
+
+import os
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import codex, dice, mathhammer, models
+
+WeaponGroup = namedtuple('WeaponGroup', ('count', 'skill', 'attacks', 'strength',
+    'armor_penetration', 'damage'))
+WeaponGroup.__doc__ = """
+Identical weapons used with the same skill.
+
+Attributes:
+    count (int): The amount of weapons.
+    skill (int): The skill to hit with, ``None`` meaning the weapons can not hit.
+    attacks, strength, damage (tuple): ``(min, max)`` of the weapons characteristics.
+    armor_penetration (int): The weapons armour penetration.
+"""
+
+Defender = namedtuple('Defender', ('toughness', 'saves', 'wounds'))
+Defender.__doc__ = """
+The models of a defending unit in allocation order.
+
+Attributes:
+    toughness, saves, wounds (tuple): The characteristic of each model.
+"""
+
+SimulationResult = namedtuple('SimulationResult', ('trials', 'damage', 'slain', 'seconds',
+    'trials_per_second'))
+SimulationResult.__doc__ = """
+Outcome of a simulation.
+
+Attributes:
+    trials (int): The amount of trials run.
+    damage (numpy.ndarray): Relative frequency of each amount of damage inflicted.
+    slain (numpy.ndarray): Relative frequency of each amount of models slain.
+    seconds (float): Wall clock time taken, including starting the workers.
+    trials_per_second (float): Trials run per second of wall clock time.
+"""
+
+
+def _get_profile(weapon_profiles, category, skill, target):
+    """Return the item profile of ``category`` with the highest expected damage or ``None``."""
+    candidates = [each for each in weapon_profiles if each.category == category]
+    if len(candidates) < 2 or target is None:
+        return candidates[0] if candidates else None
+    matrix = mathhammer.expected_damage(candidates, [target], skill=skill)
+    return candidates[int(np.argmax(matrix.damage[:, 0]))]
+
+
+def get_model_profiles(army_unit):
+    """Return the ``ModelProfileRecord`` of each model of an ``ArmyUnit``, in allocation order."""
+    snapshot = codex.get_snapshot()
+    return [snapshot.unit_models[pk].profile for pk in models.ArmyModel.objects.filter(
+        unit=army_unit).order_by('pk').values_list('model', flat=True)]
+
+
+def load_weapons(army_unit, category, target):
+    """
+    Return the ``WeaponGroup`` tuples for the loadout of an ``ArmyUnit``.
+
+    As with validation, a model without any items is considered to carry its slots defaults.
+
+    Args:
+        category (str): The ``WeaponProfile.category`` to use, ``'Ranged'`` or ``'Melee'``.
+        target: The ``ModelProfile`` (record) profiles are chosen against or ``None``.
+    """
+    snapshot = codex.get_snapshot()
+    items = defaultdict(list)
+    for army_model, item, amount in models.ArmyModelItemSlot.objects.filter(
+            army_model__unit=army_unit).values_list('army_model', 'item', 'amount'):
+        items[army_model].append((item, amount))
+
+    counts = Counter()
+    for pk, unit_model_pk in models.ArmyModel.objects.filter(unit=army_unit).values_list(
+            'pk', 'model'):
+        unit_model = snapshot.unit_models[unit_model_pk]
+        profile = unit_model.profile
+        skill = profile.weapon_skill if category == 'Melee' else profile.balistic_skill
+        carried = items[pk] or [(slot.default.pk, 1) for slot in unit_model.item_slots
+            if slot.default]
+        for item_pk, amount in carried:
+            weapon = _get_profile(snapshot.items[item_pk].weapon_profiles, category, skill,
+                target)
+            if weapon is not None:
+                counts[weapon.pk, skill] += amount
+
+    groups = []
+    for (weapon_pk, skill), count in sorted(counts.items(), key=lambda each: each[0][0]):
+        weapon = snapshot.weapon_profiles[weapon_pk]
+        groups.append(WeaponGroup(count, skill, tuple(weapon.number_of_attacks),
+            tuple(weapon.strength), weapon.armor_penetration or 0, tuple(weapon.damage)))
+    return groups
+
+
+def _roll(random, value, shape):
+    """Return rolls of a ``(min, max)`` characteristic, see ``dice.parse_range``."""
+    parsed = dice.parse_range(*value)
+    if parsed is None:
+        return random.randint(value[0], value[1] + 1, shape)
+    count, sides, modifier = parsed
+    if not count:
+        return np.full(shape, modifier, dtype=int)
+    return random.randint(1, sides + 1, shape + (count,)).sum(axis=-1) + modifier
+
+
+def _needed(probability):
+    """Return the D6 roll needed to succeed with ``probability``, ``7`` meaning never."""
+    return np.rint(7 - 6 * probability)
+
+
+def simulate_chunk(groups, defender, trials, seed):
+    """
+    Run a chunk of trials.
+
+    Returns:
+        tuple: Counts of each amount of damage inflicted and of models slain.
+    """
+    random = np.random.RandomState(seed)
+    toughness, wounds = np.array(defender.toughness), np.array(defender.wounds)
+    saves = np.array(defender.saves, dtype=float)
+    size = len(wounds)
+    index = np.zeros(trials, dtype=int)
+    remaining = np.full(trials, wounds[0] if size else 0, dtype=int)
+    damage = np.zeros(trials, dtype=int)
+
+    for group in groups:
+        attacks = _roll(random, group.attacks, (trials, group.count)).sum(axis=1)
+        skill = np.nan if group.skill is None else float(group.skill)
+        hits = random.binomial(attacks, float(mathhammer.success_probability(skill)))
+        save_needed = _needed(mathhammer.success_probability(
+            saves + abs(group.armor_penetration)))
+        for hit in range(int(hits.max()) if size and trials else 0):
+            active = (hit < hits) & (index < size)
+            current = np.minimum(index, size - 1)
+            strength = _roll(random, group.strength, (trials,))
+            wounded = random.randint(1, 7, trials) >= _needed(
+                mathhammer.wound_probability(strength, toughness[current]))
+            saved = random.randint(1, 7, trials) >= save_needed[current]
+            dealt = np.where(active & wounded & ~saved,
+                np.minimum(_roll(random, group.damage, (trials,)), remaining), 0)
+            remaining -= dealt
+            damage += dealt
+            slain = (dealt > 0) & (remaining == 0)
+            index += slain
+            remaining = np.where(slain, wounds[np.minimum(index, size - 1)], remaining)
+
+    return np.bincount(damage), np.bincount(index)
+
+
+def _add(total, counts):
+    """Return the sum of two count arrays of possibly different length."""
+    if len(counts) > len(total):
+        total, counts = counts, total
+    total = total.copy()
+    total[:len(counts)] += counts
+    return total
+
+
+def simulate(attacker, defender, trials=100000, category='Ranged', seed=0, workers=None,
+        chunk_size=50000):
+    """
+    Simulate an ``ArmyUnit`` attacking another one.
+
+    Args:
+        attacker, defender (ArmyUnit): The units involved.
+        trials (int): The amount of trials to run.
+        category (str): The ``WeaponProfile.category`` to attack with.
+        seed (int): Seed for the random numbers of all chunks.
+        workers (int): The amount of worker processes, defaulting to the amount of CPUs.
+            ``0`` runs all trials in this process.
+        chunk_size (int): The amount of trials per chunk.
+
+    Returns:
+        SimulationResult
+    """
+    started = time.perf_counter()
+    profiles = get_model_profiles(defender)
+    target = Defender(*(tuple(getattr(profile, name) for profile in profiles)
+        for name in Defender._fields))
+    groups = load_weapons(attacker, category, profiles[0] if profiles else None)
+
+    sizes = [min(chunk_size, trials - start) for start in range(0, trials, chunk_size)]
+    arguments = ([groups] * len(sizes), [target] * len(sizes), sizes,
+        [[seed, index] for index in range(len(sizes))])
+    if workers == 0:
+        results = list(map(simulate_chunk, *arguments))
+    else:
+        workers = min(workers or os.cpu_count() or 1, len(sizes)) or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(simulate_chunk, *arguments))
+
+    damage, slain = np.zeros(1, dtype=int), np.zeros(1, dtype=int)
+    for chunk_damage, chunk_slain in results:
+        damage, slain = _add(damage, chunk_damage), _add(slain, chunk_slain)
+    seconds = time.perf_counter() - started
+    return SimulationResult(trials, damage / max(trials, 1), slain / max(trials, 1), seconds,
+        trials / seconds if seconds else float('inf'))
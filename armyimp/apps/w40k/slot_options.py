@@ -0,0 +1,112 @@
+"""
+Materialized effective options of item slots.
+
+The items a slot may take are its default, its options and the items of its wargear lists.
+Instead of joining all of those whenever we need them, they are stored as ``ItemSlotOption``
+rows. The signal handlers in ``signals.py`` refresh the rows of all affected slots whenever
+any of the involved many to many relations, a slots default or a wargear list changes.
+"""
+
+from collections import defaultdict
+
+from . import models
+
+ItemSlotOptions = models.ItemSlot.options.through
+ItemSlotLists = models.ItemSlot.option_from_list.through
+WargearListItems = models.WargearList.items.through
+
+
+def get_effective_options(slot_pks=None):
+    """
+    Compute the effective options of item slots from scratch.
+
+    Args:
+        slot_pks (iterable): Primary keys of the slots. Defaults to all slots.
+
+    Returns:
+        dict: ``{slot_pk: set(item_pks)}``, including all requested slots.
+    """
+    slots = models.ItemSlot.objects.all()
+    options = ItemSlotOptions.objects.all()
+    lists = ItemSlotLists.objects.all()
+    if slot_pks is not None:
+        slots = slots.filter(pk__in=slot_pks)
+        options = options.filter(itemslot__in=slot_pks)
+        lists = lists.filter(itemslot__in=slot_pks)
+
+    result = {}
+    for slot_pk, default_pk in slots.values_list('pk', 'default'):
+        result[slot_pk] = {default_pk} if default_pk is not None else set()
+    for slot_pk, item_pk in options.values_list('itemslot', 'item'):
+        result[slot_pk].add(item_pk)
+    for slot_pk, item_pk in lists.filter(wargearlist__items__isnull=False).values_list(
+            'itemslot', 'wargearlist__items'):
+        result[slot_pk].add(item_pk)
+    return result
+
+
+def refresh(slot_pks=None):
+    """
+    Bring the ``ItemSlotOption`` rows of item slots up to date.
+
+    Only rows that actually changed are deleted or inserted.
+
+    Args:
+        slot_pks (iterable): Primary keys of the slots. Defaults to all slots.
+    """
+    if slot_pks is not None:
+        slot_pks = set(slot_pks)
+        if not slot_pks:
+            return
+    expected = get_effective_options(slot_pks)
+    existing = models.ItemSlotOption.objects.all()
+    if slot_pks is not None:
+        existing = existing.filter(item_slot__in=slot_pks)
+    stale = []
+    current = defaultdict(set)
+    for pk, slot_pk, item_pk in existing.values_list('pk', 'item_slot', 'item'):
+        if item_pk in expected.get(slot_pk, ()):
+            current[slot_pk].add(item_pk)
+        else:
+            stale.append(pk)
+    if stale:
+        models.ItemSlotOption.objects.filter(pk__in=stale).delete()
+    models.ItemSlotOption.objects.bulk_create([
+        models.ItemSlotOption(item_slot_id=slot_pk, item_id=item_pk)
+        for slot_pk, item_pks in expected.items()
+        for item_pk in item_pks - current[slot_pk]])
+
+
+def get_affected_slot_pks(sender, instance, reverse, pk_set):
+    """
+    Return the primary keys of all slots affected by a change of a many to many relation.
+
+    As the relation may get cleared, this needs to be called before it changes.
+
+    Args:
+        sender: The through model of ``ItemSlot.options``, ``ItemSlot.option_from_list`` or
+            ``WargearList.items``.
+        instance, reverse, pk_set: As given to ``m2m_changed`` handlers.
+    """
+    if sender is WargearListItems:
+        if not reverse:
+            wargear_list_pks = [instance.pk]
+        elif pk_set is not None:
+            wargear_list_pks = pk_set
+        else:
+            wargear_list_pks = WargearListItems.objects.filter(item=instance).values_list(
+                'wargearlist', flat=True)
+        return set(ItemSlotLists.objects.filter(wargearlist__in=wargear_list_pks)
+            .values_list('itemslot', flat=True))
+    if not reverse:
+        return {instance.pk}
+    if pk_set is not None:
+        return set(pk_set)
+    lookup = {'item': instance} if sender is ItemSlotOptions else {'wargearlist': instance}
+    return set(sender.objects.filter(**lookup).values_list('itemslot', flat=True))
+
+
+def get_wargear_list_slot_pks(wargear_list):
+    """Return the primary keys of all slots using a ``WargearList``."""
+    return set(ItemSlotLists.objects.filter(wargearlist=wargear_list).values_list(
+        'itemslot', flat=True))
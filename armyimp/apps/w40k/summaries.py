@@ -0,0 +1,229 @@
+"""
+Incremental maintenance of ``ArmySummary`` and ``ArmyUnitSummary`` rows.
+
+Every instance that influences a summary has a *contribution*: the values it adds to the
+summaries of the army units and armies it belongs to. Contributions are collected by aggregate
+queries as ``{(army_unit_pk, army_pk): {field: value}}`` dicts. Whenever an instance changes
+we compute its contribution before and after the change and apply the difference as a delta
+via ``UPDATE ... SET field = field + delta``. Nothing is ever recomputed from scratch except by
+``rebuild``.
+
+Deleting an item deletes its prices and the wargear slots carrying it in one go, and both would
+contribute the same wargear points. As all ``pre_delete`` handlers of a deletion run before any
+``post_delete`` handler, the first instance to collect a slots points *claims* the slot until
+it is deleted itself, and later ones skip claimed slots (see ``get_deleted_contributions``).
+Claims are tied to the transaction they were made in, so a deletion that fails half way does
+not leave any claims behind.
+"""
+
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.db import models as db_models
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, Sum
+
+from . import models
+
+UNIT_SUMMARY_FIELDS = ('points', 'power_rating', 'model_count')
+
+_claims = threading.local()
+
+
+def _add(contributions, key, **values):
+    """Add ``values`` to the contribution stored under ``key``."""
+    for field, value in values.items():
+        contributions[key][field] += value or 0
+
+
+def _empty():
+    """Return a new, empty contributions dict."""
+    return defaultdict(lambda: defaultdict(int))
+
+
+def collect_army_unit_rows(contributions, **filters):
+    """Collect power rating and category counts of all ``ArmyUnit`` instances matching filters."""
+    rows = models.ArmyUnit.objects.filter(**filters).values(
+        'pk', 'army', 'unit__power_rating', 'unit__category')
+    for row in rows:
+        values = {'power_rating': row['unit__power_rating']}
+        category_field = models.ArmySummary.CATEGORY_COUNT_FIELDS.get(row['unit__category'])
+        if category_field:
+            values[category_field] = 1
+        _add(contributions, (row['pk'], row['army']), **values)
+
+
+def collect_army_model_rows(contributions, **filters):
+    """Collect model points and counts of all ``ArmyModel`` instances matching filters."""
+    rows = (models.ArmyModel.objects.filter(**filters).order_by()
+        .values('unit', 'unit__army')
+        .annotate(points=Sum('unit__unit__model_price'), model_count=Count('pk')))
+    for row in rows:
+        _add(contributions, (row['unit'], row['unit__army']),
+            points=row['points'], model_count=row['model_count'])
+
+
+def collect_wargear_rows(contributions, **filters):
+    """Collect wargear points of all ``ArmyModelItemSlot`` instances matching filters."""
+    expression = ExpressionWrapper(
+        F('amount') * F('item__organizationitemintermediate__price'),
+        output_field=db_models.IntegerField()
+    )
+    rows = (models.ArmyModelItemSlot.objects.filter(
+        item__organizationitemintermediate__organization=F(
+            'army_model__unit__unit__organization'), **filters)
+        .order_by().values('army_model__unit', 'army_model__unit__army')
+        .annotate(points=Sum(expression)))
+    for row in rows:
+        _add(contributions, (row['army_model__unit'], row['army_model__unit__army']),
+            points=row['points'])
+
+
+def get_contributions(instance, include_children=True):
+    """
+    Return the contribution ``instance`` (as currently stored in the database) makes.
+
+    Args:
+        instance (django.db.models.Model): The instance in question.
+        include_children (bool): If ``False`` the contributions of dependent instances (e.g. the
+            models of an army unit) are not included. This is needed on deletion as those
+            dependent instances get deleted (and accounted for) on their own.
+
+    Returns:
+        dict: ``{(army_unit_pk, army_pk): {field: value}}``
+    """
+    contributions = _empty()
+    if isinstance(instance, models.ArmyModelItemSlot):
+        collect_wargear_rows(contributions, pk=instance.pk)
+    elif isinstance(instance, models.ArmyModel):
+        collect_army_model_rows(contributions, pk=instance.pk)
+        if include_children:
+            collect_wargear_rows(contributions, army_model=instance.pk)
+    elif isinstance(instance, models.ArmyUnit):
+        collect_army_unit_rows(contributions, pk=instance.pk)
+        if include_children:
+            collect_army_model_rows(contributions, unit=instance.pk)
+            collect_wargear_rows(contributions, army_model__unit=instance.pk)
+    elif isinstance(instance, models.Unit):
+        if include_children:
+            collect_army_unit_rows(contributions, unit=instance.pk)
+            collect_army_model_rows(contributions, unit__unit=instance.pk)
+            collect_wargear_rows(contributions, army_model__unit__unit=instance.pk)
+    elif isinstance(instance, models.OrganizationItemIntermediate):
+        collect_wargear_rows(contributions, item__organizationitemintermediate=instance.pk)
+    else:
+        raise TypeError("Instances of {} do not contribute to army summaries.".format(
+            type(instance).__name__))
+    return contributions
+
+
+def _end_claims():
+    """Do nothing, registered with ``on_commit`` to mark the transaction of the claims."""
+    pass
+
+
+def _get_claimed_slot_pks():
+    """
+    Return the set of primary keys of wargear slots claimed in this thread.
+
+    Claims start over once the transaction (or savepoint) they were made in got committed or
+    rolled back, that is once their marker is no longer a pending ``on_commit`` callback.
+    """
+    marker = getattr(_claims, 'marker', None)
+    pending = transaction.get_connection().run_on_commit
+    # The marker is usually one of the last callbacks.
+    if marker is None or not any(func is marker for sids, func in reversed(pending)):
+        # A distinct callback for each transaction.
+        _claims.marker = partial(_end_claims)
+        _claims.slot_pks = set()
+        transaction.on_commit(_claims.marker)
+    return _claims.slot_pks
+
+
+def get_deleted_contributions(instance):
+    """
+    Return the contribution of an instance that is about to be deleted.
+
+    Dependent instances are not included, as they get deleted (and accounted for) on their own.
+    The wargear points of each ``ArmyModelItemSlot`` are only included by the first price or
+    slot collecting them, until ``release_claims`` gets called for it.
+    """
+    if isinstance(instance, models.ArmyModelItemSlot):
+        slots = models.ArmyModelItemSlot.objects.filter(pk=instance.pk)
+    elif isinstance(instance, models.OrganizationItemIntermediate):
+        slots = models.ArmyModelItemSlot.objects.filter(item=instance.item_id,
+            army_model__unit__unit__organization=instance.organization_id)
+    else:
+        return get_contributions(instance, include_children=False)
+    claimed = _get_claimed_slot_pks()
+    slot_pks = set(slots.values_list('pk', flat=True)) - claimed
+    claimed.update(slot_pks)
+    instance._claimed_slot_pks = slot_pks
+    contributions = _empty()
+    if slot_pks:
+        collect_wargear_rows(contributions, pk__in=slot_pks)
+    return contributions
+
+
+def release_claims(instance):
+    """Release the wargear slots claimed by a deleted instance."""
+    _get_claimed_slot_pks().difference_update(getattr(instance, '_claimed_slot_pks', ()))
+    instance._claimed_slot_pks = set()
+
+
+def get_model_contributions(army_unit):
+    """
+    Return the contribution the models of an ``ArmyUnit`` and their items make.
+
+    This is what needs to be applied after models or items got inserted without signals,
+    e.g. by ``bulk_create``.
+    """
+    contributions = _empty()
+    collect_army_model_rows(contributions, unit=army_unit.pk)
+    collect_wargear_rows(contributions, army_model__unit=army_unit.pk)
+    return contributions
+
+
+def apply_deltas(army_unit_pk, army_pk, deltas):
+    """Add ``deltas`` to the summaries of the given army unit and army."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    unit_deltas = {field: F(field) + value for field, value in deltas.items()
+        if field in UNIT_SUMMARY_FIELDS}
+    if unit_deltas:
+        models.ArmyUnitSummary.objects.filter(army_unit=army_unit_pk).update(**unit_deltas)
+    if deltas:
+        models.ArmySummary.objects.filter(army=army_pk).update(
+            **{field: F(field) + value for field, value in deltas.items()})
+
+
+def apply_difference(old, new):
+    """Apply the difference between two contributions to the affected summaries."""
+    for key in set(old) | set(new):
+        fields = set(old.get(key, {})) | set(new.get(key, {}))
+        deltas = {field: new.get(key, {}).get(field, 0) - old.get(key, {}).get(field, 0)
+            for field in fields}
+        apply_deltas(key[0], key[1], deltas)
+
+
+def rebuild(army_pks):
+    """Recompute all summaries of the given armies from scratch."""
+    army_pks = list(army_pks)
+    contributions = _empty()
+    collect_army_unit_rows(contributions, army__in=army_pks)
+    collect_army_model_rows(contributions, unit__army__in=army_pks)
+    collect_wargear_rows(contributions, army_model__unit__army__in=army_pks)
+
+    army_summaries = {pk: models.ArmySummary(army_id=pk) for pk in army_pks}
+    army_unit_summaries = []
+    for (army_unit_pk, army_pk), values in contributions.items():
+        army_unit_summaries.append(models.ArmyUnitSummary(army_unit_id=army_unit_pk,
+            **{field: values[field] for field in UNIT_SUMMARY_FIELDS}))
+        army_summary = army_summaries[army_pk]
+        for field, value in values.items():
+            setattr(army_summary, field, getattr(army_summary, field) + value)
+
+    models.ArmyUnitSummary.objects.filter(army_unit__army__in=army_pks).delete()
+    models.ArmySummary.objects.filter(army__in=army_pks).delete()
+    models.ArmySummary.objects.bulk_create(army_summaries.values())
+    models.ArmyUnitSummary.objects.bulk_create(army_unit_summaries)
@@ -8,6 +8,12 @@ app_name = 'w40k'
 
 router = routers.DefaultRouter()
 router.register(r'units', viewsets.UnitViewSet)
+router.register(r'armies', viewsets.ArmyViewSet)
+router.register(r'army_units', viewsets.ArmyUnitViewSet)
+router.register(r'expected_damage', viewsets.ExpectedDamageViewSet, base_name='expected_damage')
+router.register(r'loadouts', viewsets.LoadoutViewSet, base_name='loadouts')
+router.register(r'army_plan', viewsets.ArmyPlanViewSet, base_name='army_plan')
+router.register(r'search', viewsets.SearchViewSet, base_name='search')
 
 urlpatterns = [
     path(r'', generic_views.TemplateView.as_view(template_name='w40k/landing_page.html'),
@@ -0,0 +1,15 @@
+"""Helpers shared by several modules of this app."""
+
+from itertools import islice
+
+# Keep the amount of query parameters per statement well below the limits of all backends.
+QUERY_CHUNK_SIZE = 500
+
+
+def chunks(iterable, size=QUERY_CHUNK_SIZE):
+    """Yield successive chunks of ``iterable`` as lists, consuming it lazily."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
@@ -0,0 +1,212 @@
+"""
+Army legality validation.
+
+Each units constraints are compiled once (per catalog version) from the ``CodexSnapshot``
+into lookup tables. Validating an army then takes a single pass over its units, models and
+items, which are fetched with a fixed amount of queries.
+
+Note:
+    ``ArmyModelItemSlot`` instances are not linked to a particular ``ItemSlot``. Items are
+    therefore assigned to the eligible slots of their model, most constrained items first.
+    A model without any items is considered to carry its slots default items.
+"""
+
+import threading
+from collections import Counter, defaultdict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext as _
+
+from . import codex, models
+
+Violation = namedtuple('Violation', ('code', 'message', 'army_unit', 'army_model'))
+Violation.__doc__ = """
+A single rule violation.
+
+Attributes:
+    code (str): Machine readable identifier of the violated rule.
+    message (str): Human readable description.
+    army_unit: Key (usually the primary key) of the offending ``ArmyUnit`` or ``None``.
+    army_model: Key (usually the primary key) of the offending ``ArmyModel`` or ``None``.
+"""
+
+# Plain data representation of an army as consumed by ``ArmyValidator.validate_units``.
+UnitData = namedtuple('UnitData', ('key', 'unit_pk', 'models'))
+ModelData = namedtuple('ModelData', ('key', 'unit_model_pk', 'items'))
+
+SlotRules = namedtuple('SlotRules', ('pk', 'min_amount', 'max_amount', 'default_pk',
+    'eligible_item_pks'))
+ModelRules = namedtuple('ModelRules', ('pk', 'name', 'min_amount', 'max_amount', 'slots',
+    'slots_by_item'))
+UnitRules = namedtuple('UnitRules', ('pk', 'name', 'max_per_army', 'models_min', 'models_max',
+    'unit_models'))
+
+_lock = threading.Lock()
+_compiled = {'version': None, 'rules': {}}
+
+
+def _compile_unit(record):
+    """Return ``UnitRules`` for a ``UnitRecord``."""
+    unit_models = {}
+    for model in record.models:
+        slots, slots_by_item = [], defaultdict(list)
+        for slot in model.item_slots:
+            default_pk = slot.default.pk if slot.default else None
+            slot_rules = SlotRules(slot.pk, slot.min_amount, slot.max_amount, default_pk,
+                slot.eligible_item_pks)
+            slots.append(slot_rules)
+            for item_pk in slot.eligible_item_pks:
+                slots_by_item[item_pk].append(slot_rules)
+        unit_models[model.pk] = ModelRules(model.pk, model.name, model.min_amount,
+            model.max_amount, tuple(slots), dict(slots_by_item))
+    return UnitRules(record.pk, record.name, record.max_per_army, record.models_min,
+        record.models_max, unit_models)
+
+
+def get_unit_rules(unit_pk):
+    """
+    Return the compiled ``UnitRules`` for a unit.
+
+    Raises:
+        ValidationError: If there is no such unit.
+    """
+    snapshot = codex.get_snapshot()
+    if unit_pk not in snapshot.units:
+        # The unit may have been created by a process that does not share our cache.
+        codex.invalidate()
+        snapshot = codex.get_snapshot()
+        if unit_pk not in snapshot.units:
+            raise ValidationError(_("There is no unit {pk}.").format(pk=unit_pk),
+                code='unknown_unit')
+    with _lock:
+        if _compiled['version'] != snapshot.version:
+            _compiled['version'] = snapshot.version
+            _compiled['rules'] = {}
+        rules = _compiled['rules'].get(unit_pk)
+        if rules is None:
+            rules = _compile_unit(snapshot.get_unit(unit_pk))
+            _compiled['rules'][unit_pk] = rules
+    return rules
+
+
+class ArmyValidator(object):
+    """Validate whole armies against all constraints of their units."""
+
+    def validate(self, army):
+        """
+        Validate an ``Army`` as stored in the database.
+
+        Returns:
+            list: ``Violation`` instances. An empty list means the army is legal.
+        """
+        return self.validate_units(self.load_units(army))
+
+    def load_units(self, army):
+        """Return the plain ``UnitData`` representation of an army, using three queries."""
+        items = defaultdict(list)
+        for army_model, item, amount in models.ArmyModelItemSlot.objects.filter(
+                army_model__unit__army=army).values_list('army_model', 'item', 'amount'):
+            items[army_model].append((item, amount))
+        army_models = defaultdict(list)
+        for pk, army_unit, unit_model in models.ArmyModel.objects.filter(
+                unit__army=army).order_by('pk').values_list('pk', 'unit', 'model'):
+            army_models[army_unit].append(ModelData(pk, unit_model, items[pk]))
+        return [UnitData(pk, unit, army_models[pk]) for pk, unit in
+            models.ArmyUnit.objects.filter(army=army).order_by('pk').values_list('pk', 'unit')]
+
+    def validate_units(self, units):
+        """
+        Validate an army given as plain data.
+
+        Args:
+            units (iterable): ``UnitData`` tuples of all units of the army.
+
+        Returns:
+            list: ``Violation`` instances.
+        """
+        violations = []
+        units = list(units)
+        for unit_pk, amount in Counter(unit.unit_pk for unit in units).items():
+            rules = get_unit_rules(unit_pk)
+            if rules.max_per_army is not None and amount > rules.max_per_army:
+                violations.append(Violation('max_per_army', _(
+                    "The army includes {amount} units of {name} but may include {max} at most."
+                ).format(amount=amount, name=rules.name, max=rules.max_per_army), None, None))
+        for unit in units:
+            violations.extend(self.validate_unit(unit))
+        return violations
+
+    def validate_unit(self, unit):
+        """Return all violations of a single unit given as ``UnitData``."""
+        rules = get_unit_rules(unit.unit_pk)
+        violations = []
+
+        def add(code, message, army_model=None, **kwargs):
+            violations.append(Violation(code, message.format(**kwargs), unit.key, army_model))
+
+        amount = len(unit.models)
+        if amount < rules.models_min:
+            add('models_min', _("{name} needs to include at least {min} models, not {amount}."),
+                name=rules.name, min=rules.models_min, amount=amount)
+        if amount > rules.models_max:
+            add('models_max', _("{name} may include {max} models at most, not {amount}."),
+                name=rules.name, max=rules.models_max, amount=amount)
+
+        model_counts = Counter(model.unit_model_pk for model in unit.models)
+        for model_rules in rules.unit_models.values():
+            amount = model_counts.get(model_rules.pk, 0)
+            if amount < model_rules.min_amount:
+                add('unit_model_min', _("{name} needs to be included at least {min} times."),
+                    name=model_rules.name, min=model_rules.min_amount)
+            if amount > model_rules.max_amount:
+                add('unit_model_max', _("{name} may be included {max} times at most."),
+                    name=model_rules.name, max=model_rules.max_amount)
+
+        for model in unit.models:
+            model_rules = rules.unit_models.get(model.unit_model_pk)
+            if model_rules is None:
+                add('foreign_model', _("This model is no option for {name}."), model.key,
+                    name=rules.name)
+                continue
+            for code, message, kwargs in self.validate_items(model_rules, model.items):
+                add(code, message, model.key, **kwargs)
+        return violations
+
+    def validate_items(self, model_rules, items):
+        """
+        Yield ``(code, message, kwargs)`` for each item related violation of a model.
+
+        Args:
+            model_rules (ModelRules): The compiled rules of the models ``UnitModel``.
+            items (iterable): ``(item_pk, amount)`` tuples of the models items.
+        """
+        items = list(items)
+        if not items:
+            items = [(slot.default_pk, 1) for slot in model_rules.slots if slot.default_pk]
+
+        fill = {slot.pk: 0 for slot in model_rules.slots}
+        # Assign the most constrained items first.
+        items.sort(key=lambda item: len(model_rules.slots_by_item.get(item[0], ())))
+        for item_pk, amount in items:
+            candidates = model_rules.slots_by_item.get(item_pk)
+            if not candidates:
+                item = codex.get_snapshot().items.get(item_pk)
+                yield ('item_not_eligible', _("{item} is no option for {name}."),
+                    {'item': item.name if item else item_pk, 'name': model_rules.name})
+                continue
+            remaining = amount
+            for slot in candidates:
+                free = remaining if slot.max_amount is None else slot.max_amount - fill[slot.pk]
+                taken = max(min(free, remaining), 0)
+                fill[slot.pk] += taken
+                remaining -= taken
+            # Whatever does not fit anywhere overfills the first eligible slot.
+            fill[candidates[0].pk] += remaining
+
+        for slot in model_rules.slots:
+            if slot.min_amount is not None and fill[slot.pk] < slot.min_amount:
+                yield ('slot_min', _("An item slot of {name} needs at least {min} items."),
+                    {'name': model_rules.name, 'min': slot.min_amount})
+            if slot.max_amount is not None and fill[slot.pk] > slot.max_amount:
+                yield ('slot_max', _("An item slot of {name} takes {max} items at most."),
+                    {'name': model_rules.name, 'max': slot.max_amount})
@@ -1,9 +1,13 @@
+import csv
+import itertools
+
 from django.forms import inlineformset_factory
-from django.http import HttpResponseRedirect
+from django.http import (HttpResponseBadRequest, HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
 from django.views import generic as generic_views
 
-from . import forms, models
+from . import conditional, datasheets, forms, keyword_index, models, response_cache
 
 
 class ArmyUnitCreateView(generic_views.CreateView):
@@ -14,9 +18,15 @@ class ArmyUnitCreateView(generic_views.CreateView):
     army_models_formset_prefix = 'models'
 
     def add_unit(self, data):
-        """Add the related unit to the view."""
+        """
+        Add the related unit to the view.
+
+        Note:
+            This also adds the ``UnitModelChoices`` shared by all army model forms.
+        """
         unit_pk = data.get('unit')
         self.unit = get_object_or_404(models.Unit, pk=unit_pk)
+        self.unit_model_choices = forms.UnitModelChoices(self.unit)
         return self.unit
 
     def get(self, request, *args, **kwargs):
@@ -100,7 +110,7 @@ class ArmyUnitCreateView(generic_views.CreateView):
     def get_army_model_formset(self, instance=None):
         """Construct a formset representing models for this unit."""
         def get_form_kwargs(unit):
-            kwargs = {'unit': unit}
+            kwargs = {'unit': unit, 'unit_model_choices': self.unit_model_choices}
             return kwargs
 
         # Create a dummy instance for the forms 'parent' instance.
@@ -133,20 +143,141 @@ class ArmyUnitDetailView(generic_views.DetailView):
     context_object_name = 'unit'
 
 
+class EchoBuffer(object):
+    """A file like object that returns what gets written instead of storing it."""
+
+    def write(self, value):
+        """Return ``value``."""
+        return value
+
+
 class ArmyUnitListView(generic_views.ListView):
-    """List view for ``ArmyUnit`` instances."""
+    """
+    List view for ``ArmyUnit`` instances.
+
+    Army units are filtered by the ``army`` and ``category`` (of their unit) GET parameters
+    and paged by primary key: ``after`` is the last primary key of the previous page, so deep
+    pages are just as cheap as the first one. Each page takes a single query.
+
+    Pass ``format=csv`` to stream all matching army units as CSV instead. Rows are fetched in
+    chunks, so memory use does not grow with the size of the table.
+    """
 
     model = models.ArmyUnit
+    context_object_name = 'armyunit_list'
+    page_size = 50
+    csv_chunk_size = 2000
+    csv_columns = (('pk', 'id'), ('name', 'name'), ('unit__name', 'unit'),
+        ('unit__category', 'category'), ('army__name', 'army'), ('model_count', 'models'),
+        ('points', 'points'))
+
+    def get(self, request, *args, **kwargs):
+        """Validate the GET parameters and stream CSV if requested."""
+        self.filter_form = forms.ArmyUnitFilterForm(request.GET)
+        if not self.filter_form.is_valid():
+            return HttpResponseBadRequest(self.filter_form.errors.as_text())
+        if self.filter_form.cleaned_data['format'] == 'csv':
+            return self.get_csv_response()
+        return super().get(request, *args, **kwargs)
+
+    def get_filtered_queryset(self):
+        """Return all army units matching the filters, ordered by primary key."""
+        return self.filter_form.filter(models.ArmyUnit.objects.with_listing()).order_by('pk')
 
+    def get_queryset(self):
+        """Return the current page plus one army unit to tell whether there is a next page."""
+        queryset = self.get_filtered_queryset()
+        after = self.filter_form.cleaned_data['after']
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        return queryset[:self.page_size + 1]
 
+    def get_context_data(self, **kwargs):
+        """Add the filter form and the query string of the next page, if any."""
+        army_units = list(self.object_list)
+        next_query = None
+        if len(army_units) > self.page_size:
+            army_units = army_units[:self.page_size]
+            query = self.request.GET.copy()
+            query['after'] = army_units[-1].pk
+            next_query = query.urlencode()
+        context = super().get_context_data(object_list=army_units, **kwargs)
+        context['filter_form'] = self.filter_form
+        context['next_query'] = next_query
+        return context
+
+    def get_csv_response(self):
+        """Return a response streaming all matching army units as CSV."""
+        rows = self.get_filtered_queryset().values_list(
+            *(field for field, header in self.csv_columns)).iterator(
+            chunk_size=self.csv_chunk_size)
+        writer = csv.writer(EchoBuffer())
+        lines = itertools.chain([writer.writerow(header for field, header in self.csv_columns)],
+            (writer.writerow(row) for row in rows))
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="army_units.csv"'
+        return response
+
+
+@conditional.codex_condition
+@response_cache.codex_response_cache
 class UnitDetailView(generic_views.DetailView):
-    """Detail view for ``ArmyUnit`` instances."""
+    """
+    Detail view rendering the complete datasheet of ``Unit`` instances.
+
+    The datasheet is fetched in a constant amount of queries (see ``datasheets``). Pass
+    ``format=json`` to get it as JSON instead.
+    """
 
     model = models.Unit
     context_object_name = 'unit'
 
+    def get_queryset(self):
+        """Return a queryset fetching the complete datasheet."""
+        return models.Unit.objects.with_datasheet()
+
+    def get_context_data(self, **kwargs):
+        """Add the units datasheet."""
+        context = super().get_context_data(**kwargs)
+        context['datasheet'] = datasheets.get_datasheet(self.object)
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        """Return the datasheet as JSON if requested."""
+        if self.request.GET.get('format') == 'json':
+            return JsonResponse(context['datasheet'])
+        return super().render_to_response(context, **response_kwargs)
 
+
+@conditional.codex_condition
+@response_cache.codex_response_cache
 class UnitListView(generic_views.ListView):
-    """List view for ``Unit`` instances."""
+    """
+    List view for ``Unit`` instances.
+
+    Units are filtered by their unit and faction keywords with the ``keywords`` GET parameter,
+    a boolean expression like ``infantry and imperium and not character`` (see
+    ``keyword_index``).
+    """
 
     model = models.Unit
+
+    def get_queryset(self):
+        """Return all units matching the keyword expression, if any."""
+        queryset = super().get_queryset()
+        self.keywords = self.request.GET.get('keywords', '')
+        self.keywords_error = None
+        if self.keywords:
+            try:
+                queryset = queryset.filter(pk__in=keyword_index.filter_units(self.keywords))
+            except ValueError as error:
+                self.keywords_error = str(error)
+                queryset = queryset.none()
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        """Add the keyword expression and its error, if any."""
+        context = super().get_context_data(**kwargs)
+        context['keywords'] = self.keywords
+        context['keywords_error'] = self.keywords_error
+        return context
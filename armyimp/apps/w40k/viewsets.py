@@ -1,10 +1,200 @@
-from rest_framework import viewsets
+from django.http import Http404
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
-from . import models, serializers
+from . import (conditional, keyword_index, loadouts, models, pagination, response_cache, search,
+               serializers, services)
 
 
+@conditional.codex_condition
+@response_cache.codex_response_cache
 class UnitViewSet(viewsets.ModelViewSet):
-    """Viewset for ``Unit`` instances."""
+    """
+    Viewset for ``Unit`` instances.
+
+    Clients choose the shape of the representation with the comma separated ``fields`` and
+    ``expand`` query parameters (see ``serializers.ShapedSerializerMixin``). Only relations
+    included in the requested shape are prefetched, instead of the complete datasheet fetched by
+    ``Unit.objects.with_datasheet()``. Units are filtered by their unit and faction
+    keywords with the ``keywords`` query parameter, a boolean expression like
+    ``infantry and imperium and not character`` (see ``keyword_index``).
+    """
 
     queryset = models.Unit.objects.all()
     serializer_class = serializers.UnitSerializer
+    pagination_class = pagination.PrimaryKeyCursorPagination
+
+    def get_shape(self):
+        """Return the requested ``fields`` and ``expand`` paths."""
+        def split(value):
+            return [path.strip() for path in value.split(',') if path.strip()]
+
+        fields = self.request.query_params.get('fields')
+        return {
+            'fields': split(fields) if fields else None,
+            'expand': split(self.request.query_params.get('expand', '')),
+        }
+
+    def get_serializer(self, *args, **kwargs):
+        """Return a serializer of the requested shape."""
+        kwargs.update(self.get_shape())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        """Return a queryset prefetching exactly the relations of the requested shape."""
+        lookups = self.get_serializer().get_prefetch_lookups()
+        queryset = super().get_queryset().prefetch_related(*lookups)
+        expression = self.request.query_params.get('keywords')
+        if expression:
+            try:
+                queryset = queryset.filter(pk__in=keyword_index.filter_units(expression))
+            except ValueError as error:
+                raise ValidationError({'keywords': [str(error)]})
+        return queryset
+
+
+class ArmyViewSet(viewsets.ModelViewSet):
+    """
+    Viewset for ``Army`` instances.
+
+    Armies are listed including their complete roster, fetched with a constant amount of
+    queries. Pass ``?summary=1`` to get only their aggregated numbers instead.
+    """
+
+    queryset = models.Army.objects.all()
+    serializer_class = serializers.ArmySerializer
+    pagination_class = pagination.PrimaryKeyCursorPagination
+
+    def summary_requested(self):
+        """Return ``True`` if only summaries are requested."""
+        return self.request.query_params.get('summary') in ('1', 'true')
+
+    def get_queryset(self):
+        """Return a queryset that prefetches whatever the serializer is going to use."""
+        queryset = super().get_queryset()
+        if self.summary_requested():
+            return queryset.with_summary()
+        return queryset.with_roster()
+
+    def get_serializer_class(self):
+        """Return the summary serializer if requested."""
+        if self.summary_requested():
+            return serializers.ArmySummarySerializer
+        return super().get_serializer_class()
+
+
+class ArmyUnitViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+        mixins.DestroyModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Viewset for ``ArmyUnit`` instances.
+
+    A whole army unit, including its models and their items, is created with a single request
+    and written in one transaction.
+    """
+
+    queryset = models.ArmyUnit.objects.with_roster()
+    serializer_class = serializers.ArmyUnitSerializer
+    pagination_class = pagination.PrimaryKeyCursorPagination
+
+
+@conditional.codex_condition
+@response_cache.codex_response_cache
+class ExpectedDamageViewSet(viewsets.ViewSet):
+    """
+    Viewset for the expected damage of weapon profiles against model profiles.
+
+    Query parameters:
+        weapons, targets: Comma separated primary keys of weapon and model profiles. Default
+            to all profiles.
+        skill: The skill to hit with (2 to 6, default 4).
+        attacker: Primary key of a model profile whose balistic or weapon skill is used
+            instead.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+
+    def list(self, request):
+        """Return the expected damage matrix."""
+        query = serializers.ExpectedDamageQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+        matrix = services.get_expected_damage(data.get('weapons'), data.get('targets'),
+            skill=data['skill'], attacker_pk=data.get('attacker'))
+        return Response(serializers.DamageMatrixSerializer(matrix).data)
+
+
+class LoadoutViewSet(viewsets.ViewSet):
+    """
+    Viewset for the legal loadouts of ``UnitModel`` instances (see ``loadouts``).
+
+    Loadouts of a unit model are paged with the ``limit`` and ``offset`` query parameters,
+    ``count`` holds the amount of all of them.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+    pagination_class = pagination.LoadoutPagination
+
+    def retrieve(self, request, pk=None):
+        """Return a page of the loadouts of a unit model."""
+        try:
+            enumerator = loadouts.get_loadouts(int(pk))
+        except (KeyError, ValueError):
+            raise Http404
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(enumerator, request, view=self)
+        return paginator.get_paginated_response(
+            serializers.LoadoutSerializer(page, many=True).data)
+
+
+class ArmyPlanViewSet(viewsets.ViewSet):
+    """
+    Viewset for the best army composition within a points budget (see ``optimizer``).
+
+    Query parameters:
+        organization: Primary key of the organization to choose units of.
+        budget: The points available.
+        required: Comma separated ``category:amount`` pairs of units to include at least.
+        objective: ``points`` (default), ``power_rating`` or ``expected_damage``.
+        targets: Comma separated primary keys of model profiles, required for
+            ``expected_damage``.
+        army: Primary key of an army whose units count against ``max_per_army``, to fill its
+            remaining points.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+
+    def list(self, request):
+        """Return the best plan or ``404`` if there is none."""
+        query = serializers.ArmyPlanQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+        plan = services.get_army_plan(data['organization'], data['budget'],
+            required=data.get('required'), objective=query.get_objective(),
+            army_pk=data.get('army'))
+        if plan is None:
+            raise Http404
+        return Response(serializers.ArmyPlanSerializer(plan).data)
+
+
+@conditional.codex_condition
+@response_cache.codex_response_cache
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Viewset for full text search across the codex (see ``search``).
+
+    Query parameters:
+        q: The text to search for. Words match exactly, as prefix or, for typos, similar words.
+        kinds: Comma separated kinds of results, out of ``search.KINDS``. Default to all.
+        limit: The maximum amount of results (1 to 100, default 20).
+    """
+
+    permission_classes = (permissions.AllowAny,)
+
+    def list(self, request):
+        """Return the best matches, best first."""
+        query = serializers.SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+        results = search.search(data['q'], kinds=data.get('kinds'), limit=data['limit'])
+        return Response({'results': serializers.SearchResultSerializer(results, many=True).data})
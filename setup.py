@@ -35,6 +35,7 @@ requires = [
     'django-nested-admin==3.0.21',
     'djangorestframework==3.7.7',
     'envdir==0.7',
+    'numpy==1.14.1',
     'psycopg2-binary==2.7.4',
     'pytz==2018.3',
     'rules==1.3',
@@ -1,8 +1,14 @@
+import contextlib
+
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from faker import Faker
 from pytest_factoryboy import register
 
 import factories
+from armyimp.apps.w40k import codex, keyword_index, pricing, search
 
 fake = Faker()
 
@@ -12,6 +18,8 @@ register(factories.UnitFactory)
 register(factories.ModelProfileFactory)
 register(factories.UnitModelFactory)
 register(factories.ArmyunitFactory)
+register(factories.ArmyModelFactory)
+register(factories.ArmyModelItemSlotFactory)
 register(factories.ItemFactory)
 register(factories.OrganizationItemIntermediateFactory)
 register(factories.WeaponProfileFactory)
@@ -21,6 +29,21 @@ register(factories.UnitKeywordFactory)
 register(factories.FactionKeywordFactory)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Make sure no cached catalog data leaks between tests.
+
+    Test transactions get rolled back without sending any signals, so cached data would
+    otherwise outlive the rows it was built from.
+    """
+    cache.clear()
+    pricing.invalidate()
+    keyword_index.invalidate()
+    codex.invalidate()
+    search.invalidate()
+
+
 @pytest.fixture(scope='function')
 def army_unit_data(request, army, unit):
     """A dict suitable as POST data to create an ``ArmyUnit``."""
@@ -45,3 +68,38 @@ def army_unit_data(request, army, unit):
     data.update(management_data)
     data.update(army_model_formset_data)
     return data
+
+
+@pytest.fixture
+def rules_unit(unit_factory, item_factory, wargear_list):
+    """A unit with well defined constraints and a single unit model with one item slot."""
+    unit = unit_factory(max_per_army=1, models_min=2, models_max=3, power_rating=5)
+    unit.models.all().delete()
+    unit_model = factories.UnitModelFactory(unit=unit, min_amount=1, max_amount=3)
+    default, option, listed = item_factory.create_batch(3)
+    wargear_list.items.add(listed)
+    slot = unit_model.item_slots.create(default=default, min_amount=1, max_amount=2)
+    slot.options.add(option)
+    slot.option_from_list.add(wargear_list)
+    unit.test_items = {'default': default, 'option': option, 'listed': listed}
+    return unit
+
+
+@pytest.fixture
+def assert_num_queries(db):
+    """
+    Return a context manager that asserts the amount of executed queries.
+
+    Usage::
+
+        with assert_num_queries(2):
+            do_something()
+    """
+    @contextlib.contextmanager
+    def _assert_num_queries(expected):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        assert executed == expected, '{} queries executed, {} expected:\n{}'.format(
+            executed, expected, '\n'.join(each['sql'] for each in context.captured_queries))
+    return _assert_num_queries
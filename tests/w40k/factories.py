@@ -56,6 +56,7 @@ class UnitFactory(DjangoModelFactory):
 
     name = factory.Faker('name')
     organization = SubFactory(OrganizationFactory)
+    category = models.Unit.UNIT_CATEGORIES[0][0]
     is_named_character = factory.Faker('boolean')
     power_rating = randint(0, 20)
     model_price = randint(0, 200)
@@ -89,10 +90,21 @@ class ArmyModelFactory(DjangoModelFactory):
     class Meta:
         model = models.ArmyModel
 
-    unit = SubFactory(UnitFactory)
+    unit = SubFactory(ArmyunitFactory)
     model = SubFactory(UnitModelFactory)
 
 
+class ArmyModelItemSlotFactory(DjangoModelFactory):
+    """Factory for ``ArmyModelItemSlot`` instances."""
+
+    class Meta:
+        model = models.ArmyModelItemSlot
+
+    item = SubFactory('tests.w40k.factories.ItemFactory')
+    army_model = SubFactory(ArmyModelFactory)
+    amount = 1
+
+
 class ItemFactory(DjangoModelFactory):
     """Factory for ``Item`` instances."""
 
@@ -0,0 +1,69 @@
+import pytest
+from django.core.cache.backends.dummy import DummyCache
+
+import factories
+from armyimp.apps.w40k import catalog
+
+
+@pytest.mark.django_db
+class TestScopedVersions():
+    """Unit tests for catalog versions scoped by unit and organization."""
+
+    def get_version(self, unit):
+        """Return the datasheet version of ``unit``."""
+        return catalog.get_unit_version(unit.pk, unit.organization_id)
+
+    def test_unit_change(self, unit):
+        """Make sure changing a unit bumps only its own version."""
+        other = factories.UnitFactory(organization=unit.organization)
+        version, other_version = self.get_version(unit), self.get_version(other)
+        unit.models.first().item_slots.create()
+        shared, organization, unit_version = self.get_version(unit)
+        assert (shared, organization) == version[:2]
+        assert unit_version > version[2]
+        assert self.get_version(other) == other_version
+
+    def test_organization_change(self, unit, wargear_list_factory):
+        """Make sure changing data of an organization bumps its version."""
+        version = self.get_version(unit)
+        wargear_list_factory(organization=unit.organization)
+        assert self.get_version(unit)[1] > version[1]
+
+    def test_price_change(self, unit, item, organization_item_intermediate_factory):
+        """Make sure prices bump the shared version, as datasheets list all of them."""
+        version = self.get_version(unit)
+        organization_item_intermediate_factory(organization=unit.organization, item=item)
+        assert self.get_version(unit)[0] > version[0]
+
+    def test_shared_change(self, unit, model_profile):
+        """Make sure changing shared data bumps the shared version."""
+        version = self.get_version(unit)
+        model_profile.save()
+        assert self.get_version(unit)[0] > version[0]
+
+    def test_reverse_many_to_many_change(self, unit, unit_keyword):
+        """Make sure relations changed from the reverse side bump the related unit."""
+        version = self.get_version(unit)
+        unit_keyword.unit_set.add(unit)
+        assert self.get_version(unit)[2] > version[2]
+
+    def test_delete(self, unit):
+        """Make sure deleting an instance bumps the version of its unit."""
+        unit_model = unit.models.first()
+        version = self.get_version(unit)
+        unit_model.delete()
+        assert self.get_version(unit)[2] > version[2]
+
+    def test_global_version_bumped(self, unit):
+        """Make sure any change bumps the global version as well."""
+        version = catalog.get_version()
+        unit.save()
+        assert catalog.get_version() > version
+
+    def test_dummy_cache(self, unit, monkeypatch):
+        """Make sure versions work with a cache that does not keep anything."""
+        monkeypatch.setattr(catalog, 'cache', DummyCache('dummy', {}))
+        unit.save()
+        assert None not in self.get_version(unit)
+        assert catalog.get_version() is not None
+        assert catalog.get_last_modified() is not None
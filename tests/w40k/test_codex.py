@@ -0,0 +1,76 @@
+import pytest
+
+import factories
+from armyimp.apps.w40k import catalog, codex
+
+
+@pytest.fixture
+def datasheet_unit(unit, item, wargear_list, unit_keyword, organization_item_intermediate):
+    """A unit with item slots, options and keywords."""
+    wargear_list.items.add(organization_item_intermediate.item)
+    for unit_model in unit.models.all():
+        slot = unit_model.item_slots.create(default=item)
+        slot.options.add(item)
+        slot.option_from_list.add(wargear_list)
+    unit.keywords.add(unit_keyword)
+    return unit
+
+
+@pytest.mark.django_db
+class TestCodexSnapshot():
+    """Unit tests for ``CodexSnapshot``."""
+
+    def test_datasheet(self, datasheet_unit, item, organization_item_intermediate,
+            unit_keyword):
+        """Make sure a units datasheet is resolved with all cross links."""
+        record = codex.get_snapshot().get_unit(datasheet_unit.pk)
+        assert record.name == datasheet_unit.name
+        assert record.keywords == (unit_keyword.name,)
+        unit_models = list(datasheet_unit.models.order_by('pk'))
+        assert [each.name for each in record.models] == [each.name for each in unit_models]
+        slot = record.models[0].item_slots[0]
+        assert slot.default.name == item.name
+        assert slot.eligible_item_pks == {item.pk, organization_item_intermediate.item.pk}
+        assert codex.get_snapshot().get_unit_by_name(datasheet_unit.name) is record
+
+    def test_no_queries_once_built(self, datasheet_unit, assert_num_queries):
+        """Make sure reading the snapshot does not hit the database once built."""
+        codex.get_snapshot()
+        with assert_num_queries(0):
+            record = codex.get_snapshot().get_unit(datasheet_unit.pk)
+            [slot.options for model in record.models for slot in model.item_slots]
+
+    def test_immutable(self, datasheet_unit):
+        """Make sure neither the snapshot nor its records may be changed."""
+        snapshot = codex.get_snapshot()
+        with pytest.raises(AttributeError):
+            snapshot.get_unit(datasheet_unit.pk).name = 'foo'
+        with pytest.raises(AttributeError):
+            snapshot.version = 0
+        with pytest.raises(TypeError):
+            snapshot.units[0] = None
+
+    def test_swapped_on_catalog_change(self, datasheet_unit):
+        """Make sure a catalog change results in a new snapshot."""
+        old_snapshot = codex.get_snapshot()
+        datasheet_unit.name = 'Changed'
+        datasheet_unit.save()
+        new_snapshot = codex.get_snapshot()
+        assert new_snapshot is not old_snapshot
+        assert new_snapshot.version > old_snapshot.version
+        assert new_snapshot.get_unit(datasheet_unit.pk).name == 'Changed'
+        assert old_snapshot.get_unit(datasheet_unit.pk).name != 'Changed'
+
+    def test_swapped_on_m2m_change(self, datasheet_unit):
+        """Make sure changing many to many relations results in a new snapshot."""
+        old_snapshot = codex.get_snapshot()
+        datasheet_unit.keywords.add(factories.UnitKeywordFactory())
+        assert codex.get_snapshot().version > old_snapshot.version
+
+
+@pytest.mark.django_db
+def test_bump_version():
+    """Make sure bumping increments the catalog version."""
+    version = catalog.get_version()
+    assert catalog.bump_version() == version + 1
+    assert catalog.get_version() == version + 1
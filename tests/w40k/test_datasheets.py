@@ -0,0 +1,69 @@
+import pytest
+
+import factories
+from armyimp.apps.w40k import datasheets, models, pricing
+
+
+@pytest.fixture
+def datasheet_unit(unit, item, item_factory, wargear_list, unit_ability, unit_keyword,
+        faction_keyword, organization_item_intermediate):
+    """A unit with item slots, options, weapon profiles, prices, abilities and keywords."""
+    factories.WeaponProfileFactory(weapon=item)
+    wargear_list.items.add(item_factory(name='Listed item'))
+    for unit_model in unit.models.all():
+        slot = unit_model.item_slots.create(default=item)
+        slot.options.add(item)
+        slot.option_from_list.add(wargear_list)
+    unit.abilities.add(unit_ability)
+    unit.keywords.add(unit_keyword)
+    unit.faction_keywords.add(faction_keyword)
+    return unit
+
+
+@pytest.mark.django_db
+class TestGetDatasheet():
+    """Unit tests for ``get_datasheet``."""
+
+    def test_datasheet(self, datasheet_unit, item, organization_item_intermediate,
+            unit_ability, unit_keyword, faction_keyword):
+        """Make sure the datasheet includes all codex data of the unit."""
+        datasheet = datasheets.get_datasheet(models.Unit.objects.with_datasheet().get(
+            pk=datasheet_unit.pk))
+        assert datasheet['name'] == datasheet_unit.name
+        assert datasheet['organization'] == datasheet_unit.organization.name
+        assert datasheet['abilities'] == [{'name': unit_ability.name,
+            'description': unit_ability.description}]
+        assert datasheet['keywords'] == [unit_keyword.name]
+        assert datasheet['faction_keywords'] == [faction_keyword.name]
+        unit_models = list(datasheet_unit.models.order_by('pk'))
+        assert [each['pk'] for each in datasheet['models']] == [each.pk for each in unit_models]
+        model = datasheet['models'][0]
+        assert model['profile']['toughness'] == unit_models[0].profile.toughness
+        slot = model['item_slots'][0]
+        assert slot['default'] == item.name
+        options = {option['name']: option for option in slot['options']}
+        assert set(options) == {item.name, 'Listed item'}
+        assert options[item.name]['weapon_profiles'][0]['name'] == (
+            item.weapon_profiles.get().name)
+        assert options[item.name]['prices'] == [{
+            'organization': organization_item_intermediate.organization.name,
+            'price': organization_item_intermediate.price}]
+
+    def test_query_count(self, datasheet_unit, item_factory, assert_num_queries):
+        """Make sure the datasheet takes the same amount of queries regardless of its size."""
+        def get_datasheet():
+            pricing.get_price_matrix()
+            with assert_num_queries(datasheets.QUERY_COUNT):
+                return datasheets.get_datasheet(models.Unit.objects.with_datasheet().get(
+                    pk=datasheet_unit.pk))
+
+        get_datasheet()
+        for unit_model in datasheet_unit.models.all():
+            for each in range(2):
+                slot = unit_model.item_slots.create(default=item_factory())
+                item = item_factory()
+                factories.WeaponProfileFactory(weapon=item)
+                factories.OrganizationItemIntermediateFactory(item=item)
+                slot.options.add(item)
+        datasheet = get_datasheet()
+        assert len(datasheet['models'][0]['item_slots']) == 3
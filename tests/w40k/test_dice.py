@@ -0,0 +1,119 @@
+from fractions import Fraction
+from itertools import product
+
+import numpy as np
+import pytest
+
+from armyimp.apps.w40k import dice, mathhammer
+
+
+def brute_force(attacks, chance, damage):
+    """Return the exact damage distribution by enumerating every roll."""
+    result = {}
+    for count, count_chance in attacks.items():
+        for outcome in product((True, False), repeat=count):
+            outcome_chance = count_chance
+            for success in outcome:
+                outcome_chance *= chance if success else 1 - chance
+            for damages in product(damage.items(), repeat=sum(outcome)):
+                total, total_chance = 0, outcome_chance
+                for value, value_chance in damages:
+                    total += value
+                    total_chance *= value_chance
+                result[total] = result.get(total, 0) + total_chance
+    return [float(result.get(value, 0)) for value in range(max(result) + 1)]
+
+
+class TestRanges():
+    """Unit tests for dice ranges."""
+
+    @pytest.mark.parametrize(('minimum', 'maximum', 'expectation'), (
+        (3, 3, (0, 1, 3)),
+        (1, 3, (1, 3, 0)),
+        (1, 6, (1, 6, 0)),
+        (2, 6, (2, 3, 0)),
+        (2, 12, (2, 6, 0)),
+        (3, 8, (1, 6, 2)),
+        (1, 5, None),
+    ))
+    def test_parse_range(self, minimum, maximum, expectation):
+        """Make sure ranges are recognized as the usual dice expressions."""
+        assert dice.parse_range(minimum, maximum) == expectation
+
+    def test_range_distribution(self):
+        """Make sure 2D3 gets its exact distribution and is read only."""
+        distribution = dice.range_distribution(2, 6)
+        assert distribution == pytest.approx([0, 0, 1 / 9, 2 / 9, 3 / 9, 2 / 9, 1 / 9])
+        with pytest.raises(ValueError):
+            distribution[0] = 1
+
+    def test_uniform_fallback(self):
+        """Make sure ranges that are no dice expression are uniform."""
+        assert dice.range_distribution(1, 5) == pytest.approx([0] + [1 / 5] * 5)
+
+
+class TestConvolution():
+    """Unit tests for convolutions."""
+
+    def test_fft(self):
+        """Make sure large distributions convolved by FFT match the direct convolution."""
+        first = np.random.dirichlet(np.ones(100))
+        second = np.random.dirichlet(np.ones(80))
+        result = dice.convolve(first, second)
+        assert result == pytest.approx(np.convolve(first, second), abs=1e-12)
+
+    def test_compound_fft(self):
+        """Make sure large compound distributions match the step by step sum."""
+        count = dice.thin(dice.range_distribution(40, 40), 0.5)
+        value = dice.range_distribution(1, 6)
+        expectation, power = np.zeros(241), np.ones(1)
+        for probability in count:
+            expectation[:len(power)] += probability * power
+            power = np.convolve(power, value)
+        result = dice.compound(count, value)
+        assert result == pytest.approx(expectation, abs=1e-12)
+        assert dice.expected(result) == pytest.approx(40 * 0.5 * 3.5)
+
+    def test_at_least(self):
+        """Make sure tail probabilities add up."""
+        assert dice.at_least(dice.range_distribution(1, 6), 5) == pytest.approx(1 / 3)
+        assert dice.at_least(dice.range_distribution(1, 6), -1) == pytest.approx(1)
+
+
+@pytest.mark.django_db
+class TestWeaponDistribution():
+    """Unit tests for ``weapon_distribution``."""
+
+    def test_matches_brute_force(self, weapon_profile_factory, model_profile_factory):
+        """Make sure the distribution is exact for variable attacks and damage."""
+        weapon = weapon_profile_factory(number_of_attacks_min=1, number_of_attacks_max=3,
+            strength_min=5, strength_max=5, armor_penetration=-1, damage_min=1, damage_max=3)
+        target = model_profile_factory(toughness=4, saves=3, wounds=2)
+        result = dice.weapon_distribution(weapon, target, skill=3)
+        # Hit on 3+, wound on 3+, failed save on 1 to 3.
+        chance = Fraction(2, 3) * Fraction(2, 3) * Fraction(1, 2)
+        third = Fraction(1, 3)
+        # Damage beyond the targets two wounds is lost.
+        expectation = brute_force({1: third, 2: third, 3: third}, chance,
+            {1: third, 2: 2 * third})
+        assert result.damage == pytest.approx(expectation)
+        assert result.wounds.sum() == pytest.approx(1)
+
+    def test_matches_expected_damage(self, weapon_profile_factory, model_profile_factory):
+        """Make sure the expected value matches ``mathhammer`` for single dice."""
+        weapon = weapon_profile_factory(number_of_attacks_min=1, number_of_attacks_max=6,
+            strength_min=3, strength_max=8, armor_penetration=-2, damage_min=1, damage_max=6)
+        target = model_profile_factory(toughness=4, saves=3, wounds=3)
+        result = dice.weapon_distribution(weapon, target, skill=4)
+        matrix = mathhammer.expected_damage([weapon], [target], skill=4)
+        assert dice.expected(result.damage) == pytest.approx(matrix.damage[0, 0])
+        assert dice.expected(result.wounds) == pytest.approx(matrix.wounds[0, 0])
+
+    def test_memoized(self, weapon_profile_factory, model_profile_factory):
+        """Make sure equal profiles share a single computation."""
+        weapon = weapon_profile_factory(number_of_attacks_min=2, number_of_attacks_max=2)
+        target = model_profile_factory()
+        first = dice.weapon_distribution(weapon, target)
+        hits = dice.attack_distribution.cache_info().hits
+        assert dice.weapon_distribution(weapon, target) is first
+        assert dice.attack_distribution.cache_info().hits == hits + 1
@@ -1,5 +1,6 @@
 import pytest
 
+import factories
 from armyimp.apps.w40k import forms
 
 
@@ -8,3 +9,43 @@ def test_army_model_form(unit):
     """Make the forms ``model`` field queryset is limited to passed units models."""
     form = forms.ArmyModelForm(unit)
     assert list(form.fields['model'].queryset) == list(unit.models.all())
+
+
+@pytest.mark.django_db
+class TestUnitModelChoices():
+    """Unit tests for ``UnitModelChoices`` and ``UnitModelChoiceField``."""
+
+    def test_choices(self, unit):
+        """Make sure the choices list all units models."""
+        expectation = [(model.pk, str(model)) for model in unit.models.order_by('pk')]
+        assert forms.UnitModelChoices(unit).choices == expectation
+
+    def test_shared_choices_query_once(self, unit, assert_num_queries):
+        """Make sure forms sharing choices render and clean them with a single query."""
+        unit_model_choices = forms.UnitModelChoices(unit)
+        model = unit.models.first()
+        with assert_num_queries(1):
+            for prefix in range(5):
+                form = forms.ArmyModelForm(unit, {'{}-model'.format(prefix): model.pk},
+                    prefix=str(prefix), unit_model_choices=unit_model_choices)
+                str(form)
+                assert form.is_valid()
+                assert form.cleaned_data['model'] == model
+
+    def test_rendering_cached(self, unit, assert_num_queries):
+        """Make sure rendered choices are cached across requests."""
+        forms.UnitModelChoices(unit).choices
+        with assert_num_queries(0):
+            str(forms.ArmyModelForm(unit))
+
+    def test_rendering_invalidated(self, unit, unit_model_factory):
+        """Make sure adding a model to the unit invalidates the cached choices."""
+        forms.UnitModelChoices(unit).choices
+        unit_model = unit_model_factory(unit=unit)
+        assert (unit_model.pk, str(unit_model)) in forms.UnitModelChoices(unit).choices
+
+    def test_foreign_model_invalid(self, unit):
+        """Make sure models of other units are rejected."""
+        form = forms.ArmyModelForm(unit, {'model': factories.UnitModelFactory().pk})
+        assert not form.is_valid()
+        assert 'model' in form.errors
@@ -0,0 +1,139 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+import factories
+from armyimp.apps.w40k import importers, models
+
+
+def dump(*objects):
+    """Return JSON-Lines for the given ``(label, fields)`` tuples."""
+    return [json.dumps({'model': label, 'fields': fields}) + '\n' for label, fields in objects]
+
+
+@pytest.fixture
+def codex_lines():
+    """Return JSON-Lines for a small but complete codex ordered by dependency."""
+    return dump(
+        ('w40k.organization', {'name': 'Orks'}),
+        ('w40k.item', {'name': 'Shoota', 'comment': ''}),
+        ('w40k.item', {'name': 'Choppa', 'comment': ''}),
+        ('w40k.item', {'name': 'Big Shoota', 'comment': ''}),
+        ('w40k.organizationitemintermediate',
+            {'organization': ['Orks'], 'item': ['Shoota'], 'price': 0}),
+        ('w40k.organizationitemintermediate',
+            {'organization': ['Orks'], 'item': ['Big Shoota'], 'price': 5}),
+        ('w40k.weaponprofile', {
+            'name': 'Shoota', 'weapon': ['Shoota'], 'category': 'Ranged', 'range_min': 0,
+            'range_max': 18, 'attack_type': 'Assault', 'number_of_attacks_min': 2,
+            'number_of_attacks_max': 2, 'strength_min': 4, 'strength_max': 4,
+            'armor_penetration': 0, 'damage_min': 1, 'damage_max': 1, 'comments': '',
+        }),
+        ('w40k.wargearlist',
+            {'name': 'Heavy', 'organization': ['Orks'], 'items': [['Big Shoota']]}),
+        ('w40k.modelprofile', {
+            'name': 'Ork Boy', 'movement': 5, 'weapon_skill': 3, 'balistic_skill': 5,
+            'strength': 4, 'toughness': 4, 'wounds': 1, 'attacks': 2, 'leadership': 6,
+            'saves': 6,
+        }),
+        ('w40k.unitkeyword', {'name': 'Infantry'}),
+        ('w40k.unit', {
+            'name': 'Boyz', 'organization': ['Orks'], 'category': 'Troops',
+            'is_named_character': False, 'power_rating': 4, 'model_price': 6,
+            'models_min': 10, 'models_max': 30, 'keywords': [['Infantry']],
+        }),
+        ('w40k.unitmodel', {
+            'unit': ['Boyz'], 'profile': ['Ork Boy'], 'name_suffix': '', 'min_amount': 10,
+            'max_amount': 30, 'item_slots': [{
+                'default': ['Shoota'], 'options': [['Choppa']],
+                'option_from_list': [['Heavy', 'Orks']], 'min_amount': 1, 'max_amount': 1,
+            }],
+        }),
+    )
+
+
+@pytest.mark.django_db
+class TestCodexImporter():
+    """Unit tests for ``CodexImporter``."""
+
+    def test_import(self, codex_lines):
+        """Make sure all objects and relations get imported."""
+        counts = importers.CodexImporter().import_lines(codex_lines)
+        assert counts['w40k.item'] == [3, 0]
+        unit = models.Unit.objects.get(name='Boyz')
+        assert list(unit.keywords.values_list('name', flat=True)) == ['Infantry']
+        slot = unit.models.get().item_slots.get()
+        assert slot.default.name == 'Shoota'
+        assert list(slot.options.values_list('name', flat=True)) == ['Choppa']
+        assert slot.option_from_list.get().items.get().name == 'Big Shoota'
+        assert set(slot.effective_options.values_list('item__name', flat=True)) == {
+            'Shoota', 'Choppa', 'Big Shoota'}
+        price = models.OrganizationItemIntermediate.objects.get(item__name='Big Shoota')
+        assert price.price == 5
+
+    def test_existing_objects_skipped(self, codex_lines):
+        """Make sure importing the same data twice does not duplicate anything."""
+        importers.CodexImporter().import_lines(codex_lines)
+        counts = importers.CodexImporter().import_lines(codex_lines)
+        assert counts['w40k.unitmodel'] == [0, 1]
+        assert models.ItemSlot.objects.count() == 1
+
+    def test_new_prices_update_summaries(self, army_model_item_slot):
+        """Make sure armies carrying items that get a price are summarized accordingly."""
+        army_model = army_model_item_slot.army_model
+        army_unit = army_model.unit
+        points, army_points = army_unit.summary.points, army_unit.army.summary.points
+        other_slot = factories.ArmyModelItemSlotFactory(item=army_model_item_slot.item)
+        other_points = other_slot.army_model.unit.army.summary.points
+        importers.CodexImporter().import_lines(dump(('w40k.organizationitemintermediate', {
+            'organization': [army_unit.unit.organization.name],
+            'item': [army_model_item_slot.item.name], 'price': 5})))
+        assert models.ArmyUnitSummary.objects.get(army_unit=army_unit).points == (
+            points + 5 * army_model_item_slot.amount)
+        assert models.ArmySummary.objects.get(army=army_unit.army).points == (
+            army_points + 5 * army_model_item_slot.amount)
+        # The price is for another organization.
+        assert models.ArmySummary.objects.get(
+            army=other_slot.army_model.unit.army).points == other_points
+
+    def test_constant_queries_per_batch(self, assert_num_queries):
+        """Make sure the amount of queries does not depend on the amount of objects."""
+        lines = dump(*(('w40k.item', {'name': str(each)}) for each in range(50)))
+        # Resolve existing, insert and resolve new primary keys, plus the savepoint.
+        with assert_num_queries(5):
+            importers.CodexImporter(batch_size=50).import_lines(lines)
+        assert models.Item.objects.count() == 50
+
+    def test_unknown_natural_key(self):
+        """Make sure referring to unknown objects raises an error and imports nothing."""
+        lines = dump(('w40k.item', {'name': 'Shoota'}),
+            ('w40k.weaponprofile', {'name': 'Shoota', 'weapon': ['Unknown']}))
+        with pytest.raises(importers.CodexImportError) as excinfo:
+            importers.CodexImporter().import_lines(lines)
+        assert 'Line 2' in str(excinfo.value)
+        assert not models.Item.objects.exists()
+
+    def test_invalid_json(self):
+        """Make sure invalid lines raise an error."""
+        with pytest.raises(importers.CodexImportError):
+            importers.CodexImporter().import_lines(['{"model": '])
+
+
+@pytest.mark.django_db
+class TestImportCodexCommand():
+    """Unit tests for the ``import_codex`` management command."""
+
+    def test_import(self, codex_lines, tmpdir):
+        """Make sure the given file gets imported."""
+        path = tmpdir.join('codex.jsonl')
+        path.write(''.join(codex_lines))
+        call_command('import_codex', str(path), batch_size=2)
+        assert models.UnitModel.objects.filter(unit__name='Boyz').exists()
+
+    def test_error(self, tmpdir):
+        """Make sure import errors are reported as command errors."""
+        path = tmpdir.join('codex.jsonl')
+        path.write('{"model": "w40k.army", "fields": {}}\n')
+        with pytest.raises(CommandError):
+            call_command('import_codex', str(path))
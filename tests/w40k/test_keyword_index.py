@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from armyimp.apps.w40k import importers, keyword_index, models
+
+
+@pytest.fixture
+def keyword_units(unit_factory, unit_keyword_factory, faction_keyword_factory, organization):
+    """Three units tagged with different unit and faction keywords."""
+    infantry = unit_keyword_factory(name='Infantry')
+    character = unit_keyword_factory(name='Character')
+    imperium = faction_keyword_factory(name='Imperium')
+    astartes = faction_keyword_factory(name='Adeptus  Astartes')
+    units = unit_factory.create_batch(3, organization=organization)
+    units[0].keywords.add(infantry)
+    units[0].faction_keywords.add(imperium, astartes)
+    units[1].keywords.add(infantry, character)
+    units[1].faction_keywords.add(imperium)
+    units[2].keywords.add(character)
+    return units
+
+
+class TestCompileExpression():
+    """Unit tests for ``tokenize`` and ``compile_expression``."""
+
+    def test_tokenize(self):
+        """Make sure operators are recognized and names may span several words."""
+        assert keyword_index.tokenize('Adeptus Astartes and not (a | b), c') == [
+            ('name', 'adeptus astartes'), '&', '!', '(', ('name', 'a'), '|', ('name', 'b'),
+            ')', '&', ('name', 'c')]
+
+    @pytest.mark.parametrize(('expression', 'expected'), (
+        ('a', [0b011, 0b111]),
+        ('a and not c', [0b011]),
+        ('!a | c', [0b000, 0b100, 0b111]),
+        ('not (a and b)', [0b000, 0b100]),
+        ('c or a and b', [0b011, 0b100, 0b111]),
+        ('a and unknown', []),
+        ('not unknown', [0b000, 0b011, 0b100, 0b111]),
+    ))
+    def test_evaluation(self, expression, expected):
+        """Make sure expressions are evaluated with the usual precedence."""
+        predicate = keyword_index.compile_expression(expression, {'a': 1, 'b': 2, 'c': 4})
+        masks = [0b000, 0b011, 0b100, 0b111]
+        assert [mask for mask in masks if predicate(mask)] == expected
+
+    @pytest.mark.parametrize('expression', ('', 'a and', '(a', 'a)', 'not', '| a'))
+    def test_malformed(self, expression):
+        """Make sure malformed expressions are rejected."""
+        with pytest.raises(ValueError):
+            keyword_index.compile_expression(expression, {'a': 1})
+
+
+@pytest.mark.django_db
+class TestKeywordIndex():
+    """Unit tests for ``KeywordIndex``."""
+
+    def test_filter(self, keyword_units):
+        """Make sure unit and faction keywords are combined."""
+        pks = [unit.pk for unit in keyword_units]
+        assert keyword_index.filter_units('infantry and imperium and not character') == pks[:1]
+        assert keyword_index.filter_units('character') == pks[1:]
+        assert keyword_index.filter_units('ADEPTUS ASTARTES or not infantry') == [pks[0],
+            pks[2]]
+
+    def test_cached(self, keyword_units, assert_num_queries):
+        """Make sure the index is only built once."""
+        keyword_index.filter_units('infantry')
+        with assert_num_queries(0):
+            keyword_index.filter_units('character')
+
+    def test_m2m_changed(self, keyword_units, unit_keyword_factory):
+        """Make sure changing keywords of units refreshes the index."""
+        index = keyword_index.get_index()
+        keyword_units[0].keywords.clear()
+        assert keyword_index.get_index() is not index
+        assert keyword_index.filter_units('infantry') == [keyword_units[1].pk]
+        keyword_units[2].keywords.add(unit_keyword_factory(name='Vehicle'))
+        assert keyword_index.filter_units('vehicle') == [keyword_units[2].pk]
+
+    def test_new_unit(self, keyword_units, unit_factory):
+        """Make sure new units are included."""
+        keyword_index.get_index()
+        unit = unit_factory()
+        assert unit.pk in keyword_index.filter_units('not infantry')
+
+    def test_import(self, keyword_units):
+        """Make sure units imported in bulk are included."""
+        keyword_index.get_index()
+        lines = [json.dumps(line) + '\n' for line in (
+            {'model': 'w40k.organization', 'fields': {'name': 'Orks'}},
+            {'model': 'w40k.unitkeyword', 'fields': {'name': 'Mob'}},
+            {'model': 'w40k.unit', 'fields': {
+                'name': 'Boyz', 'organization': ['Orks'], 'category': 'Troops',
+                'is_named_character': False, 'power_rating': 4, 'model_price': 6,
+                'models_min': 10, 'models_max': 30, 'keywords': [['Infantry'], ['Mob']]}},
+        )]
+        importers.CodexImporter().import_lines(lines)
+        boyz = models.Unit.objects.get(name='Boyz')
+        assert keyword_index.filter_units('mob') == [boyz.pk]
+        assert boyz.pk in keyword_index.filter_units('infantry')
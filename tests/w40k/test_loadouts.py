@@ -0,0 +1,87 @@
+import pytest
+
+from armyimp.apps.w40k import loadouts
+
+
+@pytest.fixture
+def add_slot(unit_model):
+    """Return a function adding an item slot to ``unit_model``."""
+    def _add_slot(default=None, options=(), wargear_lists=(), min_amount=1, max_amount=1):
+        slot = unit_model.item_slots.create(default=default, min_amount=min_amount,
+            max_amount=max_amount)
+        slot.options.add(*options)
+        slot.option_from_list.add(*wargear_lists)
+        return slot
+    return _add_slot
+
+
+@pytest.mark.django_db
+class TestLoadoutEnumerator():
+    """Unit tests for ``LoadoutEnumerator``."""
+
+    def test_no_slots(self, unit_model):
+        """Make sure a model without slots has a single, empty loadout."""
+        assert list(loadouts.get_loadouts(unit_model.pk)) == [()]
+
+    def test_single_slot(self, unit_model, add_slot, item_factory, wargear_list):
+        """Make sure a slot takes every multiset of its eligible items."""
+        default, option, listed = item_factory.create_batch(3)
+        wargear_list.items.add(listed)
+        add_slot(default, [option], [wargear_list], min_amount=1, max_amount=2)
+        enumerator = loadouts.get_loadouts(unit_model.pk)
+        result = list(enumerator)
+        assert len(enumerator) == len(result) == len(set(result)) == 3 + 6
+        assert ((default.pk, 1),) in result
+        assert ((option.pk, 1), (listed.pk, 1)) in result
+        assert ((listed.pk, 2),) in result
+
+    def test_overlapping_slots_deduplicated(self, unit_model, add_slot, item_factory):
+        """Make sure slots sharing items do not yield the same loadout twice."""
+        first, second, other = item_factory.create_batch(3)
+        add_slot(first, [second])
+        add_slot(second, [first])
+        add_slot(other, min_amount=0)
+        enumerator = loadouts.get_loadouts(unit_model.pk)
+        result = list(enumerator)
+        assert len(result) == len(set(result)) == len(enumerator) == 3 * 2
+        assert ((first.pk, 2),) in result
+
+    def test_merged_component_enumerated_once(self, unit_model, add_slot, item_factory,
+            monkeypatch):
+        """Make sure slots sharing items are enumerated once, not once per other loadout."""
+        first, second, other = item_factory.create_batch(3)
+        add_slot(other, min_amount=0, max_amount=3)
+        add_slot(first, [second])
+        add_slot(second, [first])
+        merges = []
+        merge = loadouts._merge
+        monkeypatch.setattr(loadouts, '_merge', lambda parts: merges.append(parts) or merge(parts))
+        # Not ``list``, which would count (and thereby cache) loadouts first.
+        assert sum(1 for loadout in loadouts.get_loadouts(unit_model.pk)) == 4 * 3
+        assert len(merges) == 2 * 2
+
+    def test_index_matches_iteration(self, unit_model, add_slot, item_factory):
+        """Make sure indexing and slicing agree with iterating."""
+        items = item_factory.create_batch(5)
+        add_slot(items[0], items[1:3], min_amount=0, max_amount=3)
+        add_slot(items[3], [items[0]])
+        add_slot(items[4], min_amount=1, max_amount=2)
+        enumerator = loadouts.get_loadouts(unit_model.pk)
+        result = list(enumerator)
+        assert [enumerator[index] for index in range(len(enumerator))] == result
+        assert enumerator[5:9] == result[5:9]
+        assert enumerator[-1] == result[-1]
+        with pytest.raises(IndexError):
+            enumerator[len(result)]
+
+    def test_count_without_enumeration(self, unit_model, add_slot, item_factory,
+            wargear_list_factory):
+        """Make sure huge amounts of loadouts are counted and indexed right away."""
+        for each in range(8):
+            wargear_list = wargear_list_factory(name='List {}'.format(each))
+            wargear_list.items.add(*item_factory.create_batch(9))
+            add_slot(wargear_lists=[wargear_list], min_amount=0, max_amount=2)
+        enumerator = loadouts.get_loadouts(unit_model.pk)
+        # No item, one of nine or two out of nine with repetition per slot.
+        assert len(enumerator) == (1 + 9 + 45) ** 8
+        assert len(enumerator[-1]) == 8
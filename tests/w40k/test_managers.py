@@ -22,6 +22,32 @@ class TestItemManager():
         key = (item.name,)
         assert models.Item.objects.get_by_natural_key(*key) == item
 
+    def test_get_many_by_natural_keys(self, item_factory):
+        """Test that keys are returned as passed and unknown keys are omitted."""
+        items = item_factory.create_batch(3)
+        keys = [items[0].name, (items[1].name,), 'unknown']
+        assert models.Item.objects.get_many_by_natural_keys(keys) == {
+            items[0].name: items[0], (items[1].name,): items[1]}
+
+    def test_get_many_by_natural_keys_chunked(self, item_factory, monkeypatch,
+            assert_num_queries):
+        """Test that keys are resolved in chunks."""
+        items = item_factory.create_batch(5)
+        monkeypatch.setattr(models.Item.objects, 'natural_key_chunk_size', 2)
+        with assert_num_queries(3):
+            result = models.Item.objects.get_many_by_natural_keys(
+                [each.name for each in items])
+        assert set(result.values()) == set(items)
+
+    def test_get_many_by_natural_keys_memo(self, item, assert_num_queries):
+        """Test that memorized keys, including unknown ones, are not resolved again."""
+        memo = {}
+        models.Item.objects.get_many_by_natural_keys([item.name, 'unknown'], memo=memo)
+        with assert_num_queries(0):
+            result = models.Item.objects.get_many_by_natural_keys(
+                [item.name, 'unknown'], memo=memo)
+        assert result == {item.name: item}
+
 
 @pytest.mark.django_db
 class TestOrganizationIntermediateManager():
@@ -33,6 +59,18 @@ class TestOrganizationIntermediateManager():
         assert models.OrganizationItemIntermediate.objects.get_by_natural_key(*key) == (
             organization_item_intermediate)
 
+    def test_get_many_by_natural_keys(self, organization_item_intermediate,
+            organization_item_intermediate_factory):
+        """Test that only requested combinations of composite keys are returned."""
+        other = organization_item_intermediate_factory()
+        key = (organization_item_intermediate.organization, organization_item_intermediate.item)
+        crossed_key = (organization_item_intermediate.organization.pk, other.item.pk)
+        result = models.OrganizationItemIntermediate.objects.get_many_by_natural_keys(
+            [key, crossed_key, (other.organization.pk, other.item.pk)])
+        assert result[key] == organization_item_intermediate
+        assert crossed_key not in result
+        assert len(result) == 2
+
 
 @pytest.mark.django_db
 class TestOrganizationManager():
@@ -44,6 +82,22 @@ class TestOrganizationManager():
         assert models.Organization.objects.get_by_natural_key(*key) == organization
 
 
+@pytest.mark.django_db
+class TestWargearListManager():
+    """Unit tests for ``WargearListManager``."""
+
+    def test_get_by_natural_key(self, wargear_list):
+        """Test that the returned instance is the correct one."""
+        key = (wargear_list.name, wargear_list.organization)
+        assert models.WargearList.objects.get_by_natural_key(*key) == wargear_list
+
+    def test_get_many_by_natural_keys(self, wargear_list):
+        """Test that composite keys are resolved."""
+        key = (wargear_list.name, wargear_list.organization)
+        assert models.WargearList.objects.get_many_by_natural_keys([key]) == {
+            key: wargear_list}
+
+
 @pytest.mark.django_db
 class TestModelProfileManager():
     """Unit tests for ``ModelProfile``."""
@@ -63,6 +117,23 @@ class TestUnitManager():
         key = (unit.name,)
         assert models.Unit.objects.get_by_natural_key(*key) == unit
 
+    def test_with_datasheet(self, unit, item, weapon_profile_factory, assert_num_queries):
+        """Make sure related datasheet data is available without further queries."""
+        weapon_profile_factory(weapon=item)
+        unit.models.first().item_slots.create(default=item)
+        unit = models.Unit.objects.with_datasheet().get(pk=unit.pk)
+        with assert_num_queries(0):
+            for unit_model in unit.models.all():
+                str(unit_model.profile)
+                for slot in unit_model.item_slots.all():
+                    str(slot.default)
+                    for option in slot.effective_options.all():
+                        list(option.item.weapon_profiles.all())
+            list(unit.abilities.all())
+            list(unit.keywords.all())
+            list(unit.faction_keywords.all())
+            str(unit.organization)
+
 
 @pytest.mark.django_db
 class TestUnitAbilityManager():
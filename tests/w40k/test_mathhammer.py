@@ -0,0 +1,82 @@
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+import factories
+from armyimp.apps.w40k import mathhammer
+
+
+def reference(weapon, target, skill):
+    """Return the expected damage of a single pair, computed step by step."""
+    def chance(needed):
+        return Fraction(7 - min(max(needed, 2), 7), 6)
+
+    strengths = range(weapon.strength_min, weapon.strength_max + 1)
+    wound_chances = []
+    for strength in strengths:
+        if strength >= 2 * target.toughness:
+            needed = 2
+        elif strength > target.toughness:
+            needed = 3
+        elif strength == target.toughness:
+            needed = 4
+        elif 2 * strength <= target.toughness:
+            needed = 6
+        else:
+            needed = 5
+        wound_chances.append(chance(needed))
+    attacks = Fraction(weapon.number_of_attacks_min + weapon.number_of_attacks_max, 2)
+    unsaved = 1 - chance(target.saves + abs(weapon.armor_penetration or 0))
+    wounds = attacks * chance(skill) * sum(wound_chances) / len(wound_chances) * unsaved
+    damages = [min(damage, target.wounds)
+        for damage in range(weapon.damage_min, weapon.damage_max + 1)]
+    return float(wounds * sum(damages) / len(damages))
+
+
+@pytest.mark.django_db
+class TestExpectedDamage():
+    """Unit tests for ``expected_damage``."""
+
+    def test_single_pair(self, weapon_profile_factory, model_profile_factory):
+        """Make sure a boltgun against a space marine does what the rules say."""
+        weapon = weapon_profile_factory(number_of_attacks_min=1, number_of_attacks_max=1,
+            strength_min=4, strength_max=4, armor_penetration=0, damage_min=1, damage_max=1)
+        target = model_profile_factory(toughness=4, saves=3, wounds=1)
+        matrix = mathhammer.expected_damage([weapon], [target], skill=3)
+        # Hit on 3+, wound on 4+, failed save on 1 or 2.
+        assert matrix.kills[0, 0] == pytest.approx(2 / 3 * 1 / 2 * 1 / 3)
+
+    def test_matrix_matches_reference(self, weapon_profile_factory, model_profile_factory):
+        """Make sure every cell of the matrix matches the step by step computation."""
+        weapons = [
+            weapon_profile_factory(strength_min=3, strength_max=8, armor_penetration=-2,
+                damage_min=1, damage_max=6),
+            weapon_profile_factory(strength_min=10, strength_max=10, armor_penetration=None,
+                damage_min=2, damage_max=2),
+            weapon_profile_factory(),
+        ]
+        targets = [model_profile_factory(toughness=toughness, saves=saves, wounds=wounds)
+            for toughness, saves, wounds in ((3, 5, 1), (4, 3, 2), (8, 2, 12))]
+        matrix = mathhammer.expected_damage(weapons, targets, skill=4)
+        expectation = [[reference(weapon, target, 4) for target in targets]
+            for weapon in weapons]
+        assert np.allclose(matrix.damage, expectation)
+
+    def test_attacker(self, weapon_profile_factory, model_profile_factory):
+        """Make sure attackers hit with balistic skill or weapon skill, by weapon category."""
+        ranged = weapon_profile_factory(category='Ranged')
+        melee = weapon_profile_factory(category='Melee')
+        attacker = model_profile_factory(balistic_skill=2, weapon_skill=6)
+        matrix = mathhammer.expected_damage([ranged, melee], [factories.ModelProfileFactory()],
+            attacker=attacker)
+        attacks = [(each.number_of_attacks_min + each.number_of_attacks_max) / 2
+            for each in (ranged, melee)]
+        assert matrix.hits.tolist() == pytest.approx([attacks[0] * 5 / 6, attacks[1] / 6])
+
+    def test_no_skill(self, weapon_profile_factory, model_profile_factory):
+        """Make sure attackers without balistic skill can not hit with ranged weapons."""
+        attacker = model_profile_factory(balistic_skill=None)
+        matrix = mathhammer.expected_damage([weapon_profile_factory(category='Ranged')],
+            [attacker], attacker=attacker)
+        assert matrix.hits.tolist() == [0]
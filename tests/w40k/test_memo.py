@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from armyimp.apps.w40k import mathhammer, memo, models
+
+
+@pytest.fixture
+def profiles(weapon_profile_factory, model_profile_factory):
+    """Return two weapon profiles and two model profiles."""
+    weapons = [weapon_profile_factory(armor_penetration=-1),
+        weapon_profile_factory(category='Melee', strength_min=6, strength_max=6)]
+    targets = [model_profile_factory(toughness=4, saves=3, wounds=1),
+        model_profile_factory(toughness=5, saves=4, wounds=3)]
+    return weapons, targets
+
+
+@pytest.mark.django_db
+class TestExpectedDamage():
+    """Unit tests for ``memo.expected_damage``."""
+
+    def test_matches_mathhammer(self, profiles):
+        """Make sure stored results are just what ``mathhammer`` computes."""
+        matrix = memo.expected_damage(*profiles, skill=3)
+        expectation = mathhammer.expected_damage(*profiles, skill=3)
+        for name in ('hits', 'wounds', 'damage', 'kills'):
+            assert np.allclose(getattr(matrix, name), getattr(expectation, name))
+        assert models.ExpectedDamage.objects.count() == 4
+
+    def test_stored(self, profiles, assert_num_queries):
+        """Make sure stored results are read with a single query."""
+        memo.expected_damage(*profiles)
+        with assert_num_queries(1):
+            memo.expected_damage(*profiles)
+
+    def test_attacker(self, profiles, model_profile_factory):
+        """Make sure each weapon uses the attackers matching skill."""
+        attacker = model_profile_factory(weapon_skill=2, balistic_skill=None)
+        matrix = memo.expected_damage(*profiles, attacker=attacker)
+        assert matrix.hits[0] == 0
+        skills = set(models.ExpectedDamage.objects.values_list('skill', flat=True))
+        assert skills == {memo.NEVER, 2}
+
+    def test_equal_stats_shared(self, profiles, model_profile_factory):
+        """Make sure profiles with equal stats share their results."""
+        weapons, targets = profiles
+        memo.expected_damage(weapons, targets)
+        twin = model_profile_factory(toughness=4, saves=3, wounds=1)
+        memo.expected_damage(weapons, [twin])
+        assert models.ExpectedDamage.objects.count() == 4
+
+    def test_changed_stats(self, profiles):
+        """Make sure changing a profiles stats deletes its results and yields new ones."""
+        weapons, targets = profiles
+        before = memo.expected_damage(weapons, targets).damage
+        targets[0].saves = 6
+        targets[0].save()
+        assert models.ExpectedDamage.objects.count() == 2
+        after = memo.expected_damage(weapons, targets).damage
+        assert np.all(after[:, 0] > before[:, 0])
+        assert np.allclose(after[:, 1], before[:, 1])
+
+    def test_changed_shared_stats(self, profiles, model_profile_factory):
+        """Make sure results are kept as long as another profile has the old stats."""
+        weapons, targets = profiles
+        memo.expected_damage(weapons, targets)
+        model_profile_factory(toughness=4, saves=3, wounds=1)
+        targets[0].saves = 6
+        targets[0].save()
+        assert models.ExpectedDamage.objects.count() == 4
+        targets[1].delete()
+        assert models.ExpectedDamage.objects.count() == 2
+
+    def test_concurrently_stored(self, profiles, monkeypatch):
+        """Make sure results stored by another process in the meantime do not discard others."""
+        weapons, targets = profiles
+        memo.expected_damage(weapons[:1], targets[:1])
+        # Pretend the other process stored its result after we looked it up.
+        monkeypatch.setattr(memo, 'lookup', lambda keys: {})
+        memo.expected_damage(weapons, targets)
+        assert models.ExpectedDamage.objects.count() == 4
+
+    def test_unchanged_stats(self, profiles):
+        """Make sure saving a profile without changing its stats keeps its results."""
+        memo.expected_damage(*profiles)
+        weapon = profiles[0][0]
+        weapon.comments = 'Changed'
+        weapon.save()
+        assert models.ExpectedDamage.objects.count() == 4
+
+    def test_deleted_profile(self, profiles):
+        """Make sure deleting a profile deletes its results."""
+        memo.expected_damage(*profiles)
+        profiles[0][1].delete()
+        assert models.ExpectedDamage.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestPrefillExpectedDamageCommand():
+    """Unit tests for the ``prefill_expected_damage`` management command."""
+
+    def test_prefill(self, profiles, assert_num_queries):
+        """Make sure all results get stored, so looking them up needs no computation."""
+        call_command('prefill_expected_damage', skill=[3, 4], chunk_size=1)
+        assert models.ExpectedDamage.objects.count() == 2 * 2 * 2
+        with assert_num_queries(1):
+            memo.expected_damage(*profiles, skill=3)
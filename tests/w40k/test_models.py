@@ -36,6 +36,31 @@ class TestItem():
         """Test that the returned natural key is the instances name."""
         assert item.natural_key() == (item.name,)
 
+    def test_price_not_linked(self, item):
+        """Test that an item without any organization raises an error."""
+        with pytest.raises(ValueError):
+            item.price
+
+    def test_price_unique(self, item, organization_item_intermediate_factory):
+        """Test that identical prices among organizations are returned as plain value."""
+        organization_item_intermediate_factory.create_batch(2, item=item, price=5)
+        assert item.price == 5
+
+    def test_price_differs(self, item, organization_item_intermediate_factory):
+        """Test that differing prices are returned per organization."""
+        first = organization_item_intermediate_factory(item=item, price=5)
+        second = organization_item_intermediate_factory(item=item, price=10)
+        assert item.price == {
+            first.organization.pk: (first.organization.name, 5),
+            second.organization.pk: (second.organization.name, 10),
+        }
+
+    def test_per_organization_details(self, organization_item_intermediate):
+        """Test that prices are returned per organization."""
+        item = organization_item_intermediate.item
+        assert item.per_organization_details == {
+            organization_item_intermediate.organization.pk: organization_item_intermediate.price}
+
 
 @pytest.mark.django_db
 class TestOrganizationItemIntermediate():
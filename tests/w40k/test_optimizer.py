@@ -0,0 +1,116 @@
+from itertools import product
+
+import pytest
+
+import factories
+from armyimp.apps.w40k import optimizer
+
+
+@pytest.fixture
+def make_unit(organization, unit_factory):
+    """Return a function creating a unit of ``organization`` with a single unit model."""
+    def _make_unit(model_price, category='Troops', models_min=1, models_max=1, **kwargs):
+        kwargs.setdefault('power_rating', 1)
+        unit = unit_factory(organization=organization, model_price=model_price,
+            category=category, models_min=models_min, models_max=models_max, **kwargs)
+        unit.models.all().delete()
+        factories.UnitModelFactory(unit=unit, min_amount=models_min, max_amount=models_max)
+        return unit
+    return _make_unit
+
+
+@pytest.mark.django_db
+class TestUnitOptions():
+    """Unit tests for ``get_unit_options``."""
+
+    def test_cheapest_loadout(self, rules_unit, organization_item_intermediate_factory):
+        """Make sure every legal amount of models is priced with the cheapest items."""
+        items = rules_unit.test_items
+        for name, price in (('default', 7), ('option', 3), ('listed', 5)):
+            organization_item_intermediate_factory(organization=rules_unit.organization,
+                item=items[name], price=price)
+        record = optimizer.codex.get_snapshot().get_unit(rules_unit.pk)
+        options = optimizer.get_unit_options(record)
+        assert [option.points for option in options] == [
+            amount * (rules_unit.model_price + 3) for amount in (2, 3)]
+        unit_model, amount, loadout = options[1].models[0]
+        assert amount == 3
+        assert loadout == ((items['option'].pk, 1),)
+
+
+@pytest.mark.django_db
+class TestOptimize():
+    """Unit tests for ``optimize``."""
+
+    def test_matches_brute_force(self, organization, make_unit):
+        """Make sure the best plan is found, taking each unit up to three times."""
+        units = [make_unit(price) for price in (35, 50, 65)]
+        units.append(make_unit(20, models_min=2, models_max=4))
+        plan = optimizer.optimize(organization.pk, 170)
+        best = 0
+        for copies in product(range(4), repeat=3):
+            fixed = sum(amount * unit.model_price for amount, unit in zip(copies, units))
+            # The last unit may be taken up to three times with two to four models each.
+            for sizes in product((0, 2, 3, 4), repeat=3):
+                total = fixed + 20 * sum(sizes)
+                if total <= 170:
+                    best = max(best, total)
+        assert plan.points == plan.score == best == 170
+
+    def test_required_categories(self, organization, make_unit):
+        """Make sure required categories are included, even if it costs points."""
+        hq = make_unit(100, category='HQ')
+        make_unit(10)
+        plan = optimizer.optimize(organization.pk, 125, required={'HQ': 1})
+        assert [option.unit.pk for option in plan.options].count(hq.pk) == 1
+        assert plan.points == 120
+        assert optimizer.optimize(organization.pk, 99, required={'HQ': 1}) is None
+
+    def test_several_required_categories(self, organization, make_unit):
+        """Make sure requirements of several categories are met at once."""
+        hq = make_unit(40, category='HQ')
+        elites = make_unit(30, category='Elites', max_per_army=1)
+        make_unit(10)
+        plan = optimizer.optimize(organization.pk, 140, required={'HQ': 2, 'Elites': 1})
+        pks = [option.unit.pk for option in plan.options]
+        assert (pks.count(hq.pk), pks.count(elites.pk)) == (2, 1)
+        assert plan.points == 140
+        assert optimizer.optimize(organization.pk, 140, required={'HQ': 3, 'Elites': 1}) is None
+
+    @pytest.mark.parametrize('budget, required', (
+        (100, {'HQ': optimizer.MAX_REQUIRED_AMOUNT + 1}),
+        (optimizer.MAX_CELL_COUNT, {'HQ': 1}),
+    ))
+    def test_limits(self, organization, budget, required):
+        """Make sure requests exceeding the supported size are rejected."""
+        with pytest.raises(ValueError):
+            optimizer.optimize(organization.pk, budget, required=required)
+
+    def test_max_per_army(self, organization, make_unit):
+        """Make sure units are not taken more often than allowed."""
+        unit = make_unit(10, max_per_army=1)
+        assert optimizer.optimize(organization.pk, 100).points == 10
+        assert optimizer.optimize(organization.pk, 100, taken={unit.pk: 1}).points == 0
+
+    def test_objective(self, organization, make_unit):
+        """Make sure the objective decides between plans of equal points."""
+        make_unit(50, power_rating=5)
+        make_unit(25, power_rating=1)
+        plan = optimizer.optimize(organization.pk, 50,
+            objective=optimizer.power_rating_objective)
+        assert plan.score == 5
+        assert plan.points == 50
+
+    def test_expected_damage_objective(self, rules_unit, weapon_profile_factory,
+            organization_item_intermediate_factory, model_profile):
+        """Make sure units are scored by the expected damage of their weapons."""
+        items = rules_unit.test_items
+        for name, price in (('default', 5), ('listed', 5)):
+            organization_item_intermediate_factory(organization=rules_unit.organization,
+                item=items[name], price=price)
+        weapon_profile_factory(weapon=items['option'], category='Melee')
+        objective = optimizer.ExpectedDamageObjective([model_profile])
+        record = optimizer.codex.get_snapshot().get_unit(rules_unit.pk)
+        scores = [objective(option) for option in optimizer.get_unit_options(record)]
+        assert scores[0] > 0
+        assert scores[1] == pytest.approx(scores[0] * 3 / 2)
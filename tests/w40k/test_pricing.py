@@ -0,0 +1,45 @@
+import pytest
+from django.core.cache.backends.dummy import DummyCache
+
+import factories
+from armyimp.apps.w40k import pricing
+
+
+@pytest.mark.django_db
+class TestPriceMatrix():
+    """Unit tests for the process wide price matrix."""
+
+    def test_get(self, organization):
+        """Make sure only prices of the given organization are returned."""
+        items = factories.ItemFactory.create_batch(2)
+        factories.OrganizationItemIntermediateFactory(
+            organization=organization, item=items[0], price=1)
+        factories.OrganizationItemIntermediateFactory(item=items[1], price=100)
+        matrix = pricing.get_price_matrix()
+        assert [matrix.get(item, organization) for item in items] == [1, None]
+
+    def test_no_queries_once_built(self, organization_item_intermediate, assert_num_queries):
+        """Make sure pricing does not hit the database once the matrix has been built."""
+        pricing.get_price_matrix()
+        with assert_num_queries(0):
+            prices = organization_item_intermediate.item.per_organization_details
+        assert prices == {
+            organization_item_intermediate.organization.pk: organization_item_intermediate.price}
+
+    @pytest.mark.parametrize('action', ('save', 'delete'))
+    def test_invalidated_on_change(self, organization_item_intermediate, action):
+        """Make sure saving or deleting a price row creates a new matrix version."""
+        old_matrix = pricing.get_price_matrix()
+        organization_item_intermediate.price += 1
+        getattr(organization_item_intermediate, action)()
+        new_matrix = pricing.get_price_matrix()
+        assert new_matrix.version != old_matrix.version
+        expectation = organization_item_intermediate.price if action == 'save' else None
+        assert new_matrix.get(organization_item_intermediate.item,
+            organization_item_intermediate.organization) == expectation
+
+    def test_dummy_cache(self, organization_item_intermediate, monkeypatch):
+        """Make sure the matrix is rebuilt on each access if the cache does not keep anything."""
+        monkeypatch.setattr(pricing, 'cache', DummyCache('dummy', {}))
+        old_matrix = pricing.get_price_matrix()
+        assert pricing.get_price_matrix().version != old_matrix.version
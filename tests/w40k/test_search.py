@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from armyimp.apps.w40k import codex, models, search
+
+
+@pytest.fixture
+def searchable_unit(unit, unit_ability_factory, faction_keyword_factory, weapon_profile):
+    """A unit with an ability, a faction keyword and a weapon profile with comments."""
+    unit.name = 'Intercessor Squad'
+    unit.save()
+    unit.abilities.add(unit_ability_factory(name='And They Shall Know No Fear',
+        description='Re-roll failed Morale tests.'))
+    unit.faction_keywords.add(faction_keyword_factory(name='Adeptus Astartes'))
+    weapon_profile.name = 'Bolt rifle'
+    weapon_profile.comments = 'Rapid fire weapon.'
+    weapon_profile.save()
+    return unit
+
+
+class TestTokenize():
+    """Unit tests for ``tokenize`` and ``get_trigrams``."""
+
+    def test_tokenize(self):
+        """Make sure text is split into lower case words."""
+        assert search.tokenize("Re-roll failed Morale tests.") == ['re', 'roll', 'failed',
+            'morale', 'tests']
+        assert search.tokenize(None) == []
+
+    def test_trigrams(self):
+        """Make sure trigrams are padded."""
+        assert search.get_trigrams('ab') == {'  a', ' ab', 'ab '}
+
+
+@pytest.mark.django_db
+class TestSearchIndex():
+    """Unit tests for ``SearchIndex``."""
+
+    def test_exact(self, searchable_unit):
+        """Make sure names and texts are found, names first."""
+        results = search.search('morale')
+        assert [result.kind for result in results] == ['ability']
+        results = search.search('astartes')
+        assert [result.kind for result in results] == ['faction_keyword', 'unit']
+        assert results[1].pk == searchable_unit.pk
+
+    def test_all_tokens(self, searchable_unit):
+        """Make sure all query tokens need to match."""
+        assert [result.name for result in search.search('intercessor squad')] == [
+            'Intercessor Squad']
+        assert search.search('intercessor rifle') == []
+        assert search.search('  ') == []
+
+    def test_prefix(self, searchable_unit):
+        """Make sure query tokens match longer terms, below exact matches."""
+        results = search.search('inter', kinds=['unit'])
+        assert results[0].pk == searchable_unit.pk
+        assert results[0].score < search.search('intercessor', kinds=['unit'])[0].score
+
+    def test_trigram(self, searchable_unit):
+        """Make sure typos are forgiven."""
+        results = search.search('intercesor', kinds=['unit'])
+        assert [result.pk for result in results] == [searchable_unit.pk]
+
+    def test_kinds_and_limit(self, searchable_unit):
+        """Make sure results are filtered by kind and limited."""
+        assert {result.kind for result in search.search('rifle')} == {'weapon_profile'}
+        assert search.search('rifle', kinds=['item']) == []
+        assert len(search.search('astartes', limit=1)) == 1
+
+    def test_incremental(self, searchable_unit, unit_factory):
+        """Make sure catalog changes update the index, reusing unchanged postings."""
+        index = search.get_index()
+        assert search.get_index() is index
+        unit_factory(name='Tactical Squad', organization=searchable_unit.organization)
+        updated = search.get_index()
+        assert updated is not index
+        assert updated.postings['intercessor'] is index.postings['intercessor']
+        assert [result.name for result in search.search('tactical')] == ['Tactical Squad']
+        # The previous index stays unchanged.
+        assert 'tactical' not in index.postings
+
+    def test_removed(self, searchable_unit):
+        """Make sure deleted objects and their terms are dropped."""
+        search.get_index()
+        searchable_unit.delete()
+        index = search.get_index()
+        assert 'intercessor' not in index.postings
+        assert 'intercessor' not in index.terms
+        assert not any('intercessor' in terms for terms in index.trigrams.values())
+
+    def test_build_matches_update(self, searchable_unit, unit_factory):
+        """Make sure updating an index gives the same result as building it from scratch."""
+        search.get_index()
+        unit_factory(name='Scout Squad', organization=searchable_unit.organization)
+        searchable_unit.abilities.clear()
+        updated = search.get_index()
+        built = search.SearchIndex.build(codex.get_snapshot())
+        assert updated.postings == built.postings
+        assert updated.terms == built.terms
+        assert updated.trigrams == built.trigrams
+
+    def test_speed(self, organization, unit_factory):
+        """Make sure searching a codex sized index takes a few milliseconds only."""
+        models.Unit.objects.bulk_create(unit_factory.build(name='Unit {} Squad'.format(number),
+            organization=organization) for number in range(300))
+        search.get_index()
+        start = time.perf_counter()
+        for query in ('squad', 'uni', 'sqad 12', 'unit 299'):
+            search.search(query)
+        assert (time.perf_counter() - start) / 4 < 0.005
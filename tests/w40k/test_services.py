@@ -0,0 +1,95 @@
+import pytest
+
+import factories
+from armyimp.apps.w40k import services
+
+
+@pytest.fixture
+def priced_army(army, unit):
+    """An army with two units, some models and priced wargear."""
+    item = factories.ItemFactory()
+    factories.OrganizationItemIntermediateFactory(
+        organization=unit.organization, item=item, price=7)
+    # Same item, different organization. This price should never be used.
+    factories.OrganizationItemIntermediateFactory(item=item, price=1000)
+    army_units = factories.ArmyunitFactory.create_batch(2, army=army, unit=unit)
+    for army_unit in army_units:
+        army_models = factories.ArmyModelFactory.create_batch(
+            3, unit=army_unit, model=unit.models.first())
+        factories.ArmyModelItemSlotFactory(army_model=army_models[0], item=item, amount=2)
+    return army
+
+
+@pytest.mark.django_db
+class TestArmyPointsCalculator():
+    """Unit tests for ``ArmyPointsCalculator``."""
+
+    def test_get_model_points(self, priced_army, unit):
+        """Make sure model points are ``model_price`` times the amount of models."""
+        calculator = services.ArmyPointsCalculator([priced_army])
+        assert calculator.get_model_points() == {priced_army.pk: 6 * unit.model_price}
+
+    def test_get_wargear_points(self, priced_army):
+        """Make sure only the price of the units organization is used."""
+        calculator = services.ArmyPointsCalculator([priced_army])
+        assert calculator.get_wargear_points() == {priced_army.pk: 2 * 2 * 7}
+
+    def test_get_totals_includes_empty_armies(self, priced_army, unit):
+        """Make sure armies without any models are reported with zero points."""
+        empty_army = factories.ArmyFactory()
+        calculator = services.ArmyPointsCalculator([priced_army, empty_army])
+        assert calculator.get_totals() == {
+            priced_army.pk: 6 * unit.model_price + 28,
+            empty_army.pk: 0,
+        }
+
+    def test_constant_number_of_queries(self, priced_army, unit, assert_num_queries):
+        """Make sure the amount of queries does not depend on the amount of armies."""
+        armies = [priced_army] + factories.ArmyFactory.create_batch(5)
+        for army in armies[1:]:
+            army_unit = factories.ArmyunitFactory(army=army, unit=unit)
+            factories.ArmyModelFactory(unit=army_unit, model=unit.models.first())
+        with assert_num_queries(2):
+            services.ArmyPointsCalculator(armies).get_totals()
+
+
+@pytest.mark.django_db
+class TestArmyUnitPointsCalculator():
+    """Unit tests for ``ArmyUnitPointsCalculator``."""
+
+    def test_get_totals(self, priced_army, unit):
+        """Make sure totals are grouped by army unit."""
+        army_units = list(priced_army.units.all())
+        calculator = services.ArmyUnitPointsCalculator(army_units)
+        expectation = 3 * unit.model_price + 14
+        assert calculator.get_totals() == {each.pk: expectation for each in army_units}
+
+
+@pytest.mark.django_db
+class TestCreateArmyUnit():
+    """Unit tests for ``create_army_unit``."""
+
+    def test_create(self, army, rules_unit):
+        """Make sure the army unit, its models and items get created."""
+        unit_model = rules_unit.models.get()
+        option = rules_unit.test_items['option']
+        army_unit = services.create_army_unit(army, rules_unit, 'Squad', [
+            (unit_model.pk, [(option.pk, 2)]), (unit_model.pk, [])])
+        assert army_unit.name == 'Squad'
+        assert army_unit.models.count() == 2
+        assert army_unit.models.first().armymodelitemslot_set.get().amount == 2
+
+    def test_summaries_updated(self, army, rules_unit):
+        """Make sure summaries include the bulk inserted models and items."""
+        option = rules_unit.test_items['option']
+        factories.OrganizationItemIntermediateFactory(organization=rules_unit.organization,
+            item=option, price=5)
+        unit_model = rules_unit.models.get()
+        army_unit = services.create_army_unit(army, rules_unit,
+            army_models=[(unit_model.pk, [(option.pk, 2)])] * 2)
+        expectation = 2 * rules_unit.model_price + 2 * 2 * 5
+        army_unit.summary.refresh_from_db()
+        assert army_unit.summary.points == expectation
+        assert army_unit.summary.model_count == 2
+        army.summary.refresh_from_db()
+        assert army.summary.points == expectation
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import factories
+from armyimp.apps.w40k import dice, simulation
+
+
+class TestSimulateChunk():
+    """Unit tests for ``simulate_chunk``."""
+
+    def test_matches_exact_distribution(self):
+        """Make sure simulated damage converges to the exact distribution."""
+        groups = [simulation.WeaponGroup(1, 3, (1, 6), (4, 4), -1, (1, 3))]
+        defender = simulation.Defender((4,), (3,), (1000,))
+        damage, slain = simulation.simulate_chunk(groups, defender, 100000, [0, 0])
+        exact = dice.attack_distribution((1, 6), (4, 4), -1, (1, 3), 3, 4, 3, None).damage
+        assert damage.sum() == 100000
+        assert damage / 100000 == pytest.approx(exact[:len(damage)], abs=0.01)
+        assert list(slain) == [100000]
+
+    def test_allocation(self):
+        """Make sure damage beyond each models wounds is lost."""
+        groups = [simulation.WeaponGroup(5, 2, (2, 2), (8, 8), -3, (1, 6))]
+        defender = simulation.Defender((4, 4, 4), (4, 4, 4), (1, 1, 1))
+        damage, slain = simulation.simulate_chunk(groups, defender, 1000, [0, 0])
+        assert list(damage) == list(slain)
+        assert len(slain) == 4
+
+
+@pytest.mark.django_db
+class TestSimulate():
+    """Unit tests for ``simulate``."""
+
+    @pytest.fixture
+    def matchup(self, rules_unit, weapon_profile_factory, model_profile_factory):
+        """Return an attacking and a defending ``ArmyUnit``."""
+        weapon_profile_factory(weapon=rules_unit.test_items['default'], category='Ranged',
+            number_of_attacks_min=2, number_of_attacks_max=2, strength_min=4, strength_max=4,
+            armor_penetration=0, damage_min=1, damage_max=1)
+        profile = rules_unit.models.get().profile
+        profile.balistic_skill = 3
+        profile.save()
+        attacker = factories.ArmyunitFactory(unit=rules_unit)
+        for each in range(3):
+            factories.ArmyModelFactory(unit=attacker, model=rules_unit.models.get())
+        defender = factories.ArmyunitFactory()
+        target = factories.UnitModelFactory(profile=model_profile_factory(toughness=4,
+            saves=5, wounds=1))
+        for each in range(5):
+            factories.ArmyModelFactory(unit=defender, model=target)
+        return attacker, defender
+
+    def test_simulate(self, matchup):
+        """Make sure six shots against five models yield sensible distributions."""
+        result = simulation.simulate(*matchup, trials=20000, workers=0, chunk_size=5000)
+        assert result.trials == 20000
+        assert result.damage.sum() == pytest.approx(1)
+        assert len(result.slain) <= 6
+        # Hit on 3+, wound on 4+, failed save on 1 to 4.
+        expectation = 6 * 2 / 3 * 1 / 2 * 2 / 3
+        assert dice.expected(result.damage) == pytest.approx(expectation, abs=0.05)
+        assert result.trials_per_second > 0
+
+    def test_deterministic_across_workers(self, matchup):
+        """Make sure the outcome does not depend on the amount of worker processes."""
+        local = simulation.simulate(*matchup, trials=8000, seed=1, workers=0, chunk_size=1000)
+        pooled = simulation.simulate(*matchup, trials=8000, seed=1, workers=2, chunk_size=1000)
+        assert np.array_equal(local.damage, pooled.damage)
+        assert np.array_equal(local.slain, pooled.slain)
+
+    def test_other_category(self, matchup):
+        """Make sure weapons of another category are not used."""
+        result = simulation.simulate(*matchup, trials=100, category='Melee', workers=0)
+        assert list(result.damage) == [1]
@@ -0,0 +1,74 @@
+import pytest
+from django.core.management import call_command
+
+from armyimp.apps.w40k import models
+
+
+def effective(slot):
+    """Return the primary keys of the items ``slot`` may take according to the index."""
+    return set(slot.effective_options.values_list('item', flat=True))
+
+
+@pytest.fixture
+def slot(unit_model, item_factory, wargear_list):
+    """Return an item slot with a default, an option and a wargear list of one item."""
+    default, option, listed = item_factory.create_batch(3)
+    wargear_list.items.add(listed)
+    slot = unit_model.item_slots.create(default=default)
+    slot.options.add(option)
+    slot.option_from_list.add(wargear_list)
+    slot.test_items = {'default': default, 'option': option, 'listed': listed}
+    return slot
+
+
+@pytest.mark.django_db
+class TestItemSlotOptions():
+    """Unit tests for the materialized effective options of item slots."""
+
+    def test_created(self, slot):
+        """Make sure defaults, options and wargear list items are included."""
+        assert effective(slot) == {item.pk for item in slot.test_items.values()}
+
+    def test_options_changed(self, slot, item):
+        """Make sure changing options in either direction refreshes the index."""
+        slot.options.remove(slot.test_items['option'])
+        assert slot.test_items['option'].pk not in effective(slot)
+        item.slot_options.add(slot)
+        assert item.pk in effective(slot)
+        item.slot_options.clear()
+        assert item.pk not in effective(slot)
+
+    def test_wargear_list_changed(self, slot, item, wargear_list):
+        """Make sure changing the items of a wargear list refreshes all slots using it."""
+        wargear_list.items.add(item)
+        assert item.pk in effective(slot)
+        item.wargear_lists.clear()
+        assert item.pk not in effective(slot)
+        wargear_list.itemslot_set.clear()
+        assert slot.test_items['listed'].pk not in effective(slot)
+
+    def test_wargear_list_deleted(self, slot, wargear_list):
+        """Make sure deleting a wargear list refreshes all slots that used it."""
+        wargear_list.delete()
+        assert slot.test_items['listed'].pk not in effective(slot)
+
+    def test_default_changed(self, slot, item):
+        """Make sure changing a slots default refreshes its options."""
+        slot.default = item
+        slot.save()
+        assert item.pk in effective(slot)
+        assert slot.test_items['default'].pk not in effective(slot)
+
+    def test_is_eligible(self, slot, item, assert_num_queries):
+        """Make sure eligibility is checked with a single query."""
+        with assert_num_queries(1):
+            assert slot.is_eligible(slot.test_items['listed'])
+        assert not slot.is_eligible(item.pk)
+
+    def test_rebuild_command(self, slot):
+        """Make sure the command restores missing and removes superfluous rows."""
+        models.ItemSlotOption.objects.filter(item=slot.test_items['option']).delete()
+        models.ItemSlotOption.objects.create(item_slot=slot, item=models.Item.objects.create(
+            name='Superfluous'))
+        call_command('rebuild_item_slot_options')
+        assert effective(slot) == {item.pk for item in slot.test_items.values()}
@@ -0,0 +1,167 @@
+import importlib
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import transaction
+
+import factories
+from armyimp.apps.w40k import models, services, summaries
+
+
+def assert_consistent(army):
+    """Make sure the incrementally maintained summaries match freshly calculated values."""
+    army = models.Army.objects.get(pk=army.pk)
+    army_units = list(army.units.all())
+    assert army.summary.points == services.ArmyPointsCalculator([army]).get_totals()[army.pk]
+    assert army.summary.model_count == models.ArmyModel.objects.filter(unit__army=army).count()
+    assert army.summary.power_rating == sum(each.unit.power_rating for each in army_units)
+    unit_totals = services.ArmyUnitPointsCalculator(army_units).get_totals()
+    for army_unit in army_units:
+        assert army_unit.summary.points == unit_totals[army_unit.pk]
+        assert army_unit.summary.model_count == army_unit.models.count()
+
+
+@pytest.fixture
+def priced_item(unit):
+    """An item with a price for ``unit``'s organization."""
+    item = factories.ItemFactory()
+    factories.OrganizationItemIntermediateFactory(
+        organization=unit.organization, item=item, price=5)
+    return item
+
+
+@pytest.fixture
+def equipped_army_unit(army, unit, priced_item):
+    """An army unit with two models, one of them carrying priced wargear."""
+    army_unit = factories.ArmyunitFactory(army=army, unit=unit)
+    army_models = factories.ArmyModelFactory.create_batch(
+        2, unit=army_unit, model=unit.models.first())
+    factories.ArmyModelItemSlotFactory(army_model=army_models[0], item=priced_item, amount=3)
+    return army_unit
+
+
+@pytest.mark.django_db
+class TestSummaryMaintenance():
+    """Make sure summaries are kept up to date by applying deltas."""
+
+    def test_new_army_gets_summary(self, army):
+        """Make sure each new army gets an empty summary."""
+        assert army.summary.points == 0
+        assert army.summary.model_count == 0
+
+    def test_army_unit_category_and_power_rating(self, army, unit):
+        """Make sure adding an army unit updates power rating and category counts."""
+        unit.category = 'Fast Attack'
+        unit.save()
+        army_unit = factories.ArmyunitFactory(army=army, unit=unit)
+        summary = models.ArmySummary.objects.get(army=army)
+        assert summary.fast_attack_count == 1
+        assert summary.category_counts['Fast Attack'] == 1
+        assert summary.power_rating == unit.power_rating
+        assert army_unit.summary.power_rating == unit.power_rating
+
+    def test_models_and_wargear(self, army, unit, equipped_army_unit):
+        """Make sure model and wargear points are accounted for."""
+        summary = models.ArmySummary.objects.get(army=army)
+        assert summary.points == 2 * unit.model_price + 15
+        assert summary.model_count == 2
+        assert_consistent(army)
+
+    def test_price_change(self, army, unit, equipped_army_unit, priced_item):
+        """Make sure changing an items price updates all affected summaries."""
+        price = models.OrganizationItemIntermediate.objects.get(
+            organization=unit.organization, item=priced_item)
+        price.price = 10
+        price.save()
+        assert models.ArmySummary.objects.get(army=army).points == 2 * unit.model_price + 30
+        price.delete()
+        assert models.ArmySummary.objects.get(army=army).points == 2 * unit.model_price
+        assert_consistent(army)
+
+    def test_delete_item(self, army, unit, equipped_army_unit, priced_item):
+        """Make sure deleting a carried item removes its wargear points exactly once."""
+        other_army_unit = factories.ArmyunitFactory(unit=unit)
+        factories.ArmyModelItemSlotFactory(item=priced_item, amount=1,
+            army_model=factories.ArmyModelFactory(unit=other_army_unit, model=unit.models.first()))
+        priced_item.delete()
+        assert models.ArmySummary.objects.get(army=army).points == 2 * unit.model_price
+        assert other_army_unit.army.summary.points == unit.model_price
+        assert_consistent(army)
+        assert_consistent(other_army_unit.army)
+        assert not summaries._get_claimed_slot_pks()
+
+    def test_failed_delete(self, army, unit, equipped_army_unit, priced_item):
+        """Make sure claims of a deletion that got rolled back are dropped."""
+        slot = models.ArmyModelItemSlot.objects.get()
+        with pytest.raises(ZeroDivisionError):
+            with transaction.atomic():
+                summaries.get_deleted_contributions(slot)
+                1 / 0
+        assert summaries._get_claimed_slot_pks() == set()
+        slot.delete()
+        assert models.ArmySummary.objects.get(army=army).points == 2 * unit.model_price
+        assert_consistent(army)
+
+    def test_unit_model_price_change(self, army, unit, equipped_army_unit):
+        """Make sure changing a units model price updates all affected summaries."""
+        unit.model_price += 4
+        unit.save()
+        assert models.ArmySummary.objects.get(army=army).points == 2 * unit.model_price + 15
+        assert_consistent(army)
+
+    def test_delete_army_model(self, army, unit, equipped_army_unit):
+        """Make sure deleting a model removes its own points and those of its wargear."""
+        equipped_army_unit.models.first().delete()
+        assert models.ArmySummary.objects.get(army=army).points == unit.model_price
+        assert_consistent(army)
+
+    def test_delete_army_unit(self, army, equipped_army_unit):
+        """Make sure deleting an army unit resets the army summary."""
+        equipped_army_unit.delete()
+        summary = models.ArmySummary.objects.get(army=army)
+        assert (summary.points, summary.power_rating, summary.model_count) == (0, 0, 0)
+        assert sum(summary.category_counts.values()) == 0
+
+    def test_move_army_model(self, army, unit, equipped_army_unit):
+        """Make sure moving a model to another army moves its points including wargear."""
+        other_army_unit = factories.ArmyunitFactory(unit=unit)
+        army_model = equipped_army_unit.models.get(armymodelitemslot__isnull=False)
+        army_model.unit = other_army_unit
+        army_model.save()
+        assert models.ArmySummary.objects.get(army=army).points == unit.model_price
+        assert other_army_unit.army.summary.points == unit.model_price + 15
+        assert_consistent(army)
+        assert_consistent(other_army_unit.army)
+
+
+@pytest.mark.django_db
+class TestRebuild():
+    """Unit tests for recomputing summaries from scratch."""
+
+    def test_rebuild(self, army, equipped_army_unit):
+        """Make sure rebuilding restores corrupted summaries."""
+        models.ArmySummary.objects.filter(army=army).update(points=-1, model_count=-1)
+        models.ArmyUnitSummary.objects.all().delete()
+        summaries.rebuild([army.pk])
+        assert_consistent(army)
+
+    def test_rebuild_army_summaries_command(self, army, equipped_army_unit):
+        """Make sure the management command rebuilds all armies."""
+        models.ArmySummary.objects.all().delete()
+        call_command('rebuild_army_summaries', chunk_size=1)
+        assert models.ArmySummary.objects.count() == models.Army.objects.count()
+        assert_consistent(army)
+
+    def test_backfill_migration(self, army, equipped_army_unit):
+        """Make sure the data migration adds summaries to armies that have none."""
+        migration = importlib.import_module(
+            'armyimp.apps.w40k.migrations.0019_backfill_army_summaries')
+        expected = models.ArmySummary.objects.get(army=army)
+        models.ArmySummary.objects.all().delete()
+        models.ArmyUnitSummary.objects.all().delete()
+        migration.add_army_summaries(apps, None)
+        assert models.ArmySummary.objects.count() == models.Army.objects.count()
+        summary = models.ArmySummary.objects.get(army=army)
+        assert summary.category_counts == expected.category_counts
+        assert_consistent(army)
@@ -0,0 +1,14 @@
+from itertools import count
+
+from armyimp.apps.w40k import utils
+
+
+def test_chunks():
+    """Make sure all items are yielded in chunks of the given size."""
+    assert list(utils.chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(utils.chunks([], 2)) == []
+
+
+def test_chunks_lazy():
+    """Make sure iterables are consumed chunk by chunk, so they may even be endless."""
+    assert next(utils.chunks(count(), 3)) == [0, 1, 2]
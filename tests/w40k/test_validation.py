@@ -0,0 +1,105 @@
+import pytest
+from django.core.exceptions import ValidationError
+
+import factories
+from armyimp.apps.w40k import codex, models, validation
+
+
+def add_army_unit(army, unit, models=2, items=()):
+    """Add an army unit with ``models`` models, each carrying ``items``."""
+    army_unit = factories.ArmyunitFactory(army=army, unit=unit)
+    for each in range(models):
+        army_model = factories.ArmyModelFactory(unit=army_unit, model=unit.models.get())
+        for item, amount in items:
+            factories.ArmyModelItemSlotFactory(army_model=army_model, item=item, amount=amount)
+    return army_unit
+
+
+def codes(violations):
+    """Return the sorted codes of all violations."""
+    return sorted(violation.code for violation in violations)
+
+
+@pytest.mark.django_db
+class TestArmyValidator():
+    """Unit tests for ``ArmyValidator``."""
+
+    def test_legal_army(self, army, rules_unit):
+        """Make sure a legal army has no violations, default items being implied."""
+        add_army_unit(army, rules_unit)
+        assert validation.ArmyValidator().validate(army) == []
+
+    def test_legal_options(self, army, rules_unit):
+        """Make sure options and items of wargear lists are legal."""
+        items = rules_unit.test_items
+        add_army_unit(army, rules_unit, items=[(items['option'], 1), (items['listed'], 1)])
+        assert validation.ArmyValidator().validate(army) == []
+
+    def test_max_per_army(self, army, rules_unit):
+        """Make sure ``Unit.max_per_army`` is enforced."""
+        add_army_unit(army, rules_unit)
+        add_army_unit(army, rules_unit)
+        assert codes(validation.ArmyValidator().validate(army)) == ['max_per_army']
+
+    def test_models_min(self, army, rules_unit):
+        """Make sure ``Unit.models_min`` is enforced."""
+        army_unit = add_army_unit(army, rules_unit, models=1)
+        violations = validation.ArmyValidator().validate(army)
+        assert codes(violations) == ['models_min']
+        assert violations[0].army_unit == army_unit.pk
+
+    def test_models_and_unit_model_max(self, army, rules_unit):
+        """Make sure ``Unit.models_max`` and ``UnitModel.max_amount`` are enforced."""
+        add_army_unit(army, rules_unit, models=4)
+        violations = validation.ArmyValidator().validate(army)
+        assert codes(violations) == ['models_max', 'unit_model_max']
+
+    def test_item_not_eligible(self, army, rules_unit, item):
+        """Make sure items that are no option of any slot are reported."""
+        add_army_unit(army, rules_unit, items=[(item, 1)])
+        # As the item does not fit anywhere, the slot stays empty.
+        expectation = ['item_not_eligible'] * 2 + ['slot_min'] * 2
+        violations = validation.ArmyValidator().validate(army)
+        assert codes(violations) == expectation
+        messages = [violation.message for violation in violations
+            if violation.code == 'item_not_eligible']
+        assert messages[0].startswith('{} is no option'.format(item.name))
+
+    def test_slot_amounts(self, army, rules_unit):
+        """Make sure ``ItemSlot.min_amount`` and ``max_amount`` are enforced."""
+        option = rules_unit.test_items['option']
+        add_army_unit(army, rules_unit, models=1, items=[(option, 3)])
+        add_army_unit(factories.ArmyFactory(), rules_unit)
+        violations = validation.ArmyValidator().validate(army)
+        assert codes(violations) == ['models_min', 'slot_max']
+
+    def test_foreign_model(self, army, rules_unit, unit_model):
+        """Make sure models of other units are reported."""
+        army_unit = add_army_unit(army, rules_unit)
+        factories.ArmyModelFactory(unit=army_unit, model=unit_model)
+        assert 'foreign_model' in codes(validation.ArmyValidator().validate(army))
+
+    def test_constant_queries(self, army, rules_unit, assert_num_queries):
+        """Make sure the amount of queries does not depend on the size of the army."""
+        items = rules_unit.test_items
+        for each in range(5):
+            add_army_unit(army, rules_unit, items=[(items['option'], 1)])
+        validation.ArmyValidator().validate(army)
+        # Army units, models and items. The catalog version is read from the cache.
+        with assert_num_queries(3):
+            validation.ArmyValidator().validate(army)
+
+    def test_unit_missing_from_snapshot(self, rules_unit):
+        """Make sure units created without bumping this processes version are found."""
+        codex.get_snapshot()
+        # ``bulk_create`` sends no signals, just like a change made by another process.
+        models.Unit.objects.bulk_create([factories.UnitFactory.build(
+            organization=rules_unit.organization, models_min=1)])
+        unit = models.Unit.objects.latest('pk')
+        units = [validation.UnitData(None, unit.pk, [])]
+        assert codes(validation.ArmyValidator().validate_units(units)) == ['models_min']
+
+    def test_unknown_unit(self):
+        """Make sure unknown units are reported as validation error."""
+        with pytest.raises(ValidationError):
+            validation.get_unit_rules(0)
@@ -1,7 +1,11 @@
+import csv
+
 import pytest
+from django.http import HttpResponseNotFound
 from django.urls import reverse
 
-from armyimp.apps.w40k import models
+import factories
+from armyimp.apps.w40k import codex, datasheets, models, pricing, response_cache, views
 
 
 @pytest.mark.django_db
@@ -11,6 +15,44 @@ def test_unit_detail_view_reachable(client, unit):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+class TestUnitDetailView():
+    """Unit tests for ``UnitDetailView``."""
+
+    @pytest.fixture
+    def unit_with_items(self, unit, item, unit_ability):
+        """A unit with an item slot of each model and an ability."""
+        factories.WeaponProfileFactory(weapon=item)
+        for unit_model in unit.models.all():
+            unit_model.item_slots.create(default=item)
+        unit.abilities.add(unit_ability)
+        return unit
+
+    def test_datasheet(self, client, unit_with_items, item, unit_ability):
+        """Make sure the complete datasheet is rendered."""
+        response = client.get(reverse('w40k:unit_detail', kwargs={'pk': unit_with_items.pk}))
+        content = response.content.decode('utf-8')
+        assert item.weapon_profiles.get().name in content
+        assert unit_ability.description in content
+
+    def test_json(self, client, unit_with_items):
+        """Make sure the datasheet is returned as JSON if requested."""
+        response = client.get(reverse('w40k:unit_detail', kwargs={'pk': unit_with_items.pk}),
+            {'format': 'json'})
+        assert response['Content-Type'] == 'application/json'
+        assert response.json()['name'] == unit_with_items.name
+
+    @pytest.mark.parametrize('params', ({}, {'format': 'json'}))
+    def test_query_budget(self, client, assert_num_queries, unit_with_items, params):
+        """Make sure rendering takes the planned amount of queries only."""
+        codex.get_snapshot()
+        pricing.get_price_matrix()
+        with assert_num_queries(datasheets.QUERY_COUNT):
+            response = client.get(reverse('w40k:unit_detail',
+                kwargs={'pk': unit_with_items.pk}), params)
+        assert response.status_code == 200
+
+
 @pytest.mark.django_db
 def test_unit_list_view_reachable(client):
     """Test the list view is reachable under the intended urlname."""
@@ -18,6 +60,115 @@ def test_unit_list_view_reachable(client):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+def test_unit_list_view_keywords(client, unit_factory, unit_keyword_factory):
+    """Make sure units are filtered by keywords and malformed expressions are reported."""
+    units = unit_factory.create_batch(2)
+    units[1].keywords.add(unit_keyword_factory(name='Character'))
+    response = client.get(reverse('w40k:unit_list'), {'keywords': 'not character'})
+    assert list(response.context['unit_list']) == units[:1]
+    response = client.get(reverse('w40k:unit_list'), {'keywords': 'not'})
+    assert response.status_code == 200
+    assert response.context['keywords_error']
+    assert not response.context['unit_list']
+
+
+@pytest.mark.django_db
+class TestCodexConditionalGet():
+    """Unit tests for conditional GET support of codex views."""
+
+    @pytest.mark.parametrize('urlname', ('w40k:unit_detail', 'w40k:unit-detail'))
+    def test_not_modified(self, client, assert_num_queries, unit, urlname):
+        """Make sure matching requests are answered without running any query."""
+        url = reverse(urlname, kwargs={'pk': unit.pk})
+        etag = client.get(url)['ETag']
+        codex.get_snapshot()
+        with assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    def test_list_not_modified(self, client, assert_num_queries):
+        """Make sure the unit list supports conditional GET as well."""
+        url = reverse('w40k:unit_list')
+        response = client.get(url)
+        with assert_num_queries(0):
+            response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+
+    def test_modified(self, client, unit):
+        """Make sure a change to the units datasheet changes the ETag."""
+        url = reverse('w40k:unit_detail', kwargs={'pk': unit.pk})
+        etag = client.get(url)['ETag']
+        unit.models.first().item_slots.create()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_other_unit_modified(self, client, unit):
+        """Make sure a change to another unit of the same organization keeps the ETag."""
+        other = factories.UnitFactory(organization=unit.organization)
+        url = reverse('w40k:unit_detail', kwargs={'pk': unit.pk})
+        etag = client.get(url)['ETag']
+        other.save()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    def test_invalid_pk(self, client):
+        """Make sure primary keys that are no number are answered with 404."""
+        assert client.get(reverse('w40k:unit-detail', kwargs={'pk': 'abc'})).status_code == 404
+
+
+@pytest.mark.django_db
+class TestCodexResponseCache():
+    """Unit tests for the response cache of codex views."""
+
+    @pytest.mark.parametrize('urlname', ('w40k:unit_list', 'w40k:unit-list'))
+    def test_list_cached(self, client, assert_num_queries, unit, urlname):
+        """Make sure repeated requests are answered from the cache."""
+        url = reverse(urlname)
+        content = client.get(url).content
+        with assert_num_queries(0):
+            response = client.get(url)
+        assert response.content == content
+
+    def test_query_parameters(self, client, unit):
+        """Make sure responses for different query parameters are cached separately."""
+        url = reverse('w40k:unit-list')
+        client.get(url)
+        assert client.get(url, {'format': 'api'})['Content-Type'].startswith('text/html')
+
+    @pytest.mark.parametrize('urlname', ('w40k:unit_detail', 'w40k:unit-detail'))
+    def test_detail_invalidation(self, client, assert_num_queries, unit, urlname):
+        """Make sure only changes to the unit itself invalidate its cached responses."""
+        other = factories.UnitFactory(organization=unit.organization)
+        url = reverse(urlname, kwargs={'pk': unit.pk})
+        client.get(url)
+        other.save()
+        codex.get_snapshot()
+        with assert_num_queries(0):
+            client.get(url)
+        unit.name = 'Changed'
+        unit.save()
+        assert 'Changed' in client.get(url).content.decode('utf-8')
+
+    def test_invalid_pk(self, rf, admin_user):
+        """Make sure primary keys that are no number are passed on to the view."""
+        request = rf.get('/')
+        request.user = admin_user
+        view = response_cache.cache_codex_response(lambda request, pk: HttpResponseNotFound())
+        assert view(request, pk='abc').status_code == 404
+
+    def test_other_organization_price(self, client, unit, item):
+        """Make sure prices of other organizations listed on a datasheet invalidate it."""
+        unit.models.first().item_slots.create(default=item)
+        price = factories.OrganizationItemIntermediateFactory(item=item, price=10)
+        url = reverse('w40k:unit_detail', kwargs={'pk': unit.pk})
+        etag = client.get(url, {'format': 'json'})['ETag']
+        price.price = 99
+        price.save()
+        response = client.get(url, {'format': 'json'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        options = response.json()['models'][0]['item_slots'][0]['options']
+        assert options[0]['prices'] == [{'organization': price.organization.name, 'price': 99}]
+
+
 @pytest.mark.django_db
 def test_army_unit_detail_view_reachable(client, army_unit):
     """Test the list view is reachable under the intended urlname."""
@@ -32,6 +183,59 @@ def test_army_unit_list_view_reachable(client):
     assert response.status_code == 200
 
 
+@pytest.mark.django_db
+class TestArmyUnitListView():
+    """Unit tests for ``ArmyUnitListView``."""
+
+    @pytest.fixture
+    def army_units(self, army, unit):
+        """Five army units of the same army and unit."""
+        return [factories.ArmyunitFactory(army=army, unit=unit) for each in range(5)]
+
+    def test_keyset_pages(self, client, army_units, monkeypatch):
+        """Make sure army units are paged by primary key."""
+        monkeypatch.setattr(views.ArmyUnitListView, 'page_size', 2)
+        response = client.get(reverse('w40k:army_unit_list'))
+        assert list(response.context['armyunit_list']) == army_units[:2]
+        response = client.get(reverse('w40k:army_unit_list') + '?' +
+            response.context['next_query'])
+        assert list(response.context['armyunit_list']) == army_units[2:4]
+        response = client.get(reverse('w40k:army_unit_list'), {'after': army_units[3].pk})
+        assert list(response.context['armyunit_list']) == army_units[4:]
+        assert response.context['next_query'] is None
+
+    def test_single_query(self, client, army_units, assert_num_queries):
+        """Make sure units, armies and totals are fetched along with the army units."""
+        with assert_num_queries(1):
+            response = client.get(reverse('w40k:army_unit_list'))
+            response.render()
+        army_unit = response.context['armyunit_list'][0]
+        assert army_unit.model_count == army_unit.summary.model_count
+        assert army_unit.points == army_unit.summary.points
+
+    def test_filters(self, client, army_units):
+        """Make sure army units are filtered by army and unit category."""
+        army_unit = factories.ArmyunitFactory()
+        response = client.get(reverse('w40k:army_unit_list'), {'army': army_unit.army.pk})
+        assert list(response.context['armyunit_list']) == [army_unit]
+        response = client.get(reverse('w40k:army_unit_list'), {'category': 'Troops'})
+        assert not response.context['armyunit_list']
+
+    def test_invalid(self, client):
+        """Make sure invalid parameters are rejected."""
+        response = client.get(reverse('w40k:army_unit_list'), {'category': 'Nope'})
+        assert response.status_code == 400
+
+    def test_csv(self, client, army_units):
+        """Make sure all army units are streamed as CSV."""
+        response = client.get(reverse('w40k:army_unit_list'), {'format': 'csv'})
+        assert response.streaming
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        assert rows[0] == ['id', 'name', 'unit', 'category', 'army', 'models', 'points']
+        assert [int(row[0]) for row in rows[1:]] == [each.pk for each in army_units]
+        assert rows[1][2] == army_units[0].unit.name
+
+
 @pytest.mark.django_db
 class TestArmyUnitCreateView():
     """Unittest for ``ArmyUnitCreateView``."""
@@ -0,0 +1,327 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+import factories
+from armyimp.apps.w40k import codex, models, pagination, slot_options
+
+
+@pytest.mark.django_db
+class TestUnitViewSet():
+    """Unit tests for ``UnitViewSet``."""
+
+    def get_list_queries(self, client, assert_num_queries, expected, **params):
+        """Request the unit list and assert the amount of executed queries."""
+        with assert_num_queries(expected):
+            response = client.get(reverse('w40k:unit-list'), params)
+        assert response.status_code == 200
+        return response
+
+    def equip(self, units, item, wargear_list):
+        """Give each model of the given units an item slot with a default, options and lists."""
+        for unit in units:
+            for unit_model in unit.models.all():
+                slot = unit_model.item_slots.create(default=item)
+                slot.options.add(item)
+                slot.option_from_list.add(wargear_list)
+
+    @pytest.mark.parametrize('amount', (1, 5))
+    def test_list_constant_queries(self, client, assert_num_queries, unit_factory, item,
+            wargear_list, amount):
+        """Make sure the amount of queries does not depend on the amount of units."""
+        self.equip(unit_factory.create_batch(amount), item, wargear_list)
+        # Units, models, item slots and their defaults.
+        response = self.get_list_queries(client, assert_num_queries, 4)
+        assert len(response.json()['results']) == amount
+
+    def test_fields(self, client, assert_num_queries, unit_factory, item, wargear_list):
+        """Make sure only requested fields are included and no relation is prefetched."""
+        self.equip(unit_factory.create_batch(2), item, wargear_list)
+        response = self.get_list_queries(client, assert_num_queries, 1,
+            fields='name,model_price')
+        assert set(response.json()['results'][0]) == {'name', 'model_price'}
+
+    def test_nested_fields(self, client, assert_num_queries, unit_factory, item, wargear_list):
+        """Make sure nested serializers can be restricted as well."""
+        self.equip(unit_factory.create_batch(2), item, wargear_list)
+        response = self.get_list_queries(client, assert_num_queries, 2,
+            fields='name,models.pk')
+        assert set(response.json()['results'][0]['models'][0]) == {'pk'}
+
+    def test_expand(self, client, assert_num_queries, unit_factory, item, wargear_list,
+            weapon_profile_factory):
+        """Make sure expanded relations are included and prefetched."""
+        weapon_profile_factory(weapon=item)
+        self.equip(unit_factory.create_batch(2), item, wargear_list)
+        response = self.get_list_queries(client, assert_num_queries, 6,
+            expand='models.profile,models.item_slots.default.weapon_profiles')
+        unit_model = response.json()['results'][0]['models'][0]
+        assert 'toughness' in unit_model['profile']
+        assert len(unit_model['item_slots'][0]['default']['weapon_profiles']) == 1
+
+    @pytest.mark.parametrize('amount', (1, 5))
+    def test_options(self, client, assert_num_queries, unit_factory, item_factory,
+            wargear_list, amount):
+        """Make sure options include the default and the items of wargear lists."""
+        default, option, listed = item_factory.create_batch(3)
+        wargear_list.items.add(listed)
+        self.equip(unit_factory.create_batch(amount), option, wargear_list)
+        models.ItemSlot.objects.update(default=default)
+        slot_options.refresh()
+        response = self.get_list_queries(client, assert_num_queries, 4,
+            fields='models.item_slots.options.pk')
+        options = response.json()['results'][0]['models'][0]['item_slots'][0]['options']
+        assert {each['pk'] for each in options} == {default.pk, option.pk, listed.pk}
+
+    @pytest.mark.parametrize('params', ({'fields': 'unknown'}, {'expand': 'name'}))
+    def test_invalid_shape(self, client, params):
+        """Make sure unknown fields and expanding plain fields are rejected."""
+        response = client.get(reverse('w40k:unit-list'), params)
+        assert response.status_code == 400
+
+    def test_page_size_bounded(self, client, unit_factory):
+        """Make sure clients can not request arbitrarily large pages."""
+        unit_factory.create_batch(3)
+        response = client.get(reverse('w40k:unit-list'), {'fields': 'pk', 'page_size': 2})
+        assert len(response.json()['results']) == 2
+        request = Request(APIRequestFactory().get('/', {'page_size': 10 ** 6}))
+        assert pagination.PrimaryKeyCursorPagination().get_page_size(request) == 500
+
+
+@pytest.mark.django_db
+class TestArmyUnitViewSet():
+    """Unit tests for ``ArmyUnitViewSet``."""
+
+    def get_payload(self, army, unit, models=2, items=()):
+        """Return a JSON payload for an army unit with ``models`` models carrying ``items``."""
+        return json.dumps({'army': army.pk, 'unit': unit.pk, 'name': 'Squad', 'models': [
+            {'model': unit.models.get().pk, 'items': [
+                {'item': item.pk, 'amount': amount} for item, amount in items]}
+            for each in range(models)]})
+
+    def test_create(self, admin_client, army, rules_unit):
+        """Make sure the whole unit gets created in one request."""
+        option = rules_unit.test_items['option']
+        payload = self.get_payload(army, rules_unit, items=[(option, 1)])
+        response = admin_client.post(reverse('w40k:armyunit-list'), payload,
+            content_type='application/json')
+        assert response.status_code == 201
+        army_unit = army.units.get()
+        assert response.json()['pk'] == army_unit.pk
+        assert army_unit.models.count() == 2
+        assert response.json()['models'][0]['items'] == [{'item': option.pk, 'amount': 1}]
+
+    def test_constraints_violated(self, admin_client, army, rules_unit):
+        """Make sure nothing gets created if the unit violates its constraints."""
+        payload = self.get_payload(army, rules_unit, models=1)
+        response = admin_client.post(reverse('w40k:armyunit-list'), payload,
+            content_type='application/json')
+        assert response.status_code == 400
+        assert response.json()['non_field_errors']
+        assert not army.units.exists()
+
+    def test_existing_violations_ignored(self, admin_client, army, rules_unit):
+        """Make sure violations of other units of the army are not reported."""
+        factories.ArmyunitFactory(army=army, unit=factories.UnitFactory())
+        response = admin_client.post(reverse('w40k:armyunit-list'),
+            self.get_payload(army, rules_unit), content_type='application/json')
+        assert response.status_code == 201
+
+    @pytest.mark.parametrize('amount', (2, 3))
+    def test_constant_queries(self, admin_client, assert_num_queries, army, rules_unit,
+            amount):
+        """Make sure the amount of queries does not depend on the amount of models."""
+        option = rules_unit.test_items['option']
+        payload = self.get_payload(army, rules_unit, models=amount, items=[(option, 1)])
+        codex.get_snapshot()
+        # Session, user, validation, inserts, summary updates and the final representation.
+        with assert_num_queries(26):
+            response = admin_client.post(reverse('w40k:armyunit-list'), payload,
+                content_type='application/json')
+        assert response.status_code == 201
+
+
+@pytest.mark.django_db
+class TestArmyViewSet():
+    """Unit tests for ``ArmyViewSet``."""
+
+    @pytest.fixture
+    def armies(self, unit, item):
+        """Return a factory for armies with two units, each with models carrying an item."""
+        def create_armies(amount):
+            armies = factories.ArmyFactory.create_batch(amount)
+            for army in armies:
+                for army_unit in factories.ArmyunitFactory.create_batch(2, army=army, unit=unit):
+                    for army_model in factories.ArmyModelFactory.create_batch(2, unit=army_unit,
+                            model=unit.models.first()):
+                        factories.ArmyModelItemSlotFactory(army_model=army_model, item=item)
+            return armies
+        return create_armies
+
+    @pytest.mark.parametrize('amount', (1, 4))
+    def test_list_constant_queries(self, client, assert_num_queries, armies, amount):
+        """Make sure the amount of queries does not depend on the amount of armies."""
+        armies(amount)
+        # Armies with summaries, units, their summaries, models and items.
+        with assert_num_queries(5):
+            response = client.get(reverse('w40k:army-list'))
+        results = response.json()['results']
+        assert len(results) == amount
+        assert len(results[0]['units'][0]['models'][0]['items']) == 1
+        assert results[0]['summary']['model_count'] == 4
+
+    def test_summary(self, client, assert_num_queries, armies):
+        """Make sure ``?summary=1`` returns only the summaries using a single query."""
+        armies(3)
+        with assert_num_queries(1):
+            response = client.get(reverse('w40k:army-list'), {'summary': 1})
+        results = response.json()['results']
+        assert set(results[0]) == {'pk', 'name', 'summary'}
+        assert results[0]['summary']['category_counts']
+
+    def test_cursor_pagination(self, client, armies):
+        """Make sure all armies are reachable by following the cursor."""
+        created = armies(3)
+        response = client.get(reverse('w40k:army-list'), {'summary': 1, 'page_size': 2})
+        first_page = response.json()
+        assert 'offset' not in first_page['next']
+        second_page = client.get(first_page['next']).json()
+        assert [each['pk'] for each in first_page['results'] + second_page['results']] == [
+            army.pk for army in created]
+        assert second_page['next'] is None
+
+    def test_create(self, admin_client):
+        """Make sure armies can be created by name."""
+        response = admin_client.post(reverse('w40k:army-list'), {'name': 'Waaagh!'})
+        assert response.status_code == 201
+        assert response.json()['summary']['points'] == 0
+
+
+@pytest.mark.django_db
+class TestExpectedDamageViewSet():
+    """Unit tests for ``ExpectedDamageViewSet``."""
+
+    def test_list(self, client, weapon_profile_factory, model_profile_factory):
+        """Make sure the whole matrix is returned by default."""
+        weapon_profile_factory.create_batch(2)
+        model_profile_factory.create_batch(3)
+        response = client.get(reverse('w40k:expected_damage-list'))
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['damage']) == 2
+        assert len(data['kills'][0]) == len(data['targets'])
+
+    def test_selection(self, client, weapon_profile, model_profile_factory):
+        """Make sure rows and columns can be selected."""
+        targets = model_profile_factory.create_batch(2)
+        response = client.get(reverse('w40k:expected_damage-list'), {
+            'weapons': str(weapon_profile.pk), 'targets': '{},{}'.format(*reversed(
+                [target.pk for target in targets])), 'skill': 3})
+        data = response.json()
+        assert [each['pk'] for each in data['targets']] == [targets[1].pk, targets[0].pk]
+        assert len(data['wounds']) == 1
+
+    @pytest.mark.parametrize('params', ({'weapons': '999'}, {'skill': 7}, {'targets': 'a'}))
+    def test_invalid(self, client, params):
+        """Make sure invalid parameters are rejected."""
+        response = client.get(reverse('w40k:expected_damage-list'), params)
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestLoadoutViewSet():
+    """Unit tests for ``LoadoutViewSet``."""
+
+    def test_retrieve(self, client, rules_unit):
+        """Make sure loadouts are counted and paged."""
+        unit_model = rules_unit.models.get()
+        url = reverse('w40k:loadouts-detail', kwargs={'pk': unit_model.pk})
+        response = client.get(url, {'limit': 2, 'offset': 1})
+        assert response.status_code == 200
+        data = response.json()
+        # Three eligible items, one or two of them.
+        assert data['count'] == 3 + 6
+        assert len(data['results']) == 2
+        assert all(set(item) == {'item', 'amount'} for item in data['results'][0])
+
+    def test_unknown(self, client):
+        """Make sure unknown unit models are not found."""
+        response = client.get(reverse('w40k:loadouts-detail', kwargs={'pk': 999}))
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestArmyPlanViewSet():
+    """Unit tests for ``ArmyPlanViewSet``."""
+
+    def test_list(self, client, rules_unit):
+        """Make sure the best plan within budget is returned."""
+        response = client.get(reverse('w40k:army_plan-list'), {
+            'organization': rules_unit.organization.pk,
+            'budget': rules_unit.model_price * 3, 'required': 'HQ:1'})
+        assert response.status_code == 200
+        data = response.json()
+        assert data['points'] == rules_unit.model_price * 3
+        assert data['units'][0]['unit'] == rules_unit.pk
+
+    def test_army(self, client, rules_unit, army):
+        """Make sure units of the given army count against their maximum."""
+        factories.ArmyunitFactory(army=army, unit=rules_unit)
+        response = client.get(reverse('w40k:army_plan-list'), {
+            'organization': rules_unit.organization.pk, 'budget': 1000,
+            'required': 'HQ:1', 'army': army.pk})
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize('params', (
+        {'organization': 999, 'budget': 100},
+        {'budget': 100, 'required': 'Nope:1'},
+        {'budget': 100, 'required': 'HQ:13'},
+        {'budget': 10000, 'required': 'HQ:3,Troops:6,Elites:3,Fast Attack:3,Heavy Support:3'},
+        {'budget': 100, 'objective': 'expected_damage'},
+    ))
+    def test_invalid(self, client, organization, params):
+        """Make sure invalid parameters are rejected."""
+        params.setdefault('organization', organization.pk)
+        response = client.get(reverse('w40k:army_plan-list'), params)
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestSearchViewSet():
+    """Unit tests for ``SearchViewSet``."""
+
+    def test_list(self, client, unit):
+        """Make sure matching objects are returned."""
+        response = client.get(reverse('w40k:search-list'), {'q': unit.name, 'kinds': 'unit'})
+        assert response.status_code == 200
+        result = response.json()['results'][0]
+        assert result['kind'] == 'unit'
+        assert result['pk'] == unit.pk
+
+    @pytest.mark.parametrize('params', ({}, {'q': 'a', 'kinds': 'nope'}, {'q': 'a', 'limit': 0}))
+    def test_invalid(self, client, params):
+        """Make sure invalid parameters are rejected."""
+        response = client.get(reverse('w40k:search-list'), params)
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestUnitKeywordFilter():
+    """Unit tests for filtering ``UnitViewSet`` by keywords."""
+
+    def test_filter(self, client, unit_factory, unit_keyword_factory):
+        """Make sure only matching units are listed."""
+        units = unit_factory.create_batch(2)
+        units[0].keywords.add(unit_keyword_factory(name='Infantry'))
+        response = client.get(reverse('w40k:unit-list'), {'keywords': 'infantry',
+            'fields': 'pk'})
+        assert response.status_code == 200
+        assert [each['pk'] for each in response.json()['results']] == [units[0].pk]
+
+    def test_malformed(self, client):
+        """Make sure malformed expressions are rejected."""
+        response = client.get(reverse('w40k:unit-list'), {'keywords': 'a and ('})
+        assert response.status_code == 400